@@ -1,31 +1,91 @@
 from exporter import FlightInfoExporter
-from flight import FlightInfo
-from typing import Optional
+from flight import FlightInfo, parse_igc_time, parse_igc_latitude, parse_igc_longitude, unwrap_seconds_of_day
+from igcparser import IGCParser
+from typing import Iterator, List, Optional, Tuple
+import contextlib
 import datetime
-import re
-import collections
+import heapq
+import io
+import itertools
+import os
+import zipfile
+
+ZIP_ACMI_EXTENSION = '.zip.acmi'
+
+
+def _zero_padded(column, width: int) -> Iterator[str]:
+    # the text of integer extension values
+    return ('%0*d' % (width, value) for value in column)
+
+
+# conversions of I record extension values (text or integers) to the units of the Tacview properties
+_PROPERTY_CONVERSIONS = {'TAS': lambda value: str(int(value) / 100)}  # hundredths of km/h to km/h
+
+
+def _property_text(title: str, value: str) -> str:
+    # the Tacview property text of an I record extension value as recorded in the B record
+    conversion = _PROPERTY_CONVERSIONS.get(title)
+    return value if conversion is None else conversion(value)
+
+
+def _escape_property(value: str) -> str:
+    return value.replace('\\', '\\\\').replace(',', '\\,')
+
+
+def _file_header() -> str:
+    return 'FileType=text/acmi/tacview\nFileVersion=2.1\n'
+
+
+def _reference_time_line(reference_time: datetime.datetime) -> str:
+    # the global object line the frame times are relative to
+    return '0,ReferenceTime={:%Y-%m-%dT%H:%M:%S}Z\n'.format(reference_time)
+
+
+def _check_compression_level(compression_level: Optional[int]):
+    # deflate level from 0 (stored) to 9 (smallest), the zlib default when None
+    if compression_level is not None and not 0 <= compression_level <= 9:
+        raise ValueError('invalid compression level {}, use 0 to 9'.format(compression_level))
+
+
+@contextlib.contextmanager
+def _open_zip_member(destination_path: str, compression_level: Optional[int]):
+    # the text stream of the single member of a new zip archive, compressed while it is written
+    member_name = os.path.basename(destination_path).removesuffix(ZIP_ACMI_EXTENSION) + '.acmi'
+    with zipfile.ZipFile(destination_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=compression_level) as archive:
+        with io.TextIOWrapper(archive.open(member_name, 'w'), encoding='utf-8', newline='') as member:
+            yield member
 
 
 class AcmiTacViewFlightInfoExporter(FlightInfoExporter):
-    def __init__(self):
+    ignored_record_types = ('J', 'K', 'L')
+    options = ('metrics_window', 'delta_encoding')
+    # frames are formatted and written this many at a time
+    frame_batch_size = 4096
+
+    def __init__(self, metrics_window: Optional[int] = None, delta_encoding: bool = False):
+        self._check_metrics_window(metrics_window)
+        self.metrics_window = metrics_window
+        # Tacview delta mode: after the first frame the T= components and the properties are only written when they
+        # changed, frames without any change are left out
+        self.delta_encoding = delta_encoding
         self.flight_info: Optional[FlightInfo] = None
         self._acmi_file = None
         self._reference_date = None
+        self._previous_frame = None  # (T= components, property values) of the last frame of delta mode
         self._aircraft_object_id = '3000102'
-        self._longitude_format_regex = r"(\d{3})(\d{2})(\d{3})([EW])"
-        self._latitude_format_regex = r"(\d{2})(\d{2})(\d{3})([NS])"
         self._float_format = '%.7f'
 
     def export(self, flight_info: FlightInfo, destination_path: str):
         self.flight_info = flight_info
-        self._acmi_file = open(destination_path, 'w')
-        self._reference_date = self._get_reference_year_mon_day_hour_min_sec()
+        self._previous_frame = None
+        with self._open(destination_path) as acmi_file:
+            self._acmi_file = acmi_file
+            self._export_header()
+            self._export_reference_time()
+            self._export_timed_flight_data()
 
-        self._export_header()
-        self._export_reference_time()
-        self._export_timed_flight_data()
-
-        self._acmi_file.close()
+    def _open(self, destination_path: str):
+        return open(destination_path, 'w', encoding='utf-8', newline='')
 
     def _write_file_line(self, line: str):
         if not line.endswith('\n'):
@@ -33,95 +93,181 @@ class AcmiTacViewFlightInfoExporter(FlightInfoExporter):
         self._acmi_file.write(line)
 
     def _export_header(self):
-        self._write_file_line('FileType=text/acmi/tacview')
-        self._write_file_line('FileVersion=2.1')
-
-    def _transform_longitude_format(self, longitude: str) -> str:
-        result = re.search(self._longitude_format_regex, longitude)
-        if result:
-            degrees = result.group(1)
-            minutes = result.group(2)
-            decimals = result.group(3)
-            direction = result.group(4)
-        else:
-            raise RuntimeError('unable to parse longitude')
-
-        value = int(degrees) + (float(minutes + '.' + decimals) / 60)
-        if direction.upper() == 'W':
-            value *= -1
-        return self._float_format % value
-
-    def _transform_latitude_format(self, latitude: str) -> str:
-        result = re.search(self._latitude_format_regex, latitude)
-        if result:
-            degrees = result.group(1)
-            minutes = result.group(2)
-            decimals = result.group(3)
-            direction = result.group(4)
-        else:
-            raise RuntimeError('unable to parse longitude')
-        value = int(degrees) + (float(minutes + '.' + decimals) / 60)
-        if direction.upper() == 'S':
-            value *= -1
-        return self._float_format % value
+        self._write_file_line(_file_header())
+
+    def _extension_properties(self) -> List[Tuple[str, Iterator[str]]]:
+        # (name, values) of the I record extensions, converted as by _property_text
+        fixes = self.flight_info.fixes
+        properties = []
+        for (i, title) in enumerate(fixes.extension_titles):
+            column = fixes.extension_columns[i]
+            conversion = _PROPERTY_CONVERSIONS.get(title)
+            if conversion is not None:
+                values = map(conversion, column)
+            elif type(column) is list:
+                values = iter(column)
+            else:
+                values = _zero_padded(column, fixes.extension_widths[i])
+            properties.append((title, values))
+        return properties
+
+    def _metric_properties(self) -> List[Tuple[str, Iterator[str]]]:
+        # Tacview VerticalSpeed (m/s) and HDG (degrees) object properties
+        m = self._compute_metrics(self.flight_info, self.metrics_window)
+        return [('VerticalSpeed', ('%.2f' % value for value in m.vertical_speed)),
+                ('HDG', ('%.1f' % value for value in m.heading))]
+
+    def _properties(self) -> List[Tuple[str, Iterator[str]]]:
+        # the per fix object properties in the order they are written, Name is the same for all fixes
+        properties = self._extension_properties()
+        if self.metrics_window is not None:
+            properties += self._metric_properties()
+        properties.append(('Name', itertools.repeat(_escape_property(self.flight_info.header.glider_id))))
+        return properties
 
     def _export_timed_flight_data(self):
-        for timed_data in self.flight_info.timed_flight_data:
+        fixes = self.flight_info.fixes
+        properties = self._properties()
+        names = [name for (name, _) in properties]
+        time_offsets = (time - fixes.time[0] for time in fixes.time)
+        frames = zip(time_offsets, fixes.longitude, fixes.latitude, fixes.gps_altitude,
+                     *(values for (_, values) in properties))
+        format_frames = self._format_delta_frames if self.delta_encoding else self._format_frames
+        for batch in iter(lambda: list(itertools.islice(frames, self.frame_batch_size)), []):
+            self._acmi_file.write(''.join(format_frames(batch, names)))
 
-            year = self._get_reference_year_mon_day_hour_min_sec().year
-            month = self._get_reference_year_mon_day_hour_min_sec().month
-            day = self._get_reference_year_mon_day_hour_min_sec().day
+    def _format_frames(self, frames: list, names: List[str]) -> List[str]:
+        frame_format = '#%d\n{},T={}|{}|%05d{}\n'.format(
+            self._aircraft_object_id, self._float_format, self._float_format,
+            ''.join(',{}=%s'.format(name.replace('%', '%%')) for name in names))
+        return [frame_format % frame for frame in frames]
 
-            if len(self.flight_info.timed_flight_data) == 0:
-                raise RuntimeError('No timed flight data...')
+    def _format_delta_frames(self, frames: list, names: List[str]) -> List[str]:
+        lines = []
+        previous = self._previous_frame
+        for (time_offset, longitude, latitude, gps_altitude, *values) in frames:
+            components = (self._float_format % longitude, self._float_format % latitude, '%05d' % gps_altitude)
+            if previous is None:
+                changed_components = components
+                changed_properties = zip(names, values)
+            else:
+                (previous_components, previous_values) = previous
+                changed_components = [component if component != previous_component else ''
+                                      for (component, previous_component) in zip(components, previous_components)]
+                changed_properties = [(name, value) for (name, value, previous_value) in
+                                      zip(names, values, previous_values) if value != previous_value]
+                if components == previous_components:
+                    changed_components = None
+            previous = (components, values)
 
-            hour = timed_data.utc_time[0:2]
-            minute = timed_data.utc_time[2:4]
-            second = timed_data.utc_time[4:6]
+            line = ''.join(',{}={}'.format(name, value) for (name, value) in changed_properties)
+            if changed_components is not None:
+                line = ',T=' + '|'.join(changed_components) + line
+            if line:
+                lines.append('#{}\n{}{}\n'.format(time_offset, self._aircraft_object_id, line))
+        self._previous_frame = previous
+        return lines
 
-            current_date = datetime.datetime(int(year), int(month), int(day),
-                                             int(hour), int(minute), int(second))
+    def _export_reference_time(self):
+        if len(self.flight_info.fixes) == 0:
+            raise RuntimeError('No timed flight data...')
+        self._reference_date = self.flight_info.fix_time(0)
+        if self._reference_date is None:
+            raise RuntimeError('No flight date...')
 
-            self._write_file_line('#' + str((current_date - self._reference_date).seconds))
+        self._write_file_line(_reference_time_line(self._reference_date))
 
-            additional_info = '|'.join([self._transform_longitude_format(timed_data.longitude),
-                                        self._transform_latitude_format(timed_data.latitude), timed_data.gps_altitude])
-            for (name, value) in timed_data.extension_values.items():
-                if name == 'TAS':
-                    # convert value to km/h
-                    additional_info += ',' + name + '=' + str(int(value) / 100)
-                else:
-                    additional_info += ',' + name + '=' + value
 
-            additional_info += ",Name=" + self.flight_info.header.glider_id
+# Zipped ACMI (.zip.acmi) as read by Tacview, the text is compressed into the single member of the archive while it is
+# written, without a plain temporary file
+class ZipAcmiTacViewFlightInfoExporter(AcmiTacViewFlightInfoExporter):
+    options = AcmiTacViewFlightInfoExporter.options + ('compression_level',)
 
-            self._write_file_line(self._aircraft_object_id + ',T=' + additional_info)
+    def __init__(self, metrics_window: Optional[int] = None, delta_encoding: bool = False,
+                 compression_level: Optional[int] = None):
+        super().__init__(metrics_window, delta_encoding)
+        _check_compression_level(compression_level)
+        self.compression_level = compression_level
 
-    def _get_reference_year_mon_day_hour_min_sec(self) -> collections.namedtuple:
-        ReferenceDateTime = collections.namedtuple('ReferenceDateTime',
-                                                   ['year', 'month', 'day', 'hour', 'minute', 'second'])
+    def _open(self, destination_path: str):
+        return _open_zip_member(destination_path, self.compression_level)
 
-        reference_year = '20' + str(self.flight_info.header.flight_date[0])  # assume 21st century
-        reference_month = str(self.flight_info.header.flight_date[1])
-        reference_day = str(self.flight_info.header.flight_date[2])
 
-        if len(self.flight_info.timed_flight_data) == 0:
-            raise RuntimeError('No timed flight data...')
+# Competition replay: the flights of several IGC files in one ACMI file, an aircraft object per file. The files are
+# parsed as streams and their fixes merged by absolute time (heapq k-way merge), so memory use depends on the number
+# of files but not on the length of the flights. The frames share the ReferenceTime of the earliest fix.
+class MergedAcmiTacViewExporter:
+    first_object_id = 0x3000102
+    # frames are written this many object lines at a time
+    line_batch_size = 4096
 
-        reference_hour = self.flight_info.timed_flight_data[0].utc_time[0:2]
-        reference_min = self.flight_info.timed_flight_data[0].utc_time[2:4]
-        reference_sec = self.flight_info.timed_flight_data[0].utc_time[4:6]
+    def __init__(self, compression_level: Optional[int] = None):
+        # deflate level of .zip.acmi destinations
+        _check_compression_level(compression_level)
+        self.compression_level = compression_level
 
-        return ReferenceDateTime(year=reference_year, month=reference_month, day=reference_day, hour=reference_hour,
-                                 minute=reference_min, second=reference_sec)
+    def object_id(self, index: int) -> str:
+        # ACMI object ids are hexadecimal
+        return '{:x}'.format(self.first_object_id + index)
 
-    def _export_reference_time(self):
-        r = self._get_reference_year_mon_day_hour_min_sec()
+    def export(self, igc_file_paths: List[str], destination_path: str):
+        fixes = heapq.merge(*(self._iter_object_lines(index, igc_file_path)
+                              for (index, igc_file_path) in enumerate(igc_file_paths)))
+        first_fix = next(fixes, None)
+        if first_fix is None:
+            raise RuntimeError('No timed flight data...')
+        reference_time = first_fix[0]
+
+        with self._open(destination_path) as acmi_file:
+            acmi_file.write(_file_header())
+            acmi_file.write(_reference_time_line(datetime.datetime.fromtimestamp(reference_time,
+                                                                                 tz=datetime.timezone.utc)))
+            frame_time = None
+            lines = []
+            for (time, _, _, object_line) in itertools.chain([first_fix], fixes):
+                if time != frame_time:
+                    lines.append('#{}\n'.format(time - reference_time))
+                    frame_time = time
+                lines.append(object_line)
+                if len(lines) >= self.line_batch_size:
+                    acmi_file.write(''.join(lines))
+                    lines = []
+            acmi_file.write(''.join(lines))
 
-        self._reference_date = datetime.datetime(int(r.year), int(r.month), int(r.day),
-                                                 int(r.hour), int(r.minute), int(r.second))
+    def _open(self, destination_path: str):
+        if destination_path.endswith(ZIP_ACMI_EXTENSION):
+            return _open_zip_member(destination_path, self.compression_level)
+        return open(destination_path, 'w', encoding='utf-8')
 
-        s = '0,ReferenceTime={}-{}-{}T{}:{}:{}Z'.format(r.year, r.month, r.day, r.hour,
-                                                        r.minute, r.second)
+    def _iter_object_lines(self, index: int, igc_file_path: str) -> Iterator[Tuple[int, int, int, str]]:
+        # (POSIX time, index, fix number, object line) of the fixes of a file in time order
+        object_id = self.object_id(index)
+        parser = IGCParser(include=('A', 'H', 'I', 'B'))
+        (fixes, times) = itertools.tee(record.value for record in parser.iter_records(igc_file_path)
+                                       if record.record_type == 'B')
+        seconds = unwrap_seconds_of_day(parse_igc_time(timed_data.utc_time) for timed_data in times)
+        start_time = None
+        for (fix_number, (timed_data, second)) in enumerate(zip(fixes, seconds)):
+            line = '{},T={:.7f}|{:.7f}|{}'.format(object_id, parse_igc_longitude(timed_data.longitude),
+                                                  parse_igc_latitude(timed_data.latitude), timed_data.gps_altitude)
+            for (name, value) in zip(timed_data.extension_columns or (), timed_data.extension_data):
+                line += ',{}={}'.format(name, _property_text(name, value))
+            if start_time is None:
+                # the header precedes the fixes, the static properties are written with the first one
+                reference_time = parser.flight_info.reference_time
+                if reference_time is None:
+                    raise RuntimeError("No flight date in '{}'".format(igc_file_path))
+                start_time = int(reference_time.timestamp())
+                line += self._static_properties(parser.flight_info, igc_file_path)
+            yield start_time + second, index, fix_number, line + '\n'
 
-        self._write_file_line(s)
+    @staticmethod
+    def _static_properties(flight_info: FlightInfo, igc_file_path: str) -> str:
+        header = flight_info.header
+        name = header.glider_id or os.path.basename(igc_file_path)
+        properties = ',Name=' + _escape_property(name)
+        if header.pilot_name:
+            properties += ',Pilot=' + _escape_property(header.pilot_name)
+        if header.tail_fin_number:
+            properties += ',CallSign=' + _escape_property(header.tail_fin_number)
+        return properties
@@ -0,0 +1,146 @@
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from acmitacviewflightinfoexporter import AcmiTacViewFlightInfoExporter, ZipAcmiTacViewFlightInfoExporter, \
+    MergedAcmiTacViewExporter
+from csvexporter import CSVFlightInfoExporter
+from exporterfactory import FlightInfoExporterFactory
+from igcparser import IGCParser
+
+
+def read_frames(acmi_path: str) -> dict:
+    # time offset to the object properties of every frame, T= split into its components
+    frames = {}
+    with open(acmi_path) as acmi_file:
+        lines = acmi_file.read().splitlines()
+    for (time_line, object_line) in zip(lines[3::2], lines[4::2]):
+        properties = dict(item.split('=', 1) for item in object_line.split(',')[1:])
+        if 'T' in properties:
+            properties['T'] = properties['T'].split('|')
+        frames[int(time_line[1:])] = properties
+    return frames
+
+
+class AcmiExporterTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.flight_info = IGCParser('igc/test.igc').flight_info
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.acmi_path = os.path.join(directory, 'test.acmi')
+
+    def test_export(self):
+        AcmiTacViewFlightInfoExporter().export(self.flight_info, self.acmi_path)
+        with open(self.acmi_path) as acmi_file:
+            lines = acmi_file.read().splitlines()
+        self.assertEqual(lines[:5], [
+            'FileType=text/acmi/tacview', 'FileVersion=2.1', '0,ReferenceTime=2019-05-25T15:22:29Z', '#0',
+            '3000102,T=-72.8173167|45.6304000|00065,FXA=007,ENL=004,TAS=0.0,GSP=00001,TRT=253,VAT=00000,OAT=0242,'
+            'ACZ=0100,Name='])
+        self.assertEqual(len(lines), 3 + 2 * len(self.flight_info.fixes))
+
+    def test_name_is_escaped(self):
+        self.flight_info.header.glider_id = 'C-FLPS,2\\'
+        AcmiTacViewFlightInfoExporter().export(self.flight_info, self.acmi_path)
+        with open(self.acmi_path) as acmi_file:
+            self.assertTrue(acmi_file.read().splitlines()[4].endswith(',Name=C-FLPS\\,2\\\\'))
+
+    def test_delta_encoding(self):
+        exporter = AcmiTacViewFlightInfoExporter()
+        exporter.export(self.flight_info, self.acmi_path)
+        frames = read_frames(self.acmi_path)
+        full_size = os.path.getsize(self.acmi_path)
+
+        exporter = AcmiTacViewFlightInfoExporter(delta_encoding=True)
+        exporter.frame_batch_size = 10
+        exporter.export(self.flight_info, self.acmi_path)
+        delta_frames = read_frames(self.acmi_path)
+        self.assertLess(os.path.getsize(self.acmi_path), full_size)
+        self.assertEqual(list(delta_frames.values())[0], list(frames.values())[0])
+
+        # replaying the changes restores every frame, the left out ones equal the frame before
+        state = {}
+        for (time_offset, properties) in frames.items():
+            changes = delta_frames.get(time_offset, {})
+            self.assertNotIn('Name', changes if time_offset > 0 else {})
+            if 'T' in changes:
+                changes = dict(changes, T=[component or previous for (component, previous) in
+                                           zip(changes['T'], state.get('T', changes['T']))])
+            state.update(changes)
+            self.assertEqual(state, properties)
+
+    def test_factory_passes_the_exporter_options(self):
+        factory = FlightInfoExporterFactory()
+        exporter = factory.create('test.acmi', metrics_window=None, delta_encoding=True)
+        self.assertIsInstance(exporter, AcmiTacViewFlightInfoExporter)
+        self.assertTrue(exporter.delta_encoding)
+        self.assertIsInstance(factory.create('test.csv', metrics_window=None, delta_encoding=True),
+                              CSVFlightInfoExporter)
+
+    def test_zip_export(self):
+        AcmiTacViewFlightInfoExporter().export(self.flight_info, self.acmi_path)
+        with open(self.acmi_path, 'rb') as acmi_file:
+            expected = acmi_file.read()
+
+        zip_path = os.path.join(os.path.dirname(self.acmi_path), 'test.zip.acmi')
+        sizes = []
+        for compression_level in (0, 9):
+            exporter = FlightInfoExporterFactory().create(zip_path, compression_level=compression_level)
+            self.assertIsInstance(exporter, ZipAcmiTacViewFlightInfoExporter)
+            exporter.export(self.flight_info, zip_path)
+            with zipfile.ZipFile(zip_path) as archive:
+                self.assertEqual(archive.namelist(), ['test.acmi'])
+                self.assertEqual(archive.read('test.acmi'), expected)
+            sizes.append(os.path.getsize(zip_path))
+        self.assertLess(sizes[1], sizes[0])
+        self.assertRaises(ValueError, ZipAcmiTacViewFlightInfoExporter, compression_level=10)
+
+
+class MergedAcmiExporterTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def _read_lines(self, path: str):
+        with open(path) as acmi_file:
+            return acmi_file.read().splitlines()
+
+    def test_objects_share_the_frames(self):
+        single_path = os.path.join(self.directory, 'single.acmi')
+        AcmiTacViewFlightInfoExporter().export(IGCParser('igc/test.igc').flight_info, single_path)
+        merged_path = os.path.join(self.directory, 'merged.acmi')
+        MergedAcmiTacViewExporter().export(['igc/test.igc', 'igc/test.igc'], merged_path)
+
+        single_lines = self._read_lines(single_path)
+        merged_lines = self._read_lines(merged_path)
+        self.assertEqual(merged_lines[:3], single_lines[:3])
+        self.assertEqual(merged_lines[3::3], single_lines[3::2])  # frame times
+        self.assertEqual(merged_lines[4].split(',')[:-1], single_lines[4].split(',')[:-1])
+        self.assertEqual(merged_lines[4].split(',')[-1], 'Name=test.igc')
+        self.assertEqual(merged_lines[5].split(',', 1), ['3000103', merged_lines[4].split(',', 1)[1]])
+        # the static name is only written with the first fix
+        self.assertEqual(merged_lines[7] + ',Name=', single_lines[6])
+        self.assertEqual(merged_lines[8], merged_lines[7].replace('3000102', '3000103'))
+
+    def test_flights_are_merged_by_absolute_time(self):
+        merged_path = os.path.join(self.directory, 'merged.zip.acmi')
+        MergedAcmiTacViewExporter(compression_level=1).export(
+            ['igc/06ed9wl1.igc', 'igc/vol GD 12sept20.igc', 'igc/test.igc'], merged_path)
+        with zipfile.ZipFile(merged_path) as archive:
+            lines = archive.read('merged.acmi').decode('utf-8').splitlines()
+        self.assertEqual(lines[2], '0,ReferenceTime=2019-05-25T15:22:29Z')
+        frame_times = [int(line[1:]) for line in lines if line.startswith('#')]
+        self.assertEqual(frame_times, sorted(set(frame_times)))
+        object_ids = [line.split(',', 1)[0] for line in lines[3:] if not line.startswith('#')]
+        self.assertEqual(object_ids[0], '3000104')
+        self.assertEqual({object_id: object_ids.count(object_id) for object_id in set(object_ids)},
+                         {'3000102': 12536, '3000103': 9908, '3000104': 159})
+        self.assertIn('3000102,T=-72.8174667|45.6305000|00039,FXA=001,SIU=09,Name=C-FLPS,Pilot=Mathieu Cote,'
+                      'CallSign=74', lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
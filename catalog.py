@@ -0,0 +1,227 @@
+from flight import FlightInfo
+from igcparser import IGCParser
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+import collections
+import datetime
+import os
+import pathlib
+import sqlite3
+
+# SQLite catalog of IGC files holding the header, the flight recorder and a summary of the fixes of every flight,
+# so the flights of an archive are found by a query instead of by parsing all files. Entries are keyed by the
+# absolute path of the file and are summarized again when its size or modification time changes.
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS flights (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    flight_date TEXT,
+    pilot_name TEXT NOT NULL,
+    second_pilot_name TEXT NOT NULL,
+    glider_type TEXT NOT NULL,
+    glider_id TEXT NOT NULL,
+    glider_class TEXT NOT NULL,
+    tail_fin_number TEXT NOT NULL,
+    flight_recorder_type TEXT NOT NULL,
+    firmware_version TEXT NOT NULL,
+    hardware_version TEXT NOT NULL,
+    manufacturer_code TEXT NOT NULL,
+    serial_number TEXT NOT NULL,
+    start_time TEXT,
+    end_time TEXT,
+    fix_count INTEGER NOT NULL,
+    min_latitude REAL,
+    min_longitude REAL,
+    max_latitude REAL,
+    max_longitude REAL
+);
+CREATE INDEX IF NOT EXISTS flights_by_date ON flights (flight_date);
+CREATE INDEX IF NOT EXISTS flights_by_pilot ON flights (pilot_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS flights_by_glider ON flights (glider_id COLLATE NOCASE);
+'''
+_COLUMNS = ('path', 'size', 'mtime_ns', 'flight_date', 'pilot_name', 'second_pilot_name', 'glider_type', 'glider_id',
+            'glider_class', 'tail_fin_number', 'flight_recorder_type', 'firmware_version', 'hardware_version',
+            'manufacturer_code', 'serial_number', 'start_time', 'end_time', 'fix_count', 'min_latitude',
+            'min_longitude', 'max_latitude', 'max_longitude')
+# the records needed for a summary, the others are skipped by the parser
+_SUMMARY_RECORD_TYPES = ('A', 'H', 'B')
+
+CatalogUpdate = collections.namedtuple('CatalogUpdate', [
+    'summarized',  # files added to or updated in the catalog
+    'unchanged',  # files skipped as their entry is up to date
+    'errors',  # (path, message) of the files that could not be parsed
+])
+
+
+def _format_time(time: Optional[datetime.datetime]) -> Optional[str]:
+    return None if time is None else time.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def summarize_flight(flight_info: FlightInfo) -> dict:
+    # the catalog columns of a flight, but for path, size and mtime_ns
+    header = flight_info.header
+    recorder = flight_info.flight_recorder_info
+    fixes = flight_info.fixes
+    reference_time = flight_info.reference_time
+    summary = {
+        'flight_date': None if reference_time is None else reference_time.date().isoformat(),
+        'pilot_name': header.pilot_name,
+        'second_pilot_name': header.second_pilot_name,
+        'glider_type': header.glider_type,
+        'glider_id': header.glider_id,
+        'glider_class': header.glider_class,
+        'tail_fin_number': header.tail_fin_number,
+        'flight_recorder_type': header.flight_recorder_type,
+        'firmware_version': header.firmware_version,
+        'hardware_version': header.hardware_version,
+        'manufacturer_code': recorder.flight_recorder_manufacturer_code,
+        'serial_number': recorder.flight_recorder_serial_number,
+        'fix_count': len(fixes),
+        'start_time': None, 'end_time': None,
+        'min_latitude': None, 'min_longitude': None, 'max_latitude': None, 'max_longitude': None,
+    }
+    if len(fixes) > 0:
+        summary.update(start_time=_format_time(flight_info.fix_time(0)),
+                       end_time=_format_time(flight_info.fix_time(len(fixes) - 1)),
+                       min_latitude=min(fixes.latitude), min_longitude=min(fixes.longitude),
+                       max_latitude=max(fixes.latitude), max_longitude=max(fixes.longitude))
+    return summary
+
+
+def _summarize_file(igc_file_path: str, size: int, mtime_ns: int) -> Tuple[Optional[tuple], Optional[str]]:
+    # worker of FlightCatalog.update, returns the catalog row or the error message of the file
+    try:
+        summary = summarize_flight(IGCParser(igc_file_path, include=_SUMMARY_RECORD_TYPES).flight_info)
+    except Exception as e:
+        return None, '{}: {}'.format(type(e).__name__, e)
+    summary.update(path=igc_file_path, size=size, mtime_ns=mtime_ns)
+    return tuple(summary[column] for column in _COLUMNS), None
+
+
+class FlightCatalog:
+    def __init__(self, database_path: str, create: bool = True):
+        # create=False opens an existing catalog only, instead of creating an empty database at database_path
+        self.database_path = database_path
+        if create:
+            self.connection = sqlite3.connect(database_path)
+            self.connection.executescript(_SCHEMA)
+            return
+        try:
+            self.connection = sqlite3.connect(pathlib.Path(database_path).absolute().as_uri() + '?mode=rw', uri=True)
+        except sqlite3.OperationalError:
+            raise RuntimeError("No flight catalog found at '{}'".format(database_path))
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM flights').fetchone()[0]
+
+    def update(self, igc_files: Iterable[str], workers: Optional[int] = 1) -> CatalogUpdate:
+        # Summarizes the new and changed files with a pool of worker processes (in this process for workers=1,
+        # one per CPU for None) and stores them, files whose size and modification time match their entry are
+        # skipped.
+        known = {path: (size, mtime_ns) for (path, size, mtime_ns) in
+                 self.connection.execute('SELECT path, size, mtime_ns FROM flights')}
+        pending = []
+        unchanged = 0
+        for igc_file_path in igc_files:
+            igc_file_path = os.path.abspath(igc_file_path)
+            stat = os.stat(igc_file_path)
+            if known.get(igc_file_path) == (stat.st_size, stat.st_mtime_ns):
+                unchanged += 1
+            else:
+                pending.append((igc_file_path, stat.st_size, stat.st_mtime_ns))
+        if len(pending) == 0:
+            return CatalogUpdate(0, unchanged, [])
+
+        arguments = zip(*pending)
+        if workers == 1:
+            results = map(_summarize_file, *arguments)
+            return self._store(pending, results, unchanged)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_summarize_file, *arguments, chunksize=16)
+            return self._store(pending, results, unchanged)
+
+    def _store(self, pending: List[tuple], results, unchanged: int) -> CatalogUpdate:
+        insert = 'INSERT OR REPLACE INTO flights ({}) VALUES ({})'.format(', '.join(_COLUMNS),
+                                                                          ', '.join('?' * len(_COLUMNS)))
+        summarized = 0
+        errors = []
+        with self.connection:
+            for ((igc_file_path, _, _), (row, error)) in zip(pending, results):
+                if row is None:
+                    errors.append((igc_file_path, error))
+                else:
+                    self.connection.execute(insert, row)
+                    summarized += 1
+        return CatalogUpdate(summarized, unchanged, errors)
+
+    def remove_missing(self) -> int:
+        # drops the entries of deleted files, returns their number
+        missing = [(path,) for (path,) in self.connection.execute('SELECT path FROM flights')
+                   if not os.path.exists(path)]
+        with self.connection:
+            self.connection.executemany('DELETE FROM flights WHERE path = ?', missing)
+        return len(missing)
+
+    def find(self, pilot_name: Optional[str] = None, glider_id: Optional[str] = None,
+             flight_recorder_type: Optional[str] = None, date_from: Optional[datetime.date] = None,
+             date_to: Optional[datetime.date] = None,
+             bounding_box: Optional[Tuple[float, float, float, float]] = None) -> List[str]:
+        # Paths of the flights matching all given criteria, ordered by date and path. Names and recorder types
+        # match case insensitive substrings, glider ids match case insensitive, the dates are inclusive and the
+        # bounding box (south, west, north, east) in degrees has to intersect the one of the flight.
+        conditions = []
+        parameters = []
+        if pilot_name is not None:
+            conditions.append("(pilot_name LIKE ? ESCAPE '\\' OR second_pilot_name LIKE ? ESCAPE '\\')")
+            parameters += [_like_pattern(pilot_name)] * 2
+        if glider_id is not None:
+            conditions.append('glider_id = ? COLLATE NOCASE')
+            parameters.append(glider_id)
+        if flight_recorder_type is not None:
+            conditions.append("flight_recorder_type LIKE ? ESCAPE '\\'")
+            parameters.append(_like_pattern(flight_recorder_type))
+        if date_from is not None:
+            conditions.append('flight_date >= ?')
+            parameters.append(date_from.isoformat())
+        if date_to is not None:
+            conditions.append('flight_date <= ?')
+            parameters.append(date_to.isoformat())
+        if bounding_box is not None:
+            (south, west, north, east) = bounding_box
+            conditions.append('max_latitude >= ? AND min_latitude <= ? AND max_longitude >= ? AND min_longitude <= ?')
+            parameters += [south, north, west, east]
+
+        statement = 'SELECT path FROM flights'
+        if conditions:
+            statement += ' WHERE ' + ' AND '.join(conditions)
+        statement += ' ORDER BY flight_date, path'
+        return [path for (path,) in self.connection.execute(statement, parameters)]
+
+
+def _like_pattern(text: str) -> str:
+    return '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+# Input set of IGCConverter: the flights of the catalog at database_path matching the criteria of FlightCatalog.find
+class CatalogQuery:
+    def __init__(self, database_path: str, **criteria):
+        self.database_path = database_path
+        self.criteria = criteria
+
+    def igc_files(self) -> List[str]:
+        with FlightCatalog(self.database_path, create=False) as catalog:
+            return catalog.find(**self.criteria)
+
+    def __str__(self):
+        return '{} ({})'.format(self.database_path, ', '.join('{}={}'.format(name, value)
+                                                              for (name, value) in self.criteria.items()))
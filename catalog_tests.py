@@ -0,0 +1,90 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+from catalog import CatalogQuery, FlightCatalog
+from igcconverter import IGCConverter, find_igc_files
+
+
+class FlightCatalogTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.igc_directory = os.path.join(self.directory, 'flights')
+        shutil.copytree('igc', os.path.join(self.igc_directory, '2020'))
+        os.rename(os.path.join(self.igc_directory, '2020', 'test.igc'), os.path.join(self.igc_directory, 'test.igc'))
+        self.database_path = os.path.join(self.directory, 'catalog.sqlite')
+        self.catalog = FlightCatalog(self.database_path)
+        self.addCleanup(self.catalog.close)
+
+    def _path(self, *names) -> str:
+        return os.path.abspath(os.path.join(self.igc_directory, *names))
+
+    def test_unchanged_files_are_skipped(self):
+        igc_files = find_igc_files(self.igc_directory)
+        update = self.catalog.update(igc_files, workers=1)
+        self.assertEqual((update.summarized, update.unchanged, update.errors), (len(igc_files), 0, []))
+        self.assertEqual(len(self.catalog), len(igc_files))
+
+        with open(self._path('test.igc'), 'a') as igc_file:
+            igc_file.write('LXXXappended comment\n')
+        update = self.catalog.update(igc_files, workers=1)
+        self.assertEqual((update.summarized, update.unchanged), (1, len(igc_files) - 1))
+
+    def test_update_with_worker_processes(self):
+        igc_files = find_igc_files(self.igc_directory)
+        self.assertEqual(self.catalog.update(igc_files, workers=2).summarized, len(igc_files))
+        self.assertEqual(sorted(self.catalog.find()), sorted(os.path.abspath(path) for path in igc_files))
+
+    def test_summary(self):
+        self.catalog.update([self._path('test.igc')], workers=1)
+        row = self.catalog.connection.execute(
+            'SELECT flight_date, flight_recorder_type, manufacturer_code, start_time, end_time, fix_count '
+            'FROM flights').fetchone()
+        self.assertEqual(row, ('2019-05-25', 'LXNAV,LX8000', 'LXV', '2019-05-25T15:22:29Z', '2019-05-25T15:43:09Z',
+                               159))
+
+    def test_unparsable_files_are_reported(self):
+        with open(self._path('broken.igc'), 'w') as igc_file:
+            igc_file.write('HFTZNTIMEZONE:X\n')  # malformed time zone
+        update = self.catalog.update([self._path('broken.igc'), self._path('test.igc')], workers=1)
+        self.assertEqual(update.summarized, 1)
+        self.assertEqual([path for (path, _) in update.errors], [self._path('broken.igc')])
+
+    def test_find(self):
+        self.catalog.update(find_igc_files(self.igc_directory), workers=1)
+        self.assertEqual(self.catalog.find(pilot_name='COTE'), [self._path('2020', '06ed9wl1.igc')])
+        self.assertEqual(self.catalog.find(glider_id='c-flps'), [self._path('2020', '06ed9wl1.igc')])
+        self.assertEqual(self.catalog.find(flight_recorder_type='lxnav'),
+                         [self._path('test.igc'), self._path('2020', 'vol GD 12sept20.igc')])
+        self.assertEqual(self.catalog.find(flight_recorder_type='%'), [])
+        self.assertEqual(self.catalog.find(date_from=datetime.date(2020, 6, 14), date_to=datetime.date(2020, 6, 14)),
+                         [self._path('2020', '06ed9wl1.igc')])
+        self.assertEqual(self.catalog.find(bounding_box=(46.5, -73.5, 47.0, -72.0)),
+                         [self._path('2020', '06ed9wl1.igc')])
+
+    def test_remove_missing(self):
+        self.catalog.update(find_igc_files(self.igc_directory), workers=1)
+        os.remove(self._path('test.igc'))
+        self.assertEqual(self.catalog.remove_missing(), 1)
+        self.assertNotIn(self._path('test.igc'), self.catalog.find())
+
+    def test_converter_input(self):
+        self.catalog.update(find_igc_files(self.igc_directory), workers=1)
+        converter = IGCConverter(CatalogQuery(self.database_path, flight_recorder_type='LX8000'), 'csv',
+                                 use_cache=False)
+        converter.convert_igc()
+        self.assertTrue(os.path.isfile(os.path.join(self.igc_directory, 'test.csv')))
+        self.assertFalse(os.path.isfile(os.path.join(self.igc_directory, '2020', '06ed9wl1.csv')))
+
+    def test_query_of_a_missing_catalog(self):
+        missing_path = os.path.join(self.igc_directory, 'missing.sqlite')
+        with self.assertRaisesRegex(RuntimeError, 'No flight catalog'):
+            CatalogQuery(missing_path).igc_files()
+        self.assertFalse(os.path.exists(missing_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,17 +1,26 @@
-from igcconverter import IGCConverter, ConversionProgressObserver, IGCConverterExceptionObserver
+from catalog import FlightCatalog
+from igcconverter import IGCConverter, ConversionProgressObserver, IGCConverterExceptionObserver, get_igc_files, \
+    find_igc_files
+from igcparser import scan_header
+from typing import Optional
+import os
 import re
 
 
 class IGCConverterCLI(ConversionProgressObserver, IGCConverterExceptionObserver):
-    def __init__(self):
+    def __init__(self, **converter_options):
+        self.converter_options = converter_options  # keyword arguments of IGCConverter
         self.num_converted_files = 0
         self.num_files_to_convert = 0
+        self.export_seconds = {}  # total export duration per format
         self._prompt = '> '
         self._user_input = ''
         self._new_line_indentation = ' ' * 4
         self._formats_cmd_pattern = re.compile(r'formats?|fmts?', re.IGNORECASE)
         self._convert_cmd_pattern = re.compile(r"(conv?e?r?t?)")
         self._help_cmd_pattern = re.compile(r'help', re.IGNORECASE)
+        self._scan_cmd_pattern = re.compile(r'scan', re.IGNORECASE)
+        self._catalog_cmd_pattern = re.compile(r'catalog', re.IGNORECASE)
         self._quit_cmd_pattern = re.compile(r'quit')
 
     def mainloop(self):
@@ -23,8 +32,11 @@ class IGCConverterCLI(ConversionProgressObserver, IGCConverterExceptionObserver)
     @property
     def _help_text(self) -> str:
         s = 'Available commands: \n'
-        s += self._new_line_indentation + 'convert [input] [format] ... to convert igc files.\n'
+        s += self._new_line_indentation + 'convert [input] [format[,format...]] ... to convert igc files.\n'
         s += self._new_line_indentation + 'formats ... to get a list of available formats.\n'
+        s += self._new_line_indentation + 'scan [directory] ... to list the flights of a directory (headers only).\n'
+        s += self._new_line_indentation + 'catalog [database] [directory] ... to add the flights of a directory tree ' \
+                                          'to a catalog.\n'
         s += self._new_line_indentation + 'quit ... to quit.\n'
         s += self._new_line_indentation + 'help ... to view this help.'
         return s
@@ -35,10 +47,16 @@ class IGCConverterCLI(ConversionProgressObserver, IGCConverterExceptionObserver)
     def on_conversion_started(self, num_items: int):
         self.num_converted_files = 0
         self.num_files_to_convert = num_items
+        self.export_seconds = {}
 
     def on_conversion_completed(self):
         print('Conversion completed.')
         print('Converted {} files.'.format(self.num_converted_files))
+        for (output_format, seconds) in self.export_seconds.items():
+            print('{}{} export: {:.2f} s'.format(self._new_line_indentation, output_format, seconds))
+
+    def on_format_exported(self, filename, output_format: str, seconds: float):
+        self.export_seconds[output_format] = self.export_seconds.get(output_format, 0.0) + seconds
 
     def on_file_converted(self, filename):
         # print('Converted {}'.format(filename))
@@ -56,22 +74,68 @@ class IGCConverterCLI(ConversionProgressObserver, IGCConverterExceptionObserver)
             self._handle_convert_cmd()
         elif re.match(self._formats_cmd_pattern, self._user_input):
             self._handle_formats_cmd()
+        elif re.match(self._scan_cmd_pattern, self._user_input):
+            self._handle_scan_cmd()
+        elif re.match(self._catalog_cmd_pattern, self._user_input):
+            self._handle_catalog_cmd()
         else:
             print("Invalid command: '{}'".format(self._user_input))
             self._handle_help_cmd()
 
+    def convert(self, source, output_format):
+        converter = IGCConverter(source, output_format, **self.converter_options)
+        converter.add_exception_observer(self)
+        converter.add_progress_observer(self)
+        converter.convert_igc()
+
+    def merge(self, source, destination_path: str):
+        converter = IGCConverter(source, 'acmi', **self.converter_options)
+        converter.add_exception_observer(self)
+        converter.add_progress_observer(self)
+        converter.merge_igc(destination_path)
+
+    def update_catalog(self, database_path: str, directory: str, workers: Optional[int] = 1):
+        with FlightCatalog(database_path) as catalog:
+            update = catalog.update(find_igc_files(directory), workers)
+            num_removed = catalog.remove_missing()
+            for (igc_file, message) in update.errors:
+                print('Skipped {}: {}'.format(igc_file, message))
+            print('Catalog of {} flights: {} added or updated, {} unchanged, {} removed, {} failed.'.format(
+                len(catalog), update.summarized, update.unchanged, num_removed, len(update.errors)))
+
     def _handle_convert_cmd(self):
-        match = re.match(r"(conv?e?r?t?)\s+(\w+)\s+(\w+)", self._user_input)
+        match = re.match(r"(conv?e?r?t?)\s+(\w+)\s+([\w.]+(?:,[\w.]+)*)", self._user_input)
         if not match:
-            print("invalid syntax, use: 'convert [input] [format]'")
+            print("invalid syntax, use: 'convert [input] [format[,format...]]'")
             return
 
-        source = match.group(2)
-        output_format = match.group(3)
-        converter = IGCConverter(source, output_format)
-        converter.add_exception_observer(self)
-        converter.add_progress_observer(self)
-        converter.convert_igc()
+        self.convert(match.group(2), match.group(3).split(','))
+
+    def _handle_catalog_cmd(self):
+        match = re.match(r"catalog\s+(\S+)\s+(.+)", self._user_input, re.IGNORECASE)
+        if not match or not os.path.isdir(match.group(2)):
+            print("invalid syntax, use: 'catalog [database] [directory]'")
+            return
+
+        self.update_catalog(match.group(1), match.group(2))
+
+    def _handle_scan_cmd(self):
+        match = re.match(r"scan\s+(.+)", self._user_input, re.IGNORECASE)
+        if not match or not os.path.isdir(match.group(1)):
+            print("invalid syntax, use: 'scan [directory]'")
+            return
+
+        for igc_file in get_igc_files(match.group(1)):
+            try:
+                flight_info = scan_header(igc_file)
+            except Exception as e:
+                self.on_exception_raised(e)
+                continue
+            print(' | '.join([os.path.basename(igc_file),
+                              '{}-{}-{}'.format(*flight_info.header.flight_date),
+                              flight_info.header.pilot_name,
+                              flight_info.header.glider_id,
+                              flight_info.header.flight_recorder_type]))
 
     def _handle_formats_cmd(self):
         s = 'Available formats: \n'
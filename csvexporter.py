@@ -1,56 +1,65 @@
 from exporter import FlightInfoExporter, FlightInfo
+from flight import format_igc_times, format_igc_latitudes, format_igc_longitudes
 import csv
-from typing import Optional
+import itertools
+from typing import Iterator, List, Optional
+
+# the Fix Validity text of the FixTable validity bytes, 0 marks a missing one
+_VALIDITY_TEXT = ('',) + tuple(chr(byte) for byte in range(1, 256))
 
 
 class CSVFlightInfoExporter(FlightInfoExporter):
-    def __init__(self):
+    ignored_record_types = ('L',)
+
+    StandardTitles = ('UTC Time', 'Longitude', 'Latitude', 'GPS Alt', 'Fix Validity', 'Pressure Altitude')
+    MetricTitles = ('Distance (m)', 'Ground Speed (km/h)', 'Vertical Speed (m/s)', 'Heading (deg)')
+    # rows are formatted and written this many at a time, so the memory use does not grow with the flight
+    row_batch_size = 1024
+
+    def __init__(self, metrics_window: Optional[int] = None):
+        self._check_metrics_window(metrics_window)
+        self.metrics_window = metrics_window
         self.flight_info: Optional[FlightInfo] = None
-        self.flight_data = {}  # timestamp to data list
-        self.titles = ['UTC Time', 'Longitude', 'Latitude', 'GPS Alt', 'Fix Validity', 'Pressure Altitude']
-        self.values = []
+        self.titles = list(self.StandardTitles)
         self.writer = None
 
     def _add_additional_titles(self):
-        # add additional titles from I record
-        for timed_flight_data in self.flight_info.timed_flight_data:
-            additional_titles = timed_flight_data.extension_values.keys()
-            for t in additional_titles:
-                if t not in self.titles:
-                    self.titles.append(t)
-
-    def _export_flight_data(self):
-        # Add values to table
-        for timed_flight_data in self.flight_info.timed_flight_data:
-            # standard values
-            values = [timed_flight_data.utc_time, timed_flight_data.longitude, timed_flight_data.latitude,
-                      timed_flight_data.gps_altitude,
-                      timed_flight_data.fix_validity, timed_flight_data.pressure_altitude]
+        # I record, metric and J record columns follow the standard ones
+        self.titles = list(self.StandardTitles)
+        self.titles.extend(self.flight_info.fixes.extension_titles)
+        if self.metrics_window is not None:
+            self.titles.extend(self.MetricTitles)
+        self.titles.extend(self._k_titles())
 
-            self.flight_data[timed_flight_data.utc_time] = values
-
-            # optional values
-            if timed_flight_data.extension_values is not None:
-                for (title, value) in timed_flight_data.extension_values.items():
-                    index = self.titles.index(title)
-                    values.insert(index, value)
-
-            self.values.append(values)
-
-    def _export_j_and_k_sections(self):
+    def _k_titles(self) -> List[str]:
         if self.flight_info.j_section is None:
-            return
+            return []
+        return list(self.flight_info.j_section.flight_data_indices)
 
-        # TODO: Make sure value is always aligned with table title
-        # Add values to table
+    def _metric_columns(self) -> list:
+        m = self._compute_metrics(self.flight_info, self.metrics_window)
+        return [('%.1f' % v for v in m.distance), ('%.1f' % (v * 3.6) for v in m.ground_speed),
+                ('%.2f' % v for v in m.vertical_speed), ('%.1f' % v for v in m.heading)]
 
-        for k_section in self.flight_info.k_sections:
-            utc_time = k_section.utc_timestamp
+    def _iter_rows(self) -> Iterator[tuple]:
+        # the rows of the table in the layout of self.titles, one per fix, built from the FixTable columns
+        fixes = self.flight_info.fixes
+        columns = [format_igc_times(fixes.time), format_igc_longitudes(fixes.longitude),
+                   format_igc_latitudes(fixes.latitude), map('%05d'.__mod__, fixes.gps_altitude),
+                   map(_VALIDITY_TEXT.__getitem__, fixes.fix_validity), map('%05d'.__mod__, fixes.pressure_altitude)]
+        for (column, width) in zip(fixes.extension_columns, fixes.extension_widths):
+            columns.append(column if type(column) is list else map('%0{}d'.format(width).__mod__, column))
+        if self.metrics_window is not None:
+            columns += self._metric_columns()
+        rows = zip(*columns)
+        k_titles = self._k_titles()
+        if not k_titles:
+            return rows
+        return self._iter_rows_with_k_values(rows, k_titles)
 
-            for (title, value) in k_section.flight_data_values.items():
-                if title not in self.titles:
-                    self.titles.append(title)
-                self.flight_data[utc_time].append(value)
+    def _iter_rows_with_k_values(self, rows, k_titles: List[str]) -> Iterator[tuple]:
+        for (row, k_values) in zip(rows, self.flight_info.iter_k_values(k_titles)):
+            yield row + k_values
 
     def _export_header(self):
         self.writer.writerow(["Flight Date", "{}-{}-{}".format(*self.flight_info.header.flight_date)])
@@ -69,8 +78,7 @@ class CSVFlightInfoExporter(FlightInfoExporter):
             self._export_header()
             self.writer.writerow([])  # new line
             self._add_additional_titles()
-            self._export_flight_data()
-            self._export_j_and_k_sections()
-
             self.writer.writerow(self.titles)
-            self.writer.writerows(self.values)
+            rows = self._iter_rows()
+            for batch in iter(lambda: list(itertools.islice(rows, self.row_batch_size)), []):
+                self.writer.writerows(batch)
@@ -2,6 +2,8 @@ import unittest
 from igcparser import IGCParser
 from csvexporter import CSVFlightInfoExporter
 import csv
+import os
+import tempfile
 
 
 class CSVExporterTests(unittest.TestCase):
@@ -17,28 +19,73 @@ class CSVExporterTests(unittest.TestCase):
     def test_csv_exporter(self):
         self.exporter.export(self.parser.flight_info, self.export_file_name)
 
+        self.addCleanup(os.remove, self.export_file_name)
+
+        with open(self.export_file_name, newline='') as csvfile:
+            rows = list(csv.reader(csvfile))
+        # the header rows are followed by a blank row and the table
+        titles_index = rows.index([]) + 1
+        titles = rows[titles_index]
+        self.assertEqual(titles, ['UTC Time', 'Longitude', 'Latitude', 'GPS Alt', 'Fix Validity',
+                                  'Pressure Altitude', 'FXA', 'ENL', 'TAS', 'GSP', 'TRT', 'VAT', 'OAT', 'ACZ',
+                                  'WDI', 'WVE'])
+        fix_rows = rows[titles_index + 1:]
+        self.assertEqual(len(fix_rows), len(self.parser.flight_info.fixes))
+        for row in fix_rows:
+            self.assertEqual(len(row), len(titles))
+
+        row = fix_rows[30]
+        self.assertEqual(row[0], '152310')  # UTC time
+        self.assertEqual(row[1], '07249366W')  # Longitude
+        self.assertEqual(row[2], '4538071N')  # Latitude
+        self.assertEqual(row[3], '00081')  # GPS ALT
+        self.assertEqual(row[4], 'A')  # Fix validity
+        self.assertEqual(row[5], '00022')  # Pressure ALT
+        self.assertEqual(row[6], '007')  # Fix Value
+        self.assertEqual(row[7], '001')  # ENL
+        self.assertEqual(row[8], '10454')  # TAS
+        self.assertEqual(row[9], '12720')  # GSP
+        self.assertEqual(row[10], '314')  # TRT
+        self.assertEqual(row[11], '00192')  # VAT
+        self.assertEqual(row[12], '0242')  # OAT
+        self.assertEqual(row[13], '0130')  # ACZ
+        self.assertEqual(row[14:], ['138', '00137'])  # WDI and WVE of the K record at 152310
+
+        # K values are carried forward to the following fixes and are empty before the first K record
+        self.assertEqual(fix_rows[29][14:], ['', ''])
+        self.assertEqual(fix_rows[31][14:], ['138', '00137'])
+
+    def test_free_text_values_are_quoted(self):
+        self.addCleanup(os.remove, self.export_file_name)
+        self.parser.flight_info.k_sections[0].flight_data_values['WDI'] = '1,"38"'
+        self.exporter.export(self.parser.flight_info, self.export_file_name)
+        with open(self.export_file_name, newline='') as csvfile:
+            rows = list(csv.reader(csvfile))
+        self.assertEqual(rows[rows.index([]) + 2 + 30][14:], ['1,"38"', '00137'])
+
+    def test_delimiters_and_quotes_in_fix_fields(self):
+        self.addCleanup(os.remove, self.export_file_name)
+        handle, igc_file_path = tempfile.mkstemp(suffix='.igc')
+        with os.fdopen(handle, 'w') as igc_file:
+            igc_file.write('HFDTE250519\nI013638FXA\nB1200004538002N07249279W,-0094000401"2\n')
+        self.addCleanup(os.remove, igc_file_path)
+        self.exporter.export(IGCParser(igc_file_path).flight_info, self.export_file_name)
+        with open(self.export_file_name, newline='') as csvfile:
+            rows = list(csv.reader(csvfile))
+        self.assertEqual(rows[rows.index([]) + 2:],
+                         [['120000', '07249279W', '4538002N', '00040', ',', '-0094', '1"2']])
+
+    def test_rows_are_written_in_batches(self):
+        self.addCleanup(os.remove, self.export_file_name)
+        self.exporter.export(self.parser.flight_info, self.export_file_name)
+        with open(self.export_file_name, newline='') as csvfile:
+            expected = csvfile.read()
+
+        # batch boundaries next to K records, the exporter is reusable
+        self.exporter.row_batch_size = 7
+        self.exporter.export(self.parser.flight_info, self.export_file_name)
         with open(self.export_file_name, newline='') as csvfile:
-            reader = csv.reader(csvfile)
-            for (i, row) in enumerate(reader):
-                if i == 0:
-                    self.assertEqual(row, ['UTC Time', 'Longitude', 'Latitude', 'GPS Alt', 'Fix Validity',
-                                           'Pressure Altitude', 'FXA', 'ENL', 'TAS', 'GSP', 'TRT', 'VAT', 'OAT', 'ACZ',
-                                           'WDI', 'WVE'])
-                elif i == 31:
-                    self.assertEqual(row[0], '152310')  # UTC time
-                    self.assertEqual(row[1], '07249366W')  # Longitude
-                    self.assertEqual(row[2], '4538071N')  # Latitude
-                    self.assertEqual(row[3], '00081')  # GPS ALT
-                    self.assertEqual(row[4], 'A')  # Fix validity
-                    self.assertEqual(row[5], '00022')  # Pressure ALT
-                    self.assertEqual(row[6], '007')  # Fix Value
-                    self.assertEqual(row[7], '001')  # ENL
-                    self.assertEqual(row[8], '10454')  # TAS
-                    self.assertEqual(row[9], '12720')  # GSP
-                    self.assertEqual(row[10], '314')  # TRT
-                    self.assertEqual(row[11], '00192')  # VAT
-                    self.assertEqual(row[12], '0242')  # OAT
-                    self.assertEqual(row[13], '0130')  # ACZ
+            self.assertEqual(csvfile.read(), expected)
 
 
 if __name__ == '__main__':
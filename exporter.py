@@ -1,8 +1,27 @@
 import abc
 from flight import FlightInfo
 
+try:
+    import metrics
+except ImportError:  # numpy is optional, only needed for the derived metric columns
+    metrics = None
+
 
 class FlightInfoExporter:
+    # IGC record types the exporter does not use, the parser skips them (see igcparser.RecordTypes)
+    ignored_record_types = ()
+    # keyword arguments of __init__, FlightInfoExporterFactory.create passes on only these
+    options = ('metrics_window',)
+
+    @staticmethod
+    def _check_metrics_window(metrics_window):
+        # exporters taking a metrics_window write the derived metrics (smoothed over that many fixes) unless None
+        if metrics_window is not None and metrics is None:
+            raise RuntimeError('derived metrics require numpy to be installed')
+
+    @staticmethod
+    def _compute_metrics(flight_info: FlightInfo, metrics_window: int):
+        return metrics.compute_metrics(flight_info.fixes, metrics_window)
 
     @abc.abstractmethod
     def export(self, flight_info: FlightInfo, destination_path: str):
@@ -1,19 +1,28 @@
 from exporter import FlightInfoExporter
 from csvexporter import CSVFlightInfoExporter
-from acmitacviewflightinfoexporter import AcmiTacViewFlightInfoExporter
+from acmitacviewflightinfoexporter import AcmiTacViewFlightInfoExporter, ZipAcmiTacViewFlightInfoExporter
 import os.path
 
 
 class FlightInfoExporterFactory:
-    SupportedFormats = ('csv', 'acmi-TacView')
+    SupportedFormats = ('csv', 'acmi-TacView', 'zip.acmi-TacView')
 
     def __init__(self):
-        self.exporters = {'csv': CSVFlightInfoExporter, 'acmi': AcmiTacViewFlightInfoExporter}
+        self.exporters = {'csv': CSVFlightInfoExporter, 'acmi': AcmiTacViewFlightInfoExporter,
+                          'zip.acmi': ZipAcmiTacViewFlightInfoExporter}
 
-    def create(self, destination_path: str) -> FlightInfoExporter:
-        extension = os.path.splitext(destination_path)[1].removeprefix('.')
+    def _extension(self, destination_path: str) -> str:
+        # the longest matching extension of the exporters, e.g. zip.acmi rather than acmi
+        filename = os.path.basename(destination_path)
+        matches = [extension for extension in self.exporters if filename.endswith('.' + extension)]
+        return max(matches, key=len) if matches else os.path.splitext(filename)[1].removeprefix('.')
+
+    def create(self, destination_path: str, **exporter_options) -> FlightInfoExporter:
+        extension = self._extension(destination_path)
         try:
-            return self.exporters[extension]()
+            exporter_class = self.exporters[extension]
         except KeyError:
             print('Unsupported extension: ' + extension)
             exit(0)
+        return exporter_class(**{name: value for (name, value) in exporter_options.items()
+                                 if name in exporter_class.options})
@@ -1,15 +1,24 @@
+import bisect
 import datetime
-from typing import Optional, Dict, Tuple, List
+import math
+import operator
+from array import array
+from collections.abc import Sequence
+from typing import Optional, Dict, Tuple, List, Iterable, Iterator
 
 
 # G section of IGC file
 class SecuritySection:
+    __slots__ = ('security_key',)
+
     def __init__(self):
         self.security_key: str = ''
 
 
 # K section of IGC file (infrequent timed data)
 class KSection:
+    __slots__ = ('utc_timestamp', 'flight_data_values')
+
     def __init__(self):
         self.utc_timestamp: str = ''
         self.flight_data_values: Dict[str, str] = {}  # maps title name to str value
@@ -20,6 +29,8 @@ class KSection:
 
 # J section of IGC file
 class JSection:
+    __slots__ = ('num_extensions', 'flight_data_indices')
+
     def __init__(self):
         self.num_extensions: int = 0
         self.flight_data_indices: Dict[str, Tuple[int, int]] = {}  # maps name to tuple(start, end)
@@ -29,6 +40,8 @@ class JSection:
 
 
 class GPSInfo:
+    __slots__ = ('info',)
+
     def __init__(self):
         self.info: str = ''
 
@@ -37,6 +50,8 @@ class GPSInfo:
 
 
 class PressureSensorInfo:
+    __slots__ = ('info',)
+
     def __init__(self):
         self.info: str = ''
 
@@ -46,9 +61,17 @@ class PressureSensorInfo:
 
 # I section of IGC file (defines what is appended to the timed data on B lines)
 class ExtensionHeader:
+    __slots__ = ('num_extensions', 'extended_data_indices', 'columns')
+
     def __init__(self):
         self.num_extensions: int = 0
         self.extended_data_indices: Dict[str, Tuple[int, int]] = {}  # maps name to tuple(start, end)
+        self.columns: Tuple[str, ...] = ()  # names in B record order, shared by the decoded TimedFlightData
+
+    def set_extension(self, name: str, start_index: int, end_index: int):
+        self.extended_data_indices[name] = (start_index, end_index)
+        if name not in self.columns:
+            self.columns += (name,)
 
     def __str__(self):
         res = 'num_extensions: ' + str(self.num_extensions) + '\n'
@@ -57,8 +80,13 @@ class ExtensionHeader:
 
 # B section of IGC file
 class TimedFlightData:
+    __slots__ = ('extension_columns', 'extension_data', 'utc_time', 'latitude', 'longitude', 'fix_validity',
+                 'pressure_altitude', 'gps_altitude')
+
     def __init__(self):
-        self.extension_values: Optional[Dict[str, str]] = None  # Information from I section
+        # Information from I section: values aligned to a column name tuple shared by all fixes
+        self.extension_columns: Optional[Tuple[str, ...]] = None
+        self.extension_data: Tuple[str, ...] = ()
         self.utc_time: str = ''
         self.latitude: str = ''
         self.longitude: str = ''
@@ -66,9 +94,488 @@ class TimedFlightData:
         self.pressure_altitude: str = ''
         self.gps_altitude: str = ''
 
+    @property
+    def extension_values(self) -> Optional[Dict[str, str]]:
+        if self.extension_columns is None:
+            return None
+        return dict(zip(self.extension_columns, self.extension_data))
+
+    @extension_values.setter
+    def extension_values(self, extension_values: Optional[Dict[str, str]]):
+        if extension_values is None:
+            self.extension_columns = None
+            self.extension_data = ()
+        else:
+            self.extension_columns = tuple(extension_values)
+            self.extension_data = tuple(extension_values.values())
+
+
+def parse_igc_time(utc_time: str) -> int:
+    # HHMMSS to seconds of day
+    return int(utc_time[0:2]) * 3600 + int(utc_time[2:4]) * 60 + int(utc_time[4:6])
+
+
+def format_igc_time(seconds: int) -> str:
+    seconds %= SECONDS_PER_DAY
+    return '%02d%02d%02d' % (seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def _parse_igc_coordinate(value: str, num_degree_digits: int, negative_hemisphere: str, positive_hemisphere: str) \
+        -> float:
+    hemisphere = value[num_degree_digits + 5:]
+    if hemisphere != positive_hemisphere and hemisphere != negative_hemisphere:
+        raise ValueError("invalid coordinate '{}'".format(value))
+    degrees = int(value[0:num_degree_digits]) + int(value[num_degree_digits:num_degree_digits + 5]) / 60000
+    return -degrees if hemisphere == negative_hemisphere else degrees
+
+
+def _format_igc_coordinate(degrees: float, num_degree_digits: int, negative_hemisphere: str,
+                           positive_hemisphere: str) -> str:
+    milli_minutes = round(abs(degrees) * 60000)
+    hemisphere = negative_hemisphere if math.copysign(1.0, degrees) < 0 else positive_hemisphere
+    return '%0*d%05d%s' % (num_degree_digits, milli_minutes // 60000, milli_minutes % 60000, hemisphere)
+
+
+def parse_igc_latitude(latitude: str) -> float:
+    # DDMMmmm[NS] to decimal degrees
+    return _parse_igc_coordinate(latitude, 2, 'S', 'N')
+
+
+def parse_igc_longitude(longitude: str) -> float:
+    # DDDMMmmm[EW] to decimal degrees
+    return _parse_igc_coordinate(longitude, 3, 'W', 'E')
+
+
+def format_igc_latitude(latitude: float) -> str:
+    return _format_igc_coordinate(latitude, 2, 'S', 'N')
+
+
+def format_igc_longitude(longitude: float) -> str:
+    return _format_igc_coordinate(longitude, 3, 'W', 'E')
+
+
+# Column versions of format_igc_time/format_igc_latitude/format_igc_longitude for the exporters, which format
+# whole FixTable columns without a TimedFlightData per fix
+def format_igc_times(times: Iterable[int]) -> Iterator[str]:
+    return ('%06d' % (seconds // 3600 % 24 * 10000 + seconds // 60 % 60 * 100 + seconds % 60) for seconds in times)
+
+
+def _format_igc_coordinates(column: Iterable[float], num_degree_digits: int, negative_hemisphere: str,
+                            positive_hemisphere: str) -> Iterator[str]:
+    # degrees and thousandths of minutes are formatted as one number, DDMMmmm = DD * 100000 + MMmmm
+    text_format = '%0{}d%s'.format(num_degree_digits + 5)
+    copysign = math.copysign
+    for degrees in column:
+        milli_minutes = round(abs(degrees) * 60000)
+        yield text_format % (milli_minutes + milli_minutes // 60000 * 40000,
+                             negative_hemisphere if degrees < 0 or (degrees == 0 and copysign(1.0, degrees) < 0)
+                             else positive_hemisphere)
+
+
+def format_igc_latitudes(latitudes: Iterable[float]) -> Iterator[str]:
+    return _format_igc_coordinates(latitudes, 2, 'S', 'N')
+
+
+def format_igc_longitudes(longitudes: Iterable[float]) -> Iterator[str]:
+    return _format_igc_coordinates(longitudes, 3, 'W', 'E')
+
+
+EARTH_RADIUS = 6371008.8  # mean radius in metres
+SECONDS_PER_DAY = 86400
+# B records carry the time of day only, a backwards jump larger than this is a pass through midnight UTC
+ROLLOVER_THRESHOLD = SECONDS_PER_DAY // 2
+
+_LATITUDE_HEMISPHERES = ('N', 'S')
+_LONGITUDE_HEMISPHERES = ('E', 'W')
+MAX_INT_EXTENSION_WIDTH = 18  # wider extension values do not fit into an int64 column
+
+
+def parse_b_record_fields(utc_time: str, latitude: str, longitude: str, fix_validity: str,
+                          pressure_altitude: str, gps_altitude: str) -> tuple:
+    # Decodes the text fields of a B record to the FixTable column values
+    # (seconds, degrees, degrees, validity byte, altitude, altitude), raises ValueError on malformed fields.
+    # Hot path of the parser, hence parse_igc_time/parse_igc_latitude/... are inlined.
+    time = int(utc_time)
+    lat = int(latitude[0:7])
+    lon = int(longitude[0:8])
+    lat_hemisphere = latitude[7:]
+    lon_hemisphere = longitude[8:]
+    if lat_hemisphere not in _LATITUDE_HEMISPHERES or lon_hemisphere not in _LONGITUDE_HEMISPHERES:
+        raise ValueError("invalid coordinates '{}' '{}'".format(latitude, longitude))
+    lat = lat // 100000 + lat % 100000 / 60000
+    lon = lon // 100000 + lon % 100000 / 60000
+    return (time // 10000 * 3600 + time // 100 % 100 * 60 + time % 100,
+            -lat if lat_hemisphere == 'S' else lat, -lon if lon_hemisphere == 'W' else lon,
+            _validity_byte(fix_validity), int(pressure_altitude), int(gps_altitude))
+
+
+def unwrap_seconds_of_day(seconds_of_day: Iterable[int]) -> Iterator[int]:
+    # monotonic seconds for consecutive UTC seconds of day, the rollover rule of FixTable.time
+    day_offset = 0
+    previous = None
+    for seconds in seconds_of_day:
+        seconds += day_offset
+        if previous is not None and seconds < previous - ROLLOVER_THRESHOLD:
+            day_offset += SECONDS_PER_DAY
+            seconds += SECONDS_PER_DAY
+        previous = seconds
+        yield seconds
+
+
+def _decode_coordinates(lines: List[str], start: int, end: int, negative_hemisphere: str,
+                        hemispheres: Tuple[str, str]) -> List[float]:
+    # the decimal degrees of the DDMMmmm / DDDMMmmm field at line[start:end] followed by the hemisphere
+    values = [int(line[start:end]) for line in lines]
+    line_hemispheres = [line[end:end + 1] for line in lines]
+    if not set(line_hemispheres).issubset(hemispheres):
+        raise ValueError('invalid coordinate hemisphere')
+    return [-(value // 100000 + value % 100000 / 60000) if hemisphere == negative_hemisphere
+            else value // 100000 + value % 100000 / 60000 for (value, hemisphere) in zip(values, line_hemispheres)]
+
+
+def _validity_byte(fix_validity: str) -> int:
+    # 0 marks a missing validity character
+    return ord(fix_validity.encode('ascii')) if len(fix_validity) == 1 else 0
+
+
+def extension_value_as_int(value: str, width: int) -> Optional[int]:
+    # the integer stored for an extension value, None if its text would not survive the round trip
+    if width > MAX_INT_EXTENSION_WIDTH:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        return None
+    return number if len(value) == width and '%0*d' % (width, number) == value else None
+
+
+def _extend_array(target: array, values):
+    target.frombytes(memoryview(values).cast('B'))
+
+
+def _take(column, indices: List[int]):
+    values = map(column.__getitem__, indices)
+    if type(column) is array:
+        return array(column.typecode, values)
+    return bytearray(values) if type(column) is bytearray else list(values)
+
+
+# Columnar storage of B records: one typed array per field instead of one TimedFlightData per fix
+class FixTable:
+    __slots__ = ('time', 'latitude', 'longitude', 'fix_validity', 'pressure_altitude', 'gps_altitude', 'has_extensions',
+                 'extension_titles', 'extension_widths', 'extension_columns', '_num_str_columns', '_day_offset')
+
+    def __init__(self, day_offset: int = 0):
+        # UTC seconds since midnight of the flight date, keeps increasing past SECONDS_PER_DAY after midnight
+        self.time = array('l')
+        self.latitude = array('d')  # decimal degrees, south is negative
+        self.longitude = array('d')  # decimal degrees, west is negative
+        self.fix_validity = bytearray()  # b'A' (3D fix) or b'V' per fix, 0 when missing
+        self.pressure_altitude = array('l')
+        self.gps_altitude = array('l')
+        self.has_extensions = False  # an I record was declared
+        self.extension_titles: Tuple[str, ...] = ()
+        self.extension_widths: List[int] = []
+        # one array('q') per I record column, a column falls back to a list of str when a value
+        # cannot be stored as an integer without changing its text
+        self.extension_columns: List = []
+        self._num_str_columns = 0
+        self._day_offset = day_offset  # added to the seconds of day of appended fixes
+
+    def __len__(self):
+        return len(self.time)
+
+    def set_extension_column(self, title: str, width: int):
+        self.has_extensions = True
+        if title in self.extension_titles:
+            self.extension_widths[self.extension_titles.index(title)] = width
+            return
+        self.extension_titles += (title,)
+        self.extension_widths.append(width)
+        if len(self) == 0 and width <= MAX_INT_EXTENSION_WIDTH:
+            self.extension_columns.append(array('q'))
+        else:
+            self.extension_columns.append([''] * len(self))
+            self._num_str_columns += 1
+
+    # time is the UTC seconds of day of the fix, midnight rollovers are detected against the previous fix
+    def append(self, time: int, latitude: float, longitude: float, fix_validity: str, pressure_altitude: int,
+               gps_altitude: int, extension_values: Tuple[str, ...] = ()):
+        self._append_fields(time, latitude, longitude, _validity_byte(fix_validity), pressure_altitude,
+                            gps_altitude, extension_values)
+
+    def append_record(self, utc_time: str, latitude: str, longitude: str, fix_validity: str,
+                      pressure_altitude: str, gps_altitude: str, extension_values: Tuple[str, ...] = ()):
+        # appends the raw text fields of a B record, raises ValueError on malformed fields
+        self._append_fields(*parse_b_record_fields(utc_time, latitude, longitude, fix_validity,
+                                                   pressure_altitude, gps_altitude), extension_values)
+
+    def _append_fields(self, time: int, latitude: float, longitude: float, fix_validity: int,
+                       pressure_altitude: int, gps_altitude: int, extension_values: Tuple[str, ...]):
+        time += self._day_offset
+        if self.time and time < self.time[-1] - ROLLOVER_THRESHOLD:
+            self._day_offset += SECONDS_PER_DAY
+            time += SECONDS_PER_DAY
+        self.time.append(time)
+        self.latitude.append(latitude)
+        self.longitude.append(longitude)
+        self.fix_validity.append(fix_validity)
+        self.pressure_altitude.append(pressure_altitude)
+        self.gps_altitude.append(gps_altitude)
+        if not extension_values:
+            return
+        joined_values = ''.join(extension_values)
+        if self._all_numeric_columns and joined_values.isdigit() and joined_values.isascii() \
+                and list(map(len, extension_values)) == self.extension_widths:
+            for (column, value) in zip(self.extension_columns, extension_values):
+                column.append(int(value))
+        else:
+            for (i, value) in enumerate(extension_values):
+                self._append_extension_value(i, value)
+
+    def extend_records(self, lines: List[str], extension_slices: Tuple[Tuple[int, int], ...] = ()):
+        # Bulk append_record of whole B record lines, decoded one column at a time instead of one record at a time.
+        # extension_slices are the python slices of the I record columns. Raises ValueError on malformed fields,
+        # nothing is appended then.
+        times = [int(line[1:7]) for line in lines]
+        latitudes = _decode_coordinates(lines, 7, 14, 'S', _LATITUDE_HEMISPHERES)
+        longitudes = _decode_coordinates(lines, 15, 23, 'W', _LONGITUDE_HEMISPHERES)
+        validities = [line[24:25] for line in lines]
+        joined_validities = ''.join(validities)
+        if len(joined_validities) == len(lines):
+            fix_validity = bytearray(joined_validities.encode('ascii'))
+        else:
+            fix_validity = bytearray(map(_validity_byte, validities))
+        pressure_altitudes = array(self.pressure_altitude.typecode, [int(line[25:30]) for line in lines])
+        gps_altitudes = array(self.gps_altitude.typecode, [int(line[30:35]) for line in lines])
+        extension_columns = [self._decode_extension_column(i, [line[start:end] for line in lines])
+                             for (i, (start, end)) in enumerate(extension_slices)]
+        time = [value // 10000 * 3600 + value // 100 % 100 * 60 + value % 100 for value in times]
+        if time and min(map(operator.sub, time[1:], time), default=0) < -ROLLOVER_THRESHOLD:
+            time = unwrap_seconds_of_day(time)
+        time = array(self.time.typecode, time)
+        self.extend_columns(time, array('d', latitudes), array('d', longitudes), fix_validity, pressure_altitudes,
+                            gps_altitudes, extension_columns)
+
+    def _decode_extension_column(self, index: int, values: List[str]):
+        # an array('q') of the values, or the values themselves when one of them cannot be stored as an integer
+        width = self.extension_widths[index]
+        joined_values = ''.join(values)
+        if width <= MAX_INT_EXTENSION_WIDTH and len(joined_values) == width * len(values) and joined_values.isascii():
+            if joined_values.isdigit():
+                return array('q', map(int, values))
+            try:
+                numbers = array('q', map(int, values))
+            except ValueError:
+                numbers = None
+            # signed values, the integers must format back to the same text
+            if numbers is not None and ''.join(map('%0{}d'.format(width).__mod__, numbers)) == joined_values:
+                return numbers
+        numbers = [extension_value_as_int(value, width) for value in values]
+        return values if None in numbers else array('q', numbers)
+
+    @property
+    def _all_numeric_columns(self) -> bool:
+        return self._num_str_columns == 0
+
+    def extend_columns(self, time, latitude, longitude, fix_validity, pressure_altitude, gps_altitude,
+                       extension_columns=()):
+        # Bulk append of whole columns. Numeric columns may be any buffer with the item type of the target
+        # array (e.g. numpy arrays), an extension column is either such a buffer or a list of str.
+        # Midnight rollovers within time must already be unwrapped, the block is shifted by whole days
+        # to continue the fixes of this table.
+        time = memoryview(time).cast('B').cast(self.time.typecode)
+        if len(time):
+            shift = self._day_offset
+            if self.time:
+                while time[0] + shift < self.time[-1] - ROLLOVER_THRESHOLD:
+                    shift += SECONDS_PER_DAY
+            if shift:
+                time = array(self.time.typecode, [t + shift for t in time])
+            self._day_offset = time[-1] // SECONDS_PER_DAY * SECONDS_PER_DAY
+        _extend_array(self.time, time)
+        _extend_array(self.latitude, latitude)
+        _extend_array(self.longitude, longitude)
+        self.fix_validity += fix_validity
+        _extend_array(self.pressure_altitude, pressure_altitude)
+        _extend_array(self.gps_altitude, gps_altitude)
+        for (i, values) in enumerate(extension_columns):
+            column = self.extension_columns[i]
+            if type(values) is list:
+                if type(column) is array:
+                    column = self._extension_column_as_str(i)
+                column.extend(values)
+            elif type(column) is array:
+                _extend_array(column, values)
+            else:
+                width = self.extension_widths[i]
+                column.extend('%0*d' % (width, v) for v in memoryview(values).cast('B').cast('q'))
+
+    def extend(self, other: 'FixTable'):
+        # appends the fixes of a table with the same extension columns
+        self.extend_columns(other.time, other.latitude, other.longitude, other.fix_validity, other.pressure_altitude,
+                            other.gps_altitude, other.extension_columns)
+
+    def take(self, indices: Iterable[int]) -> 'FixTable':
+        # a new table holding the fixes at indices (any iterable of ints, e.g. a numpy array), in that order
+        indices = list(indices)
+        table = FixTable()
+        for (title, width) in zip(self.extension_titles, self.extension_widths):
+            table.set_extension_column(title, width)
+        table.has_extensions = self.has_extensions
+        table.extend_columns(*[_take(column, indices) for column in (self.time, self.latitude, self.longitude,
+                                                                     self.fix_validity, self.pressure_altitude,
+                                                                     self.gps_altitude)],
+                             [_take(column, indices) for column in self.extension_columns])
+        return table
+
+    def _append_extension_value(self, index: int, value: str):
+        column = self.extension_columns[index]
+        if type(column) is array:
+            number = extension_value_as_int(value, self.extension_widths[index])
+            if number is not None:
+                column.append(number)
+                return
+            column = self._extension_column_as_str(index)
+        column.append(value)
+
+    def _extension_column_as_str(self, index: int) -> List[str]:
+        width = self.extension_widths[index]
+        column = ['%0*d' % (width, v) for v in self.extension_columns[index]]
+        self.extension_columns[index] = column
+        self._num_str_columns += 1
+        return column
+
+    def extension_value(self, column_index: int, fix_index: int) -> str:
+        value = self.extension_columns[column_index][fix_index]
+        if type(value) is str:
+            return value
+        return '%0*d' % (self.extension_widths[column_index], value)
+
+    def get(self, index: int) -> 'TimedFlightData':
+        data = TimedFlightData()
+        data.utc_time = format_igc_time(self.time[index])
+        data.latitude = format_igc_latitude(self.latitude[index])
+        data.longitude = format_igc_longitude(self.longitude[index])
+        data.fix_validity = chr(self.fix_validity[index]) if self.fix_validity[index] else ''
+        data.pressure_altitude = '%05d' % self.pressure_altitude[index]
+        data.gps_altitude = '%05d' % self.gps_altitude[index]
+        if self.has_extensions:
+            data.extension_columns = self.extension_titles
+            data.extension_data = tuple(self.extension_value(i, index) for i in range(len(self.extension_titles)))
+        return data
+
+    def append_timed_flight_data(self, data: 'TimedFlightData'):
+        if data.extension_values is not None:
+            for title in data.extension_values:
+                if title not in self.extension_titles:
+                    self.set_extension_column(title, len(data.extension_values[title]))
+        extension_values = ()
+        if self.has_extensions:
+            values = data.extension_values or {}
+            extension_values = tuple(values.get(title, '') for title in self.extension_titles)
+        self.append_record(data.utc_time, data.latitude, data.longitude, data.fix_validity,
+                           data.pressure_altitude, data.gps_altitude, extension_values)
+
+    @classmethod
+    def from_timed_flight_data(cls, timed_flight_data: Iterable['TimedFlightData']) -> 'FixTable':
+        table = cls()
+        for data in timed_flight_data:
+            table.append_timed_flight_data(data)
+        return table
+
+
+# Read-only sequence of TimedFlightData materialized on access from a FixTable, for exporters written
+# against the per-fix object model. Changes made to the returned objects are not stored.
+class TimedFlightDataView(Sequence):
+    __slots__ = ('_fixes',)
+
+    def __init__(self, fixes: FixTable):
+        self._fixes = fixes
+
+    def __len__(self):
+        return len(self._fixes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._fixes.get(i) for i in range(*index.indices(len(self._fixes)))]
+        if index < 0:
+            index += len(self._fixes)
+        if not 0 <= index < len(self._fixes):
+            raise IndexError('timed flight data index out of range')
+        return self._fixes.get(index)
+
+    def __iter__(self):
+        for i in range(len(self._fixes)):
+            yield self._fixes.get(i)
+
+    def append(self, data: 'TimedFlightData'):
+        self._fixes.append_timed_flight_data(data)
+
+
+def distance(latitude: float, longitude: float, other_latitude: float, other_longitude: float) -> float:
+    # great circle distance in metres (haversine)
+    (phi, other_phi) = (math.radians(latitude), math.radians(other_latitude))
+    a = math.sin((other_phi - phi) / 2) ** 2 + \
+        math.cos(phi) * math.cos(other_phi) * math.sin(math.radians(other_longitude - longitude) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+# Grid of latitude/longitude cells listing the fixes inside them, answers bounding box and radius queries by
+# visiting the overlapping cells only. Queries return the ascending fix indices as an array('q').
+class FixGrid:
+    __slots__ = ('cell_size', 'num_fixes', '_fixes', '_cells')
+
+    def __init__(self, fixes: FixTable, cell_size: float = 0.01):
+        self.cell_size = cell_size  # degrees, about 1 km in latitude
+        self.num_fixes = len(fixes)
+        self._fixes = fixes
+        self._cells: Dict[Tuple[int, int], array] = {}
+        for (index, (latitude, longitude)) in enumerate(zip(fixes.latitude, fixes.longitude)):
+            cell = (math.floor(latitude / cell_size), math.floor(longitude / cell_size))
+            indices = self._cells.get(cell)
+            if indices is None:
+                indices = self._cells[cell] = array('q')
+            indices.append(index)
+
+    def _candidates(self, min_latitude: float, min_longitude: float, max_latitude: float,
+                    max_longitude: float) -> Iterable[int]:
+        (min_row, max_row) = (math.floor(min_latitude / self.cell_size), math.floor(max_latitude / self.cell_size))
+        (min_column, max_column) = (math.floor(min_longitude / self.cell_size),
+                                    math.floor(max_longitude / self.cell_size))
+        if (max_row - min_row + 1) * (max_column - min_column + 1) > len(self._cells):
+            cells = [indices for ((row, column), indices) in self._cells.items()
+                     if min_row <= row <= max_row and min_column <= column <= max_column]
+        else:
+            cells = [self._cells[(row, column)] for row in range(min_row, max_row + 1)
+                     for column in range(min_column, max_column + 1) if (row, column) in self._cells]
+        return sorted(index for indices in cells for index in indices)
+
+    def in_bounding_box(self, min_latitude: float, min_longitude: float, max_latitude: float,
+                        max_longitude: float) -> array:
+        (latitudes, longitudes) = (self._fixes.latitude, self._fixes.longitude)
+        return array('q', (i for i in self._candidates(min_latitude, min_longitude, max_latitude, max_longitude)
+                           if min_latitude <= latitudes[i] <= max_latitude
+                           and min_longitude <= longitudes[i] <= max_longitude))
+
+    def within_radius(self, latitude: float, longitude: float, radius: float) -> array:
+        # fixes at most radius metres from the point, e.g. inside a turnpoint cylinder
+        latitude_span = math.degrees(radius / EARTH_RADIUS)
+        longitude_span = latitude_span / max(math.cos(math.radians(min(abs(latitude) + latitude_span, 90.0))), 1e-9)
+        (latitudes, longitudes) = (self._fixes.latitude, self._fixes.longitude)
+        candidates = self._candidates(latitude - latitude_span, longitude - longitude_span,
+                                      latitude + latitude_span, longitude + longitude_span)
+        return array('q', (i for i in candidates
+                           if distance(latitude, longitude, latitudes[i], longitudes[i]) <= radius))
+
 
 # H section of IGC file
 class Header:
+    __slots__ = ('flight_date', 'fix_accuracy', 'is_pilot_in_charge', 'pilot_name', 'second_pilot_name', 'glider_type',
+                 'glider_id', 'gps_datum', 'gps_datum_num', 'firmware_version', 'hardware_version',
+                 'flight_recorder_type', 'gps_info', 'pressure_sensor_info', 'tail_fin_number', 'glider_class',
+                 'time_zone')
+
     def __init__(self):
         self.flight_date: tuple = (0, 0, 0)  # YEAR, MONTH, DAY
         self.fix_accuracy: int = 0
@@ -113,6 +620,8 @@ class Header:
 
 # L section of IGC file (for 'Logbook' comments)
 class Comments:
+    __slots__ = ('lines',)
+
     def __init__(self):
         self.lines: List[str] = []  # stores raw lines of L section
 
@@ -125,6 +634,8 @@ class Comments:
 
 # D section of IGC file
 class DifferentialGPS:
+    __slots__ = ('gps_qualifier', 'dgps_station_id')
+
     def __init__(self):
         self.gps_qualifier: str = ''
         self.dgps_station_id: str = ''
@@ -135,6 +646,8 @@ class DifferentialGPS:
 
 # A section of IGC file
 class FlightRecorderInfo:
+    __slots__ = ('flight_recorder_manufacturer_code', 'flight_recorder_serial_number', 'daily_flight_number')
+
     def __init__(self):
         self.flight_recorder_manufacturer_code: str = 'XXX'
         self.flight_recorder_serial_number: str = ''  # a hex string
@@ -150,20 +663,62 @@ class FlightRecorderInfo:
 
 
 class PreflightDeclaration:
-    pass
+    __slots__ = ()
 
 
 # E section of the IGC file
 class Events:
-    pass
+    __slots__ = ()
+
+
+# Merge join of the K records onto a time ordered stream of fixes in O(fixes + K records). A K record is aligned to the
+# nearest preceding fix (the first fix for earlier ones) and its values are carried forward until the next K record,
+# '' before the first one. K records hold the UTC time of day only, they are placed on the timeline of the fixes
+# passed to advance: starting from the day of the first fix, a K time more than ROLLOVER_THRESHOLD before the current
+# fix is on the next day.
+class KRecordJoin:
+    __slots__ = ('titles', 'values', '_k_sections', '_next', '_day_offset')
+
+    def __init__(self, k_sections: List[KSection], titles: List[str]):
+        self.titles = titles
+        self.values = ('',) * len(titles)
+        self._k_sections = []
+        for k_section in k_sections:
+            try:
+                self._k_sections.append((parse_igc_time(k_section.utc_timestamp), k_section))
+            except ValueError:
+                pass  # no usable timestamp
+        self._next = 0
+        self._day_offset = None
+
+    def advance(self, fix_time: int, next_fix_time: float = math.inf) -> Tuple[str, ...]:
+        # the values of the fix at fix_time (monotonic seconds as in FixTable.time) followed by a fix at next_fix_time,
+        # math.inf for the last fix. Fixes are passed in time order.
+        if self._day_offset is None:
+            self._day_offset = fix_time // SECONDS_PER_DAY * SECONDS_PER_DAY
+        while self._next < len(self._k_sections):
+            (seconds, k_section) = self._k_sections[self._next]
+            k_time = seconds + self._day_offset
+            if k_time < fix_time - ROLLOVER_THRESHOLD:
+                self._day_offset += SECONDS_PER_DAY
+                continue
+            if k_time >= next_fix_time:
+                break
+            k_values = k_section.flight_data_values
+            self.values = tuple(k_values.get(title, value) for (title, value) in zip(self.titles, self.values))
+            self._next += 1
+        return self.values
 
 
 class FlightInfo:
+    __slots__ = ('header', 'extension_header', 'flight_recorder_info', 'fixes', 'comments', 'differential_gps',
+                 'k_sections', 'j_section', 'security', 'preflight_declaration', 'events', '_fix_grid')
+
     def __init__(self):
         self.header = Header()
         self.extension_header = ExtensionHeader()
         self.flight_recorder_info = FlightRecorderInfo()
-        self.timed_flight_data: List[TimedFlightData] = []
+        self.fixes = FixTable()  # B records
         self.comments = Comments()
         self.differential_gps: Optional[DifferentialGPS] = None
         self.k_sections: List[KSection] = []
@@ -171,6 +726,73 @@ class FlightInfo:
         self.security = SecuritySection()
         self.preflight_declaration = PreflightDeclaration()
         self.events = Events()
+        self._fix_grid: Optional[FixGrid] = None
+
+    @property
+    def reference_time(self) -> Optional[datetime.datetime]:
+        # midnight UTC of the flight date (HFDTE), fixes.time counts the seconds since then
+        try:
+            (year, month, day) = (int(value) for value in self.header.flight_date)
+            return datetime.datetime(2000 + year, month, day, tzinfo=datetime.timezone.utc)  # assume 21st century
+        except ValueError:
+            return None
+
+    def fix_time(self, index: int) -> Optional[datetime.datetime]:
+        reference_time = self.reference_time
+        if reference_time is None:
+            return None
+        return reference_time + datetime.timedelta(seconds=self.fixes.time[index])
+
+    def iter_k_values(self, titles: List[str]) -> Iterator[Tuple[str, ...]]:
+        # the K record values of titles for every fix, see KRecordJoin
+        join = KRecordJoin(self.k_sections, titles)
+        time = self.fixes.time
+        for i in range(len(time) - 1):
+            yield join.advance(time[i], time[i + 1])
+        if len(time) > 0:
+            yield join.advance(time[-1])
+
+    def _time_offset(self, value) -> float:
+        # seconds since reference_time of a datetime (naive ones are UTC), a time of day on the flight date,
+        # or a number of seconds
+        if isinstance(value, datetime.datetime):
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=datetime.timezone.utc)
+            if self.reference_time is None:
+                raise RuntimeError('the flight date is unknown')
+            return (value - self.reference_time).total_seconds()
+        if isinstance(value, datetime.time):
+            return value.hour * 3600 + value.minute * 60 + value.second + value.microsecond / 1e6
+        return value
+
+    def time_range(self, start, end) -> slice:
+        # slice of the fixes recorded from start to end inclusive, found by binary search over fixes.time
+        time = self.fixes.time
+        return slice(bisect.bisect_left(time, self._time_offset(start)),
+                     bisect.bisect_right(time, self._time_offset(end)))
+
+    @property
+    def fix_grid(self) -> FixGrid:
+        # built on first use and again whenever the fixes change
+        if self._fix_grid is None or self._fix_grid._fixes is not self.fixes or \
+                self._fix_grid.num_fixes != len(self.fixes):
+            self._fix_grid = FixGrid(self.fixes)
+        return self._fix_grid
+
+    def fixes_in_bounding_box(self, min_latitude: float, min_longitude: float, max_latitude: float,
+                              max_longitude: float) -> array:
+        return self.fix_grid.in_bounding_box(min_latitude, min_longitude, max_latitude, max_longitude)
+
+    def fixes_within_radius(self, latitude: float, longitude: float, radius: float) -> array:
+        return self.fix_grid.within_radius(latitude, longitude, radius)
+
+    @property
+    def timed_flight_data(self) -> TimedFlightDataView:
+        return TimedFlightDataView(self.fixes)
+
+    @timed_flight_data.setter
+    def timed_flight_data(self, timed_flight_data: Iterable[TimedFlightData]):
+        self.fixes = FixTable.from_timed_flight_data(timed_flight_data)
 
     def __str__(self):
         res = ''
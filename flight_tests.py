@@ -0,0 +1,194 @@
+import datetime
+import unittest
+from flight import FixTable, FlightInfo, KSection, TimedFlightData, parse_igc_latitude, parse_igc_longitude, \
+    format_igc_latitude, format_igc_longitude, format_igc_latitudes, format_igc_longitudes, format_igc_time, \
+    format_igc_times, distance
+from igcparser import IGCParser
+
+
+class FixTableTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.fixes = FixTable()
+        self.fixes.set_extension_column('FXA', 3)
+        self.fixes.set_extension_column('SIU', 2)
+
+    def test_coordinates_round_trip(self):
+        for latitude in ('4538002N', '0000000S', '8959999S'):
+            self.assertEqual(format_igc_latitude(parse_igc_latitude(latitude)), latitude)
+        for longitude in ('07249279W', '00000000E', '17959999E'):
+            self.assertEqual(format_igc_longitude(parse_igc_longitude(longitude)), longitude)
+
+    def test_column_formatting(self):
+        degrees = [45.6336667, -72.8213167, 0.0, -0.0, -0.0000083, 89.9999999, 179.9999917]
+        self.assertEqual(list(format_igc_latitudes(degrees)), [format_igc_latitude(value) for value in degrees])
+        self.assertEqual(list(format_igc_longitudes(degrees)), [format_igc_longitude(value) for value in degrees])
+        times = [0, 59, 3600, 86399, 86400, 90061]
+        self.assertEqual(list(format_igc_times(times)), [format_igc_time(value) for value in times])
+
+    def test_invalid_hemisphere_is_rejected(self):
+        self.assertRaises(ValueError, self.fixes.append_record, '151109', '4538002X', '07249279W', 'A', '-0094',
+                          '00040', ('001', '09'))
+        self.assertEqual(len(self.fixes), 0)
+
+    def test_columns_are_numeric(self):
+        self.fixes.append_record('151109', '4538002N', '07249279W', 'A', '-0094', '00040', ('001', '09'))
+        self.assertEqual(self.fixes.time[0], 15 * 3600 + 11 * 60 + 9)
+        self.assertAlmostEqual(self.fixes.latitude[0], 45 + 38.002 / 60)
+        self.assertAlmostEqual(self.fixes.longitude[0], -(72 + 49.279 / 60))
+        self.assertEqual(self.fixes.pressure_altitude[0], -94)
+        self.assertEqual(self.fixes.gps_altitude[0], 40)
+        self.assertEqual(self.fixes.extension_columns[0][0], 1)
+
+    def test_extend_records_matches_append_record(self):
+        lines = ['B2359594538002N07249279WA-00940004000109', 'B0000014538003S07249280EV0009400040-01-9',
+                 'B0000024538004N07249281WA0009400040-0109']
+        self.fixes.extend_records(lines, ((35, 38), (38, 40)))
+        expected = FixTable()
+        expected.set_extension_column('FXA', 3)
+        expected.set_extension_column('SIU', 2)
+        for line in lines:
+            expected.append_record(line[1:7], line[7:15], line[15:24], line[24:25], line[25:30], line[30:35],
+                                   (line[35:38], line[38:40]))
+        self.assertEqual(list(self.fixes.time), list(expected.time))
+        self.assertEqual(list(self.fixes.latitude), list(expected.latitude))
+        self.assertEqual(list(self.fixes.extension_columns[0]), [1, -1, -1])
+        self.assertEqual(list(self.fixes.extension_columns[1]), [9, -9, 9])
+
+    def test_timed_flight_data_view(self):
+        self.fixes.append_record('151109', '4538002N', '07249279W', 'A', '-0094', '00040', ('001', '09'))
+        self.fixes.append_record('151110', '4538003N', '07249280W', 'V', '-0093', '00041', ('002', ' 9'))
+        flight_info = FlightInfo()
+        flight_info.fixes = self.fixes
+
+        view = flight_info.timed_flight_data
+        self.assertEqual(len(view), 2)
+        self.assertEqual(view[-1].utc_time, '151110')
+        self.assertEqual(view[0].pressure_altitude, '-0094')
+        self.assertEqual(view[1].fix_validity, 'V')
+        self.assertEqual(view[0].extension_values, {'FXA': '001', 'SIU': '09'})
+        # non numeric values are kept verbatim
+        self.assertEqual(view[1].extension_values['SIU'], ' 9')
+        self.assertEqual([d.utc_time for d in view[0:2]], ['151109', '151110'])
+
+    def test_timed_flight_data_assignment(self):
+        data = TimedFlightData()
+        data.utc_time = '120000'
+        data.latitude = '4538002N'
+        data.longitude = '07249279W'
+        data.fix_validity = 'A'
+        data.pressure_altitude = '00100'
+        data.gps_altitude = '00120'
+        flight_info = FlightInfo()
+        flight_info.timed_flight_data = [data]
+
+        self.assertEqual(len(flight_info.fixes), 1)
+        self.assertIsNone(flight_info.timed_flight_data[0].extension_values)
+
+    def test_extension_values_share_columns(self):
+        self.fixes.append_record('151109', '4538002N', '07249279W', 'A', '-0094', '00040', ('001', '09'))
+        self.fixes.append_record('151110', '4538003N', '07249280W', 'V', '-0093', '00041', ('002', '08'))
+        (first, second) = (self.fixes.get(0), self.fixes.get(1))
+        self.assertIs(first.extension_columns, second.extension_columns)
+        self.assertEqual(second.extension_data, ('002', '08'))
+        self.assertFalse(hasattr(first, '__dict__'))
+
+        first.extension_values = {'ENL': '012'}
+        self.assertEqual(first.extension_columns, ('ENL',))
+        self.assertEqual(first.extension_values, {'ENL': '012'})
+
+    def test_take(self):
+        for (utc_time, siu) in (('235959', '09'), ('000000', ' 9'), ('000001', '07')):
+            self.fixes.append_record(utc_time, '4538002N', '07249279W', 'A', '-0094', '00040', ('001', siu))
+        taken = self.fixes.take([2, 0])
+        self.assertEqual(list(taken.time), [86401, 86399])
+        self.assertEqual(taken.extension_titles, ('FXA', 'SIU'))
+        self.assertEqual(taken.get(0).extension_values, {'FXA': '001', 'SIU': '07'})
+        self.assertEqual(len(self.fixes.take([])), 0)
+
+    def test_midnight_rollover(self):
+        for utc_time in ('235958', '235959', '000000', '000001'):
+            self.fixes.append_record(utc_time, '4538002N', '07249279W', 'A', '-0094', '00040', ('001', '09'))
+        self.assertEqual(list(self.fixes.time), [86398, 86399, 86400, 86401])
+        self.assertEqual(self.fixes.get(2).utc_time, '000000')
+
+        other = FixTable()
+        other.set_extension_column('FXA', 3)
+        other.set_extension_column('SIU', 2)
+        other.append_record('000002', '4538002N', '07249279W', 'A', '-0094', '00040', ('001', '09'))
+        self.fixes.extend(other)
+        self.assertEqual(self.fixes.time[-1], 86402)
+        self.fixes.append_record('000003', '4538002N', '07249279W', 'A', '-0094', '00040', ('001', '09'))
+        self.assertEqual(self.fixes.time[-1], 86403)
+
+    def test_fix_time(self):
+        flight_info = FlightInfo()
+        flight_info.fixes = self.fixes
+        self.assertIsNone(flight_info.reference_time)
+        flight_info.header.flight_date = ('19', '05', '25')
+        self.fixes.append_record('235959', '4538002N', '07249279W', 'A', '-0094', '00040', ('001', '09'))
+        self.fixes.append_record('000001', '4538002N', '07249279W', 'A', '-0094', '00040', ('001', '09'))
+        self.assertEqual(flight_info.fix_time(1),
+                         datetime.datetime(2019, 5, 26, 0, 0, 1, tzinfo=datetime.timezone.utc))
+
+    def test_k_values_are_joined_to_the_preceding_fix(self):
+        flight_info = FlightInfo()
+        flight_info.fixes = self.fixes
+        for utc_time in ('235950', '235955', '000000', '000005'):
+            self.fixes.append_record(utc_time, '4538002N', '07249279W', 'A', '-0094', '00040', ('001', '09'))
+        for (utc_timestamp, values) in (('235952', {'WDI': '100', 'WVE': '001'}), ('235953', {'WDI': '110'}),
+                                        ('xx0000', {'WDI': '999'}), ('000001', {'WDI': '120', 'WVE': '002'})):
+            k_section = KSection()
+            k_section.utc_timestamp = utc_timestamp
+            k_section.flight_data_values = values
+            flight_info.k_sections.append(k_section)
+        self.assertEqual(list(flight_info.iter_k_values(['WDI', 'WVE'])),
+                         [('110', '001'), ('110', '001'), ('120', '002'), ('120', '002')])
+        self.assertEqual(list(flight_info.iter_k_values([])), [()] * 4)
+
+        # a K record after midnight is placed on the timeline of the fixes, not on day 0
+        flight_info.fixes = FixTable()
+        for utc_time in ('235958', '000001', '000005', '000010'):
+            flight_info.fixes.append_record(utc_time, '4538002N', '07249279W', 'A', '-0094', '00040')
+        k_section = KSection()
+        k_section.utc_timestamp = '000003'
+        k_section.flight_data_values = {'WDI': '111'}
+        flight_info.k_sections = [k_section]
+        self.assertEqual([values for (values,) in flight_info.iter_k_values(['WDI'])], ['', '111', '111', '111'])
+
+
+class FlightInfoIndexTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.flight_info = IGCParser('igc/06ed9wl1.igc').flight_info
+        self.fixes = self.flight_info.fixes
+
+    def test_time_range(self):
+        time_range = self.flight_info.time_range(datetime.time(16, 5), datetime.time(16, 40))
+        self.assertEqual(self.flight_info.timed_flight_data[time_range.start].utc_time, '160500')
+        self.assertLessEqual(self.flight_info.timed_flight_data[time_range.stop - 1].utc_time, '164000')
+        self.assertGreater(self.flight_info.timed_flight_data[time_range.stop].utc_time, '164000')
+        start = self.flight_info.reference_time + datetime.timedelta(hours=16, minutes=5)
+        self.assertEqual(self.flight_info.time_range(start, start + datetime.timedelta(minutes=35)), time_range)
+        self.assertEqual(self.flight_info.time_range(16 * 3600 + 5 * 60, 16 * 3600 + 40 * 60), time_range)
+        self.assertEqual(self.flight_info.time_range(0, 60), slice(0, 0))
+
+    def test_spatial_queries_match_a_linear_scan(self):
+        (latitude, longitude) = (self.fixes.latitude[5000], self.fixes.longitude[5000])
+        self.assertEqual(list(self.flight_info.fixes_within_radius(latitude, longitude, 1000.0)),
+                         [i for i in range(len(self.fixes))
+                          if distance(latitude, longitude, self.fixes.latitude[i], self.fixes.longitude[i]) <= 1000.0])
+        box = (latitude - 0.02, longitude - 0.05, latitude + 0.01, longitude + 0.1)
+        self.assertEqual(list(self.flight_info.fixes_in_bounding_box(*box)),
+                         [i for i in range(len(self.fixes)) if box[0] <= self.fixes.latitude[i] <= box[2]
+                          and box[1] <= self.fixes.longitude[i] <= box[3]])
+        self.assertEqual(len(self.flight_info.fixes_in_bounding_box(-90.0, -180.0, 90.0, 180.0)), len(self.fixes))
+
+    def test_grid_follows_the_fixes(self):
+        self.assertEqual(len(self.flight_info.fixes_in_bounding_box(-90.0, -180.0, 90.0, 180.0)), len(self.fixes))
+        self.flight_info.fixes = self.fixes.take(range(10))
+        self.assertEqual(len(self.flight_info.fixes_in_bounding_box(-90.0, -180.0, 90.0, 180.0)), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,257 @@
+from flight import FlightInfo, KSection, JSection, DifferentialGPS, GPSInfo, PressureSensorInfo
+from igcparser import IGCParser, select_record_types
+from array import array
+from typing import BinaryIO, Optional
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+
+# Binary FlightInfo format: magic, format version and the length of a JSON document holding all sections but the
+# fixes, followed by the numeric fix columns as raw little endian arrays (integers in the narrowest item type that
+# holds the column). Text extension columns are kept in the JSON document.
+MAGIC = b'IGCF'
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct('<4sHQ')  # magic, version, metadata size
+_COLUMN = struct.Struct('<cQ')  # typecode, number of items
+
+
+def _as_little_endian(values: array) -> array:
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+def _narrowest_integer_typecode(values: array) -> str:
+    if len(values) == 0:
+        return 'b'
+    (low, high) = (min(values), max(values))
+    for typecode in ('b', 'h', 'i'):
+        limit = 1 << (array(typecode).itemsize * 8 - 1)
+        if -limit <= low and high < limit:
+            return typecode
+    return 'q'
+
+
+def _write_column(stream: BinaryIO, values: array, typecode: Optional[str] = None):
+    # integer columns are stored with the smallest item type holding all of their values
+    typecode = typecode or _narrowest_integer_typecode(values)
+    if values.typecode != typecode:
+        values = array(typecode, values)
+    stream.write(_COLUMN.pack(typecode.encode('ascii'), len(values)))
+    stream.write(_as_little_endian(values).tobytes())
+
+
+def _read_column(stream: BinaryIO, typecode: str) -> array:
+    (stored_typecode, num_items) = _COLUMN.unpack(stream.read(_COLUMN.size))
+    values = array(stored_typecode.decode('ascii'))
+    values.frombytes(stream.read(num_items * values.itemsize))
+    if len(values) != num_items:
+        raise ValueError('truncated fix column')
+    values = _as_little_endian(values)
+    return values if values.typecode == typecode else array(typecode, values)
+
+
+def _section_state(section) -> Optional[dict]:
+    if section is None:
+        return None
+    return {name: getattr(section, name) for name in type(section).__slots__}
+
+
+def _restore_section(section, state: dict):
+    for (name, value) in state.items():
+        setattr(section, name, value)
+    return section
+
+
+def dump_flight_info(flight_info: FlightInfo, stream: BinaryIO):
+    header = _section_state(flight_info.header)
+    for name in ('gps_info', 'pressure_sensor_info'):
+        if not isinstance(header[name], str):  # the parser stores the plain text
+            header[name] = _section_state(header[name])
+    fixes = flight_info.fixes
+    metadata = {
+        'header': header,
+        'flight_recorder_info': _section_state(flight_info.flight_recorder_info),
+        'extension_header': _section_state(flight_info.extension_header),
+        'differential_gps': _section_state(flight_info.differential_gps),
+        'j_section': _section_state(flight_info.j_section),
+        'k_sections': [(k.utc_timestamp, k.flight_data_values) for k in flight_info.k_sections],
+        'comments': flight_info.comments.lines,
+        'security_key': flight_info.security.security_key,
+        'fixes': {
+            'has_extensions': fixes.has_extensions,
+            'extension_titles': fixes.extension_titles,
+            'extension_widths': fixes.extension_widths,
+            # None for the integer columns stored after the metadata
+            'extension_columns': [column if type(column) is list else None for column in fixes.extension_columns],
+        },
+    }
+    encoded_metadata = json.dumps(metadata, separators=(',', ':')).encode('utf-8')
+    stream.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(encoded_metadata)))
+    stream.write(encoded_metadata)
+
+    _write_column(stream, fixes.time)
+    _write_column(stream, fixes.latitude, 'd')
+    _write_column(stream, fixes.longitude, 'd')
+    _write_column(stream, array('B', fixes.fix_validity), 'B')
+    _write_column(stream, fixes.pressure_altitude)
+    _write_column(stream, fixes.gps_altitude)
+    for column in fixes.extension_columns:
+        if type(column) is not list:
+            _write_column(stream, column)
+
+
+def load_flight_info(stream: BinaryIO) -> FlightInfo:
+    (magic, version, metadata_size) = _PREAMBLE.unpack(stream.read(_PREAMBLE.size))
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError('not a serialized flight info of format version {}'.format(FORMAT_VERSION))
+    metadata = json.loads(stream.read(metadata_size).decode('utf-8'))
+
+    flight_info = FlightInfo()
+    header = metadata['header']
+    if not isinstance(header['gps_info'], str):
+        header['gps_info'] = _restore_section(GPSInfo(), header['gps_info'])
+    if not isinstance(header['pressure_sensor_info'], str):
+        header['pressure_sensor_info'] = _restore_section(PressureSensorInfo(), header['pressure_sensor_info'])
+    header['flight_date'] = tuple(header['flight_date'])
+    _restore_section(flight_info.header, header)
+    _restore_section(flight_info.flight_recorder_info, metadata['flight_recorder_info'])
+    extension_header = metadata['extension_header']
+    extension_header['extended_data_indices'] = {name: tuple(indices) for (name, indices) in
+                                                 extension_header['extended_data_indices'].items()}
+    extension_header['columns'] = tuple(extension_header['columns'])
+    _restore_section(flight_info.extension_header, extension_header)
+    if metadata['differential_gps'] is not None:
+        flight_info.differential_gps = _restore_section(DifferentialGPS(), metadata['differential_gps'])
+    if metadata['j_section'] is not None:
+        j_section = metadata['j_section']
+        j_section['flight_data_indices'] = {name: tuple(indices) for (name, indices) in
+                                            j_section['flight_data_indices'].items()}
+        flight_info.j_section = _restore_section(JSection(), j_section)
+    for (utc_timestamp, flight_data_values) in metadata['k_sections']:
+        k_section = KSection()
+        k_section.utc_timestamp = utc_timestamp
+        k_section.flight_data_values = flight_data_values
+        flight_info.k_sections.append(k_section)
+    flight_info.comments.lines = metadata['comments']
+    flight_info.security.security_key = metadata['security_key']
+
+    fixes = flight_info.fixes
+    for (title, width) in zip(metadata['fixes']['extension_titles'], metadata['fixes']['extension_widths']):
+        fixes.set_extension_column(title, width)
+    fixes.has_extensions = metadata['fixes']['has_extensions']
+    columns = [_read_column(stream, fixes.time.typecode),
+               _read_column(stream, fixes.latitude.typecode),
+               _read_column(stream, fixes.longitude.typecode),
+               _read_column(stream, 'B').tobytes(),
+               _read_column(stream, fixes.pressure_altitude.typecode),
+               _read_column(stream, fixes.gps_altitude.typecode)]
+    extension_columns = [_read_column(stream, 'q') if column is None else column
+                         for column in metadata['fixes']['extension_columns']]
+    fixes.extend_columns(*columns, extension_columns)
+    return flight_info
+
+
+def default_cache_directory() -> str:
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'igcconverter')
+
+
+DEFAULT_MAX_CACHE_SIZE = 256 * 1024 * 1024  # bytes
+_CACHE_FILE_EXTENSION = '.igcf'
+_CONTENT_HASH_SIZE = hashlib.sha256().digest_size
+
+
+def _content_hash(igc_file_path: str) -> bytes:
+    # sha256 of the file as stored, compressed files are not decompressed
+    content_hash = hashlib.sha256()
+    with open(igc_file_path, 'rb') as igc_file:
+        for block in iter(lambda: igc_file.read(1024 * 1024), b''):
+            content_hash.update(block)
+    return content_hash.digest()
+
+
+# Directory of serialized FlightInfo entries. An entry is keyed by the path, size and modification time of the IGC
+# file and by the parsed record types. It starts with the content hash of the file, which is checked when the entry
+# is loaded, so the file is only hashed when an entry exists. The least recently used entries are evicted once the
+# directory exceeds max_size bytes.
+class FlightInfoCache:
+    def __init__(self, directory: Optional[str] = None, max_size: int = DEFAULT_MAX_CACHE_SIZE):
+        self.directory = directory or default_cache_directory()
+        self.max_size = max_size
+
+    def parse(self, igc_file_path: str, include=None, exclude=None) -> FlightInfo:
+        # the cached flight info of the file, parsed and stored on a miss
+        record_types = select_record_types(include, exclude)
+        entry_path = self._entry_path(igc_file_path, record_types)
+        flight_info = self._load(entry_path, igc_file_path)
+        if flight_info is None:
+            flight_info = IGCParser(igc_file_path, include=record_types).flight_info
+            try:
+                self._store(entry_path, _content_hash(igc_file_path), flight_info)
+            except OSError:
+                pass  # e.g. a read-only cache directory, the flight is parsed again next time
+        return flight_info
+
+    def _entry_path(self, igc_file_path: str, record_types) -> str:
+        stat = os.stat(igc_file_path)
+        key = '|'.join([os.path.abspath(igc_file_path), str(stat.st_size), str(stat.st_mtime_ns),
+                        ''.join(record_types), str(FORMAT_VERSION)])
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest() + _CACHE_FILE_EXTENSION)
+
+    def _load(self, entry_path: str, igc_file_path: str) -> Optional[FlightInfo]:
+        try:
+            with open(entry_path, 'rb') as entry:
+                if entry.read(_CONTENT_HASH_SIZE) != _content_hash(igc_file_path):
+                    return None  # rewritten without a change of size or modification time
+                flight_info = load_flight_info(entry)
+        except (OSError, ValueError, KeyError, struct.error):
+            return None  # missing or unreadable entries are parsed again
+        try:
+            os.utime(entry_path)  # marks the entry as recently used
+        except OSError:
+            pass  # evicted by another process since it was read
+        return flight_info
+
+    def _store(self, entry_path: str, content_hash: bytes, flight_info: FlightInfo):
+        os.makedirs(self.directory, exist_ok=True)
+        handle, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as entry:
+                entry.write(content_hash)
+                dump_flight_info(flight_info, entry)
+            os.replace(temporary_path, entry_path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        entries = []
+        with os.scandir(self.directory) as directory:
+            for entry in directory:
+                if entry.name.endswith(_CACHE_FILE_EXTENSION):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue  # removed by another process
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total_size = sum(size for (_, size, _) in entries)
+        for (_, size, path) in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # already evicted by another process
+            total_size -= size
+
+    def clear(self):
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(_CACHE_FILE_EXTENSION):
+                    os.remove(os.path.join(self.directory, name))
@@ -0,0 +1,118 @@
+import glob
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+import flightcache
+from flight import TimedFlightData
+from flightcache import FlightInfoCache, dump_flight_info, load_flight_info
+from igcparser import IGCParser
+
+
+class SerializationTests(unittest.TestCase):
+
+    def assertSameFlightInfo(self, expected, actual):
+        self.assertEqual(str(expected.header), str(actual.header))
+        self.assertEqual(str(expected.flight_recorder_info), str(actual.flight_recorder_info))
+        self.assertEqual(expected.extension_header.extended_data_indices, actual.extension_header.extended_data_indices)
+        self.assertEqual(str(expected.j_section), str(actual.j_section))
+        self.assertEqual([(k.utc_timestamp, k.flight_data_values) for k in expected.k_sections],
+                         [(k.utc_timestamp, k.flight_data_values) for k in actual.k_sections])
+        self.assertEqual(expected.comments.lines, actual.comments.lines)
+        self.assertEqual(expected.fixes.time, actual.fixes.time)
+        self.assertEqual(len(expected.timed_flight_data), len(actual.timed_flight_data))
+        for (e, a) in zip(expected.timed_flight_data, actual.timed_flight_data):
+            self.assertEqual([getattr(e, name) for name in TimedFlightData.__slots__],
+                             [getattr(a, name) for name in TimedFlightData.__slots__])
+
+    def _round_trip(self, flight_info):
+        stream = io.BytesIO()
+        dump_flight_info(flight_info, stream)
+        stream.seek(0)
+        return load_flight_info(stream)
+
+    def test_round_trip(self):
+        for path in glob.glob('igc/*.igc'):
+            flight_info = IGCParser(path).flight_info
+            self.assertSameFlightInfo(flight_info, self._round_trip(flight_info))
+
+    def test_round_trip_of_text_extension_values(self):
+        flight_info = IGCParser().flight_info
+        flight_info.fixes.set_extension_column('FXA', 3)
+        flight_info.fixes.append_record('151109', '4538002N', '07249279W', 'A', '-0094', '00040', (' 1A',))
+        flight_info.fixes.append_record('000001', '4538002N', '07249279W', 'V', '-0094', '00040', ('002',))
+        self.assertSameFlightInfo(flight_info, self._round_trip(flight_info))
+
+    def test_invalid_data_is_rejected(self):
+        self.assertRaises(ValueError, load_flight_info, io.BytesIO(b'AFLA9WL' + bytes(16)))
+
+
+class FlightInfoCacheTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.igc_file_path = os.path.join(self.directory, 'test.igc')
+        shutil.copy('igc/test.igc', self.igc_file_path)
+        self.cache = FlightInfoCache(os.path.join(self.directory, 'cache'))
+
+    def _entries(self):
+        return sorted(os.listdir(self.cache.directory))
+
+    def test_entry_is_reused(self):
+        flight_info = self.cache.parse(self.igc_file_path)
+        entries = self._entries()
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(self.cache.parse(self.igc_file_path).fixes.time, flight_info.fixes.time)
+        self.assertEqual(self._entries(), entries)
+
+    def test_changed_file_and_record_types_are_new_entries(self):
+        self.cache.parse(self.igc_file_path)
+        self.cache.parse(self.igc_file_path, exclude=('L',))
+        with open(self.igc_file_path, 'a') as igc_file:
+            igc_file.write('LXXXappended comment\n')
+        self.assertEqual(self.cache.parse(self.igc_file_path).comments.lines[-1], 'XXXappended comment')
+        self.assertEqual(len(self._entries()), 3)
+
+    def test_rewritten_file_with_the_same_size_and_time_is_parsed_again(self):
+        self.cache.parse(self.igc_file_path)
+        stat = os.stat(self.igc_file_path)
+        with open(self.igc_file_path, 'r+b') as igc_file:
+            content = igc_file.read()
+            igc_file.seek(content.index(b'\nL') + 2)
+            igc_file.write(b'Y')
+        os.utime(self.igc_file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertTrue(self.cache.parse(self.igc_file_path).comments.lines[0].startswith('Y'))
+        self.assertEqual(len(self._entries()), 1)
+
+    def test_corrupted_entry_is_parsed_again(self):
+        self.cache.parse(self.igc_file_path)
+        with open(os.path.join(self.cache.directory, self._entries()[0]), 'r+b') as entry:
+            entry.truncate(len(entry.read()) // 2)
+        self.assertEqual(len(self.cache.parse(self.igc_file_path).fixes), 159)
+
+    def test_entry_evicted_while_loaded(self):
+        flight_info = self.cache.parse(self.igc_file_path)
+        entry_path = os.path.join(self.cache.directory, self._entries()[0])
+
+        def load_and_evict(entry):
+            # another process evicts the entry between the read and the access time update
+            loaded = load_flight_info(entry)
+            os.remove(entry_path)
+            return loaded
+
+        with unittest.mock.patch.object(flightcache, 'load_flight_info', load_and_evict):
+            self.assertEqual(self.cache.parse(self.igc_file_path).fixes.time, flight_info.fixes.time)
+        self.assertEqual(self._entries(), [])
+
+    def test_eviction_by_total_size(self):
+        self.cache.parse(self.igc_file_path)
+        self.cache.max_size = os.path.getsize(os.path.join(self.cache.directory, self._entries()[0]))
+        self.cache.parse(self.igc_file_path, exclude=('L',))
+        self.assertEqual(len(self._entries()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,23 +1,61 @@
 import os
-from igcparser import IGCParser
+from catalog import CatalogQuery
+from flightcache import FlightInfoCache
+from igcparser import IGCParser, CompressionOpeners
 from exporterfactory import FlightInfoExporterFactory
+from acmitacviewflightinfoexporter import MergedAcmiTacViewExporter
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import abc
-from typing import List
+import asyncio
+import collections
+import itertools
+import time
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+try:
+    import simplification
+except ImportError:  # numpy is optional, only needed to simplify tracks
+    simplification = None
+
+
+IGCFileExtensions = ('.igc',) + tuple('.igc' + extension for extension in CompressionOpeners)
+
+
+ConversionResult = collections.namedtuple('ConversionResult', [
+    'igc_file',  # path of the converted file
+    'export_seconds',  # output format to the export duration in seconds of the successful exports
+    'error',  # the exception of the failed parse or of the first failed export, None when all succeeded
+])
+
+
+def is_igc_file(filename: str) -> bool:
+    return filename.endswith(IGCFileExtensions)
 
 
 def get_igc_files(directory: str) -> List[str]:
     igc_files = []
     for filename in os.listdir(directory):
-        if filename.endswith(".igc"):
+        if is_igc_file(filename):
             igc_files.append(directory + os.sep + filename)
     return igc_files
 
 
+def find_igc_files(directory: str) -> List[str]:
+    # the IGC files of directory and of all its subdirectories
+    igc_files = []
+    for (root, _, filenames) in os.walk(directory):
+        igc_files.extend(os.path.join(root, filename) for filename in sorted(filenames) if is_igc_file(filename))
+    return igc_files
+
+
 def make_export_path(in_path: str, export_format: str):
     if not export_format.startswith('.'):
         export_format = '.' + export_format
 
-    return os.path.splitext(in_path)[0] + export_format
+    (root, extension) = os.path.splitext(in_path)
+    if extension in CompressionOpeners and root.endswith('.igc'):
+        root = os.path.splitext(root)[0]
+    return root + export_format
 
 
 class ConversionProgressObserver:
@@ -33,6 +71,10 @@ class ConversionProgressObserver:
     def on_file_converted(self, filename):
         raise NotImplemented
 
+    def on_format_exported(self, filename, output_format: str, seconds: float):
+        # called for every output format of a file before on_file_converted, seconds is the duration of the export
+        pass
+
 
 class IGCConverterExceptionObserver:
     @abc.abstractmethod
@@ -42,10 +84,39 @@ class IGCConverterExceptionObserver:
 
 class IGCConverter:
     SupportedFormats = FlightInfoExporterFactory.SupportedFormats
+    # options of the per file exports that merge_igc cannot apply, with their defaults
+    unsupported_merge_options = {'simplify_tolerance': None, 'decimation_interval': None, 'metrics_window': None,
+                                 'acmi_delta_encoding': False}
 
-    def __init__(self, igc_input, output_format):
+    def __init__(self, igc_input, output_format, use_cache: bool = True, simplify_tolerance: Optional[float] = None,
+                 decimation_interval: Optional[int] = None, metrics_window: Optional[int] = None,
+                 concurrent_exports: bool = False, acmi_delta_encoding: bool = False,
+                 compression_level: Optional[int] = None, workers: Optional[int] = 1,
+                 ordered_completion: bool = True):
         self.igc_input = igc_input
+        # a format or a list of formats, every file is parsed once and exported to all of them
         self.output_format = output_format
+        self.output_formats = [output_format] if isinstance(output_format, str) else list(dict.fromkeys(output_format))
+        # the exports of a file run on a thread per format instead of one after another
+        self.concurrent_exports = concurrent_exports
+        # parsed flights are reused from the FlightInfoCache unless use_cache is False
+        self.cache = FlightInfoCache() if use_cache else None
+        # the exported tracks keep one fix per decimation_interval seconds and are simplified to within
+        # simplify_tolerance metres of the recorded track (see simplification.simplify_fixes)
+        if (simplify_tolerance is not None or decimation_interval is not None) and simplification is None:
+            raise RuntimeError('track simplification requires numpy to be installed')
+        self.simplify_tolerance = simplify_tolerance
+        self.decimation_interval = decimation_interval
+        # the exporters add derived metric columns smoothed over metrics_window fixes, none when None
+        self.metrics_window = metrics_window
+        # the ACMI exports only write what changed from one frame to the next (Tacview delta mode)
+        self.acmi_delta_encoding = acmi_delta_encoding
+        # deflate level (0 to 9) of the zipped formats
+        self.compression_level = compression_level
+        # files are converted by a pool of workers processes (one per CPU when None) unless workers is 1, their
+        # observers are notified in the order of the files or, without ordered_completion, as they complete
+        self.workers = workers
+        self.ordered_completion = ordered_completion
         self._progress_observers: List[ConversionProgressObserver] = []
         self._exception_observers: List[IGCConverterExceptionObserver] = []
 
@@ -63,6 +134,10 @@ class IGCConverter:
         for o in self._progress_observers:
             o.on_file_converted(filename)
 
+    def _notify_observers_format_exported(self, filename, output_format: str, seconds: float):
+        for o in self._progress_observers:
+            o.on_format_exported(filename, output_format, seconds)
+
     def _notify_observers_conversion_completed(self):
         for o in self._progress_observers:
             o.on_conversion_completed()
@@ -71,20 +146,38 @@ class IGCConverter:
         for o in self._exception_observers:
             o.on_exception_raised(e)
 
-    def convert_igc(self):
-        if os.path.isdir(self.igc_input):
-            igc_files = get_igc_files(self.igc_input)
+    def _get_igc_files(self) -> List[str]:
+        igc_files = self._resolve_igc_input()
+        if len(igc_files) == 0:
+            self._notify_no_igc_files()
+        return igc_files
+
+    def _resolve_igc_input(self) -> List[str]:
+        # igc_input is a directory, a file, a list of files or a CatalogQuery selecting flights of a catalog
+        if isinstance(self.igc_input, CatalogQuery):
+            igc_files = self.igc_input.igc_files()
         elif isinstance(self.igc_input, list):
             igc_files = self.igc_input
+        elif os.path.isdir(self.igc_input):
+            igc_files = get_igc_files(self.igc_input)
         else:
             assert os.path.isfile(self.igc_input)
             igc_files = [self.igc_input]
+        return igc_files
 
-        if len(igc_files) == 0:
-            self._notify_observers_exception_raised(
-                RuntimeError("No IGC files found in directory '{}'".format(self.igc_input)))
+    def _notify_no_igc_files(self):
+        self._notify_observers_exception_raised(RuntimeError("No IGC files found in '{}'".format(self.igc_input)))
 
+    def convert_igc(self):
+        igc_files = self._get_igc_files()
         self._notify_observers_conversion_started(len(igc_files))
+        if self.workers == 1 or len(igc_files) < 2:
+            self._convert_in_process(igc_files)
+        else:
+            self._convert_in_worker_processes(igc_files)
+        self._notify_observers_conversion_completed()
+
+    def _convert_in_process(self, igc_files: List[str]):
         for igc_file in igc_files:
             try:
                 self._do_conversion(igc_file)
@@ -92,10 +185,177 @@ class IGCConverter:
                 self._notify_observers_exception_raised(e)
             else:
                 self._notify_observers_file_converted(igc_file)
+
+    def _convert_in_worker_processes(self, igc_files: List[str]):
+        converter_options = self._converter_options()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(_convert_file, converter_options, igc_file): igc_file for igc_file in igc_files}
+            for future in futures if self.ordered_completion else as_completed(futures):
+                igc_file = futures[future]
+                try:
+                    self._notify_export_results(igc_file, future.result())
+                except Exception as e:
+                    self._notify_observers_exception_raised(e)
+                else:
+                    self._notify_observers_file_converted(igc_file)
+
+    async def convert_igc_async(self, executor: Optional[Executor] = None, max_concurrency: Optional[int] = None,
+                                progress_callback: Optional[Callable[[ConversionResult, int, int], Awaitable]] = None
+                                ) -> List[ConversionResult]:
+        # convert_igc for asyncio applications, the files are converted as by iter_conversion_results while the
+        # event loop keeps running. The observers are notified on the event loop thread and progress_callback, a
+        # coroutine function, is awaited with every result, the number of converted files and the number of files.
+        igc_files = await asyncio.to_thread(self._resolve_igc_input)
+        if len(igc_files) == 0:
+            self._notify_no_igc_files()
+        self._notify_observers_conversion_started(len(igc_files))
+        results = []
+        conversion_results = self._iter_conversion_results(igc_files, executor, max_concurrency)
+        try:
+            async for result in conversion_results:
+                for (output_format, seconds) in result.export_seconds.items():
+                    self._notify_observers_format_exported(result.igc_file, output_format, seconds)
+                if result.error is None:
+                    self._notify_observers_file_converted(result.igc_file)
+                else:
+                    self._notify_observers_exception_raised(result.error)
+                results.append(result)
+                if progress_callback is not None:
+                    await progress_callback(result, len(results), len(igc_files))
+        finally:
+            await conversion_results.aclose()
+        self._notify_observers_conversion_completed()
+        return results
+
+    async def iter_conversion_results(self, executor: Optional[Executor] = None,
+                                      max_concurrency: Optional[int] = None) -> AsyncIterator[ConversionResult]:
+        # Converts the files of igc_input on executor and yields their ConversionResult as they complete, with at
+        # most max_concurrency files (workers when None, one per CPU when workers is None too) submitted at a time.
+        # Without an executor the files are converted on the default executor of the event loop for workers=1 and
+        # on a pool of worker processes otherwise. The observers are not notified, closing the iterator early
+        # cancels the conversions that did not start.
+        igc_files = await asyncio.to_thread(self._resolve_igc_input)
+        async for result in self._iter_conversion_results(igc_files, executor, max_concurrency):
+            yield result
+
+    async def _iter_conversion_results(self, igc_files: List[str], executor: Optional[Executor],
+                                       max_concurrency: Optional[int]) -> AsyncIterator[ConversionResult]:
+        if max_concurrency is None:
+            max_concurrency = self.workers or os.cpu_count() or 1
+        if max_concurrency < 1:
+            raise ValueError('invalid max_concurrency {}, use 1 or more'.format(max_concurrency))
+        loop = asyncio.get_running_loop()
+        own_executor = None
+        if executor is None and self.workers != 1 and len(igc_files) > 1:
+            executor = own_executor = ProcessPoolExecutor(max_workers=self.workers)
+        converter_options = self._converter_options()
+        remaining = iter(igc_files)
+        pending = {}
+        try:
+            while True:
+                for igc_file in itertools.islice(remaining, max_concurrency - len(pending)):
+                    pending[loop.run_in_executor(executor, _convert_file, converter_options, igc_file)] = igc_file
+                if not pending:
+                    break
+                (done, _) = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    yield _conversion_result(pending.pop(future), future)
+        finally:
+            for future in pending:
+                future.cancel()
+            if own_executor is not None:
+                own_executor.shutdown(wait=False, cancel_futures=True)
+
+    def _converter_options(self) -> dict:
+        # keyword arguments of the converters of the worker processes
+        return {'output_format': self.output_formats, 'use_cache': self.cache is not None,
+                'simplify_tolerance': self.simplify_tolerance, 'decimation_interval': self.decimation_interval,
+                'metrics_window': self.metrics_window, 'concurrent_exports': self.concurrent_exports,
+                'acmi_delta_encoding': self.acmi_delta_encoding, 'compression_level': self.compression_level}
+
+    def merge_igc(self, destination_path: str):
+        # All flights of igc_input as the aircraft of a single ACMI (or zip.acmi) file at destination_path. The
+        # files are streamed rather than parsed whole, so the cache is not used and the options that need the whole
+        # flight are rejected.
+        unsupported_options = [name for (name, default) in self.unsupported_merge_options.items()
+                               if getattr(self, name) != default]
+        if unsupported_options:
+            raise ValueError('{} cannot be used to merge flights'.format(', '.join(unsupported_options)))
+        igc_files = self._get_igc_files()
+        self._notify_observers_conversion_started(1)
+        try:
+            MergedAcmiTacViewExporter(self.compression_level).export(igc_files, destination_path)
+        except Exception as e:
+            self._notify_observers_exception_raised(e)
+        else:
+            self._notify_observers_file_converted(destination_path)
         self._notify_observers_conversion_completed()
 
     def _do_conversion(self, igc_file_path: str):
-        igc_parser = IGCParser(igc_file_path)
-        destination_path = make_export_path(igc_file_path, self.output_format)
-        exporter = FlightInfoExporterFactory().create(destination_path)
-        exporter.export(igc_parser.flight_info, destination_path)
+        self._notify_export_results(igc_file_path, self._export_file(igc_file_path))
+
+    def _export_file(self, igc_file_path: str) -> List[Tuple[str, object]]:
+        # (output format, export duration in seconds or the exception of the failed export) of every format
+        factory = FlightInfoExporterFactory()
+        exports = []
+        for output_format in self.output_formats:
+            destination_path = make_export_path(igc_file_path, output_format)
+            exports.append((output_format, destination_path,
+                            factory.create(destination_path, metrics_window=self.metrics_window,
+                                           delta_encoding=self.acmi_delta_encoding,
+                                           compression_level=self.compression_level)))
+        # only the record types ignored by all exporters are skipped
+        ignored_record_types = set.intersection(*(set(exporter.ignored_record_types) for (_, _, exporter) in exports))
+        if self.cache is not None:
+            flight_info = self.cache.parse(igc_file_path, exclude=ignored_record_types)
+        else:
+            flight_info = IGCParser(igc_file_path, exclude=ignored_record_types).flight_info
+        if self.simplify_tolerance is not None or self.decimation_interval is not None:
+            flight_info = simplification.simplify_flight_info(flight_info, self.simplify_tolerance,
+                                                              self.decimation_interval)
+
+        if self.concurrent_exports and len(exports) > 1:
+            with ThreadPoolExecutor(max_workers=len(exports)) as executor:
+                futures = [executor.submit(_timed_export, exporter, flight_info, destination_path)
+                           for (_, destination_path, exporter) in exports]
+                results = [future.exception() or future.result() for future in futures]
+        else:
+            results = []
+            for (_, destination_path, exporter) in exports:
+                try:
+                    results.append(_timed_export(exporter, flight_info, destination_path))
+                except Exception as e:
+                    results.append(e)
+        return list(zip(self.output_formats, results))
+
+    def _notify_export_results(self, igc_file_path: str, results: List[Tuple[str, object]]):
+        # observers are notified on this thread, the first failed export is raised once all of them finished
+        errors = []
+        for (output_format, result) in results:
+            if isinstance(result, Exception):
+                errors.append(result)
+            else:
+                self._notify_observers_format_exported(igc_file_path, output_format, result)
+        if errors:
+            raise errors[0]
+
+
+def _convert_file(converter_options: dict, igc_file_path: str) -> List[Tuple[str, object]]:
+    # conversion of a file in a worker process of IGCConverter
+    return IGCConverter(igc_file_path, **converter_options)._export_file(igc_file_path)
+
+
+def _conversion_result(igc_file_path: str, future) -> ConversionResult:
+    try:
+        results = future.result()
+    except Exception as e:
+        return ConversionResult(igc_file_path, {}, e)
+    errors = [result for (_, result) in results if isinstance(result, Exception)]
+    return ConversionResult(igc_file_path, {output_format: result for (output_format, result) in results
+                                            if not isinstance(result, Exception)}, errors[0] if errors else None)
+
+
+def _timed_export(exporter, flight_info, destination_path: str) -> float:
+    start = time.perf_counter()
+    exporter.export(flight_info, destination_path)
+    return time.perf_counter() - start
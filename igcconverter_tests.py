@@ -0,0 +1,174 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from igcconverter import IGCConverter, ConversionProgressObserver, IGCConverterExceptionObserver, make_export_path, \
+    get_igc_files
+from igcparser import ParseError
+
+
+class RecordingObserver(ConversionProgressObserver, IGCConverterExceptionObserver):
+    def __init__(self):
+        self.events = []
+        self.exceptions = []
+
+    def on_conversion_started(self, num_items: int):
+        self.events.append(('started', num_items))
+
+    def on_conversion_completed(self):
+        self.events.append(('completed',))
+
+    def on_file_converted(self, filename):
+        self.events.append(('converted', os.path.basename(filename)))
+
+    def on_format_exported(self, filename, output_format: str, seconds: float):
+        self.events.append(('exported', os.path.basename(filename), output_format))
+        assert seconds >= 0.0
+
+    def on_exception_raised(self, e: Exception):
+        self.exceptions.append(e)
+
+
+class IGCConverterTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.igc_file_path = os.path.join(self.directory, 'test.igc')
+        shutil.copy('igc/test.igc', self.igc_file_path)
+
+    def _convert(self, output_format, **converter_options) -> RecordingObserver:
+        observer = RecordingObserver()
+        converter = IGCConverter(self.igc_file_path, output_format, use_cache=False, **converter_options)
+        converter.add_progress_observer(observer)
+        converter.add_exception_observer(observer)
+        converter.convert_igc()
+        return observer
+
+    def _read_export(self, output_format: str) -> bytes:
+        with open(make_export_path(self.igc_file_path, output_format), 'rb') as export_file:
+            return export_file.read()
+
+    def test_multiple_formats(self):
+        observer = self._convert('csv')
+        self.assertEqual(observer.events, [('started', 1), ('exported', 'test.igc', 'csv'),
+                                           ('converted', 'test.igc'), ('completed',)])
+        csv_export = self._read_export('csv')
+
+        for concurrent_exports in (False, True):
+            observer = self._convert(['csv', 'acmi', 'csv'], concurrent_exports=concurrent_exports)
+            self.assertEqual(observer.exceptions, [])
+            self.assertEqual(observer.events, [('started', 1), ('exported', 'test.igc', 'csv'),
+                                               ('exported', 'test.igc', 'acmi'), ('converted', 'test.igc'),
+                                               ('completed',)])
+            self.assertEqual(self._read_export('csv'), csv_export)
+            self.assertTrue(self._read_export('acmi').startswith(b'FileType=text/acmi/tacview'))
+
+    def test_failed_export_is_reported_after_the_others(self):
+        os.mkdir(make_export_path(self.igc_file_path, 'csv'))  # not writable as a file
+        observer = self._convert(['csv', 'acmi'])
+        self.assertEqual(len(observer.exceptions), 1)
+        self.assertEqual(observer.events, [('started', 1), ('exported', 'test.igc', 'acmi'), ('completed',)])
+
+    def test_merge_rejects_the_options_of_the_file_exports(self):
+        merged_path = os.path.join(self.directory, 'merged.acmi')
+        for options in ({'simplify_tolerance': 0.0}, {'decimation_interval': 10}, {'metrics_window': 1},
+                        {'acmi_delta_encoding': True}):
+            converter = IGCConverter(self.igc_file_path, 'acmi', use_cache=False, **options)
+            with self.assertRaisesRegex(ValueError, list(options)[0]):
+                converter.merge_igc(merged_path)
+        self.assertFalse(os.path.exists(merged_path))
+
+        observer = RecordingObserver()
+        converter = IGCConverter(self.igc_file_path, 'acmi', compression_level=1)
+        converter.add_progress_observer(observer)
+        converter.merge_igc(merged_path)
+        self.assertEqual(observer.events, [('started', 1), ('converted', 'merged.acmi'), ('completed',)])
+
+    def test_worker_processes(self):
+        for name in ('06ed9wl1.igc', 'vol GD 12sept20.igc'):
+            shutil.copy(os.path.join('igc', name), self.directory)
+        with open(os.path.join(self.directory, 'broken.igc'), 'w') as igc_file:
+            igc_file.write('HFTZNTIMEZONE:X\n')  # malformed time zone
+        self.igc_file_path = self.directory
+        expected_events = [('exported', name, output_format) for name in ('06ed9wl1.igc', 'test.igc',
+                                                                          'vol GD 12sept20.igc')
+                           for output_format in ('csv', 'acmi')]
+        expected_events += [('converted', name) for name in ('06ed9wl1.igc', 'test.igc', 'vol GD 12sept20.igc')]
+
+        for ordered_completion in (True, False):
+            observer = self._convert(['csv', 'acmi'], workers=2, ordered_completion=ordered_completion)
+            self.assertEqual(observer.events[0], ('started', 4))
+            self.assertEqual(observer.events[-1], ('completed',))
+            self.assertEqual(sorted(observer.events[1:-1]), sorted(expected_events))
+            self.assertEqual(len(observer.exceptions), 1)
+            self.assertIsInstance(observer.exceptions[0], ParseError)
+            self.assertEqual(observer.exceptions[0].line_number, 1)
+            if ordered_completion:
+                self.assertEqual([event[1] for event in observer.events if event[0] == 'converted'],
+                                 [os.path.basename(path) for path in get_igc_files(self.directory)
+                                  if not path.endswith('broken.igc')])
+
+
+class AsyncConversionTests(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        for name in ('test.igc', '06ed9wl1.igc', 'vol GD 12sept20.igc'):
+            shutil.copy(os.path.join('igc', name), self.directory)
+        with open(os.path.join(self.directory, 'broken.igc'), 'w') as igc_file:
+            igc_file.write('HFTZNTIMEZONE:X\n')  # malformed time zone
+
+    async def test_convert_igc_async(self):
+        for (workers, executor) in ((1, None), (1, ThreadPoolExecutor(max_workers=2)), (2, None)):
+            observer = RecordingObserver()
+            converter = IGCConverter(self.directory, ['csv', 'acmi'], use_cache=False, workers=workers)
+            converter.add_progress_observer(observer)
+            converter.add_exception_observer(observer)
+            progress = []
+
+            async def on_progress(result, completed: int, total: int):
+                await asyncio.sleep(0)
+                progress.append((os.path.basename(result.igc_file), completed, total))
+
+            results = await converter.convert_igc_async(executor, max_concurrency=2, progress_callback=on_progress)
+            if executor is not None:
+                executor.shutdown()
+            self.assertEqual(sorted(name for (name, _, _) in progress),
+                             ['06ed9wl1.igc', 'broken.igc', 'test.igc', 'vol GD 12sept20.igc'])
+            self.assertEqual([(completed, total) for (_, completed, total) in progress],
+                             [(1, 4), (2, 4), (3, 4), (4, 4)])
+            self.assertEqual(observer.events[0], ('started', 4))
+            self.assertEqual(observer.events[-1], ('completed',))
+            self.assertEqual(len([event for event in observer.events if event[0] == 'converted']), 3)
+            self.assertEqual(len(observer.exceptions), 1)
+            self.assertIsInstance(observer.exceptions[0], ParseError)
+
+            for result in results:
+                if result.igc_file.endswith('broken.igc'):
+                    self.assertEqual((result.export_seconds, result.error), ({}, observer.exceptions[0]))
+                else:
+                    self.assertEqual(list(result.export_seconds), ['csv', 'acmi'])
+                    self.assertIsNone(result.error)
+                    self.assertTrue(os.path.isfile(make_export_path(result.igc_file, 'acmi')))
+
+    async def test_iter_conversion_results_stops_early(self):
+        converter = IGCConverter(self.directory, 'csv', use_cache=False)
+        conversion_results = converter.iter_conversion_results(max_concurrency=1)
+        async for result in conversion_results:
+            break
+        await conversion_results.aclose()
+        self.assertEqual(os.path.basename(result.igc_file), os.path.basename(get_igc_files(self.directory)[0]))
+        # only the first file was submitted
+        self.assertEqual(len([name for name in os.listdir(self.directory) if name.endswith('.csv')]), 1)
+
+        with self.assertRaises(ValueError):
+            async for _ in converter.iter_conversion_results(max_concurrency=0):
+                pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,112 @@
-from flight import FlightInfo, TimedFlightData, DifferentialGPS, KSection, JSection
+from flight import FlightInfo, FixTable, TimedFlightData, DifferentialGPS, KSection, JSection, \
+    parse_b_record_fields, parse_igc_time, ROLLOVER_THRESHOLD, SECONDS_PER_DAY
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import bz2
+import collections
+import gzip
+import io
+import functools
+import itertools
+import lzma
+import mmap
+import operator
+import os
 import re
+import warnings
+
+try:
+    import numpydecoder
+except ImportError:  # numpy is optional, only needed by the 'numpy' engine
+    numpydecoder = None
+
+# A single parsed line of an IGC file. 'value' holds the decoded object: a TimedFlightData for B records,
+# a KSection for K records, the comment text for L records and the updated flight_info section otherwise.
+IGCRecord = collections.namedtuple('IGCRecord', ['record_type', 'line_number', 'value'])
+
+
+# compressed IGC files are decompressed on the fly while being read
+CompressionOpeners = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+
+
+def is_compressed(igc_file_path) -> bool:
+    return os.path.splitext(igc_file_path)[1].lower() in CompressionOpeners
+
+
+def open_igc_file(igc_file_path, mode='r', **kwargs):
+    # open() for plain and compressed (.igc.gz, .igc.bz2, .igc.xz) IGC files, text modes only accept an encoding
+    opener = CompressionOpeners.get(os.path.splitext(igc_file_path)[1].lower())
+    if opener is None:
+        return open(igc_file_path, mode, **kwargs)
+    if 'b' not in mode and 't' not in mode:
+        mode += 't'
+    return opener(igc_file_path, mode)
+
+
+def iter_igc_lines(igc_source) -> Iterator[str]:
+    # igc_source may be a path or any text/binary file object, lines are read lazily
+    if isinstance(igc_source, (str, os.PathLike)):
+        with open_igc_file(igc_source, 'r') as igc_file:
+            yield from igc_file
+    else:
+        for line in igc_source:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8', 'replace')
+            yield line
+
+
+# Parsed I or J record: entries are (name, first column, last column) with 1-based inclusive IGC columns
+ExtensionDeclaration = collections.namedtuple('ExtensionDeclaration', ['num_extensions', 'entries'])
+
+
+@functools.lru_cache(maxsize=256)
+def compile_extension_declaration(line: str) -> ExtensionDeclaration:
+    # Parses the raw I or J line once, identical loggers write identical declarations so the cache is shared by
+    # all files of a batch. Raises ValueError on malformed declarations.
+    record_type = line[0:1]
+    line = line[1:]
+    if record_type == 'I' and not re.fullmatch(r"\d{2}\w+", line):
+        raise ValueError("Extension Header parse error: '{}'".format(line))
+    try:
+        num_extensions = int(line[0:2])
+    except ValueError:
+        raise ValueError("unable to get extension parts from '{}'".format(line))
+
+    entries = tuple((match.group(3), int(match.group(1)), int(match.group(2)))
+                    for match in re.finditer(r'(\d{2})(\d{2})([A-Z]{3})', line[2:]))
+    return ExtensionDeclaration(num_extensions, entries)
+
+
+@functools.lru_cache(maxsize=256)
+def compile_record_decoder(slices: Tuple[Tuple[int, int], ...]) -> Callable[[str], Tuple[str, ...]]:
+    # Returns a function extracting all (start, end) python slices of a line in a single call
+    if len(slices) == 0:
+        return lambda line: ()
+    getter = operator.itemgetter(*(slice(start, end) for (start, end) in slices))
+    if len(slices) == 1:
+        return lambda line: (getter(line),)
+    return getter
+
+
+# Record types understood by the parser. Excluding 'I' skips the B record extensions, excluding 'J' also
+# excludes the K records it declares.
+RecordTypes = ('A', 'H', 'I', 'J', 'B', 'K', 'L', 'D', 'G', 'C', 'E')
+
+# flight_info attribute yielded by the record stream for records that update a section in place
+_RECORD_SECTIONS = {'H': 'header', 'A': 'flight_recorder_info', 'I': 'extension_header', 'D': 'differential_gps',
+                    'J': 'j_section', 'G': 'security', 'C': 'preflight_declaration', 'E': 'events'}
+
+
+def select_record_types(include=None, exclude=None) -> Tuple[str, ...]:
+    selected = RecordTypes if include is None else tuple(include)
+    excluded = () if exclude is None else tuple(exclude)
+    for record_type in selected + excluded:
+        if record_type not in RecordTypes:
+            raise ValueError("unknown record type '{}', use one of {}".format(record_type, RecordTypes))
+    if 'J' in excluded or 'J' not in selected:
+        excluded += ('K',)
+    return tuple(r for r in RecordTypes if r in selected and r not in excluded)
 
 
 class ParseError(Exception):
@@ -12,50 +119,322 @@ class ParseError(Exception):
     def __str__(self):
         return "Parse error: {} in '{}' at line {}.".format(self.message, self.igc_file_path, self.line_number)
 
+    def __reduce__(self):
+        # picklable, e.g. raised in a worker process
+        return ParseError, (self.message, self.line_number, self.igc_file_path)
+
+
+# Warned once per parsed file with malformed B records. They are skipped, IGCParser.skipped_fix_lines holds their
+# line numbers.
+class ParseWarning(UserWarning):
+    pass
+
+
+FIX_BATCH_SIZE = 4096  # B records decoded at a time by the 'python' engine
+HEADER_SCAN_BLOCK_SIZE = 4096  # bytes read at a time by scan_header
+DEFAULT_PARALLEL_THRESHOLD = 16 * 1024 * 1024  # smaller files are always parsed serially
+
+
+def scan_header(igc_file_path) -> FlightInfo:
+    # Parses the records preceding the first B record (A, H, I, J, ...) and stops reading there, the I/O cost
+    # is a few blocks per file instead of the whole track.
+    parser = IGCParser(exclude=('B', 'K', 'L'))
+    parser.igc_file_path = igc_file_path
+    with open_igc_file(igc_file_path, 'rb', buffering=HEADER_SCAN_BLOCK_SIZE) as igc_file:
+        for _ in parser.iter_records(itertools.takewhile(lambda line: not line.startswith(b'B'), igc_file)):
+            pass
+    return parser.flight_info
+
 
 class IGCParser:
-    def __init__(self, igc_file_path=None):
+    # 'python' decodes B records line by line, 'numpy' locates and decodes all of them with array operations,
+    # 'mmap' does the same directly on a memory map of the file so B records are never copied into python objects
+    # (compressed files are decompressed into memory instead). Without an engine, 'numpy' is used when numpy is
+    # installed and 'python' otherwise.
+    Engines = ('python', 'numpy', 'mmap')
+
+    def __init__(self, igc_file_path=None, engine: Optional[str] = None, include=None, exclude=None,
+                 workers: Optional[int] = None, parallel_threshold: int = DEFAULT_PARALLEL_THRESHOLD,
+                 lazy: bool = False):
+        if engine is None:
+            engine = 'python' if numpydecoder is None else 'numpy'
+        if engine not in IGCParser.Engines:
+            raise ValueError("unknown parser engine '{}', use one of {}".format(engine, IGCParser.Engines))
+        if engine in ('numpy', 'mmap') and numpydecoder is None:
+            raise RuntimeError("the '{}' parser engine requires numpy to be installed".format(engine))
+        self.engine = engine
+        # files of at least parallel_threshold bytes have their B records decoded by a pool of workers processes
+        self.workers = workers
+        self.parallel_threshold = parallel_threshold
+        # keep the B records undecoded in a LazyFlightInfo until they are accessed
+        self.lazy = lazy
+        # records of other types are skipped without being decoded, see RecordTypes
+        self.record_types = select_record_types(include, exclude)
+        self._record_parsers = self._make_record_parsers(decode_fixes=False)
+        self._header_parsers = {
+            'HFPLT': ('HFPLT', self._parse_pilot_info),
+            'HFDTE': ('HFDTE', self._parse_flight_date),
+            'HFCM2': ('HFCM2CREW2', self._parse_second_pilot_name),
+            'HFGTY': ('HFGTY', self._parse_glider_type),
+            'HFGID': ('HFGID', self._parse_glider_id),
+            'HFDTM': ('HFDTM', self._parse_gps_datum),
+            'HFRFW': ('HFRFW', self._parse_firmware_version),
+            'HFRHW': ('HFRHW', self._parse_hardware_version),
+            'HFFTY': ('HFFTY', self._parse_flight_recorder_type),
+            'HFGPS': ('HFGPS', self._parse_gps_info),
+            'HFPRS': ('HFPRS', self._parse_pressure_sensor_info),
+            'HFCID': ('HFCID', self._parse_tail_fin_number),
+            'HFCCL': ('HFCCL', self._parse_glider_class),
+            'HFTZN': ('HFTZN', self._parse_timezone),
+        }  # first 5 characters to (full prefix, parse method)
         self.found_extension_header = False
         self.found_j_section = False
+        # slices the I record columns off a B record and the J record columns off a K record
+        self._extension_decoder = compile_record_decoder(())
+        self._k_section_decoder = compile_record_decoder(())
+        # B records waiting to be decoded and their line numbers, see _parse_lines
+        self._fix_lines: List[str] = []
+        self._fix_line_numbers = array('q')
+        self.skipped_fix_lines: List[int] = []
         self.current_line_number = 0
         self.igc_file_path = igc_file_path
         self.indices_to_extension_header_title = {}  # tuple of indices to title
-        self.flight_info = FlightInfo()  # Empty flight info
+        self.flight_info = LazyFlightInfo() if lazy else FlightInfo()  # Empty flight info
         if igc_file_path is not None:
-            # extract IGC file lines into list
-            self.igc_file_lines = list(open(igc_file_path, 'r').readlines())
             self._parse_igc_lines()
+            if self.skipped_fix_lines:
+                warnings.warn("skipped {} malformed B record(s) in '{}', first at line {}".format(
+                    len(self.skipped_fix_lines), igc_file_path, self.skipped_fix_lines[0]), ParseWarning, stacklevel=2)
 
     def _raise_parse_error(self, message):
         raise ParseError(message, self.current_line_number, self.igc_file_path)
 
     def _parse_igc_lines(self):
-        self.current_line_number = 1
-        for line in self.igc_file_lines:
-            line = line.rstrip('\n')
-            if line.startswith('H'):
-                self._parse_header(line)
-            elif line.startswith('A'):
-                self._parse_flight_recorder_info(line)
-            elif line.startswith('I'):
-                self._parse_extension_header(line)
-            elif line.startswith('B'):
-                self._parse_timed_flight_data(line)
-            elif line.startswith('L'):
-                self._parse_comment_section(line)
-            elif line.startswith('D'):
-                self._parse_differential_gps(line)
-            elif line.startswith('J'):
-                self._parse_j_section(line)
-            elif line.startswith('K'):
-                self._parse_k_section(line)
-            elif line.startswith('G'):
-                self._parse_security(line)
-            elif line.startswith('C'):
-                self._parse_preflight_declaration(line)
-            elif line.startswith('E'):
-                self._parse_events_section(line)
+        if self.lazy:
+            self._parse_igc_file_lazily()
+            return
+        fix_chunks = self._split_fix_records()
+        if fix_chunks is None:
+            self._parse_igc_file()
+        else:
+            self._parse_igc_file_in_parallel(*fix_chunks)
+
+    def _split_fix_records(self) -> Optional[Tuple[List[bytes], List[Tuple[int, int]]]]:
+        # Splits the B record region of a large file at line boundaries, one chunk per worker. Returns the I record
+        # lines preceding the region and the (start, end) file offsets of the chunks, None to parse serially.
+        if self.workers is None or self.workers < 2 or 'B' not in self.record_types:
+            return None
+        if is_compressed(self.igc_file_path):
+            return None  # chunk offsets need random access
+        size = os.path.getsize(self.igc_file_path)
+        if size == 0 or size < self.parallel_threshold:
+            return None
+
+        with open(self.igc_file_path, 'rb') as igc_file, \
+                mmap.mmap(igc_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            first_fix = 0 if data[:1] == b'B' else data.find(b'\nB') + 1
+            if first_fix == 0:
+                return None
+            last_fix = data.rfind(b'\nB') + 1
+            end = data.find(b'\n', last_fix) + 1 or len(data)
+            if data.find(b'\nI', first_fix, end) != -1:
+                return None  # the extension declaration changes within the fixes
+
+            declarations = []
+            if 'I' in self.record_types:
+                declarations = [line.rstrip(b'\r') for line in data[:first_fix].split(b'\n') if line.startswith(b'I')]
+            boundaries = [first_fix]
+            for i in range(1, self.workers):
+                position = first_fix + (end - first_fix) * i // self.workers
+                boundaries.append(max(data.find(b'\n', position) + 1 or end, boundaries[-1]))
+            boundaries.append(end)
+        return declarations, [(start, stop) for (start, stop) in zip(boundaries, boundaries[1:]) if start < stop]
+
+    def _parse_igc_file_in_parallel(self, declarations: List[bytes], chunks: List[Tuple[int, int]]):
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(_parse_fix_chunk, self.igc_file_path, start, end, declarations, self.engine)
+                       for (start, end) in chunks]
+            # everything but the fixes is parsed here while the workers decode the chunks
+            self._parse_without_fixes(self._parse_igc_file)
+
+            for (future, (start, _)) in zip(futures, chunks):
+                (fixes, skipped_fix_lines) = future.result()
+                self.flight_info.fixes.extend(fixes)
+                if skipped_fix_lines:
+                    # line numbers of a worker are relative to its chunk
+                    with open(self.igc_file_path, 'rb') as igc_file:
+                        line_offset = igc_file.read(start).count(b'\n')
+                    self.skipped_fix_lines.extend(line_number + line_offset for line_number in skipped_fix_lines)
+
+    def _parse_without_fixes(self, parse: Callable[[], None]):
+        record_types = self.record_types
+        self.record_types = tuple(r for r in record_types if r != 'B')
+        self._record_parsers = self._make_record_parsers(decode_fixes=False)
+        try:
+            parse()
+        finally:
+            self.record_types = record_types
+            self._record_parsers = self._make_record_parsers(decode_fixes=False)
+
+    def _parse_igc_file_lazily(self):
+        with open_igc_file(self.igc_file_path, 'rb') as igc_file:
+            data = igc_file.read()
+        fix_starts = _find_record_starts(data, b'B')
+        declaration_starts = _find_record_starts(data, b'I')
+        if 'B' not in self.record_types or len(fix_starts) == 0 or \
+                (declaration_starts and declaration_starts[-1] > fix_starts[0] and 'I' in self.record_types):
+            # nothing to defer, or the extension declaration changes within the fixes
+            self._parse_fix_chunk(data)
+            return
+
+        self._parse_without_fixes(lambda: self._parse_fix_chunk(data))
+        declarations = []
+        if 'I' in self.record_types:
+            declarations = [data[start:].split(b'\n', 1)[0].rstrip(b'\r') for start in declaration_starts]
+        self.flight_info.fixes = LazyFixTable(data, fix_starts, declarations, self.flight_info.fixes, self.engine,
+                                              self.igc_file_path)
+
+    def _parse_fix_chunk(self, chunk: bytes):
+        if self.engine == 'python':
+            self._parse_lines(io.BytesIO(chunk))
+        else:
+            self._parse_igc_buffer(chunk)
+
+    def _parse_igc_file(self):
+        if self.engine == 'numpy' or (self.engine == 'mmap' and is_compressed(self.igc_file_path)):
+            with open_igc_file(self.igc_file_path, 'rb') as igc_file:
+                self._parse_igc_buffer(igc_file.read())
+            return
+        if self.engine == 'mmap':
+            self._parse_mapped_igc_file()
+            return
+
+        self._parse_lines(self.igc_file_path)
+
+    def _parse_lines(self, igc_source):
+        # 'python' engine: the B records are collected for _decode_fix_batch without an IGCRecord per line, the
+        # other records are stored as they are parsed
+        record_parsers = self._record_parsers
+        (fix_lines, fix_line_numbers) = (self._fix_lines, self._fix_line_numbers) if 'B' in record_parsers \
+            else (None, None)
+        line_number = 0
+        for line in iter_igc_lines(igc_source):
+            line_number += 1
+            line = line.rstrip('\r\n')
+            record_type = line[:1]
+            if record_type == 'B' and fix_lines is not None:
+                fix_lines.append(line)
+                fix_line_numbers.append(line_number)
+                if len(fix_lines) >= FIX_BATCH_SIZE:
+                    self._decode_fix_batch()
+            elif record_type in record_parsers:
+                self.current_line_number = line_number
+                self._store_record(self._parse_record(line, record_parsers))
+        self.current_line_number = line_number
+        self._decode_fix_batch()
+
+    def _store_record(self, record: IGCRecord):
+        if record.record_type == 'B':
+            self._parse_timed_flight_data(record.value)
+        elif record.record_type == 'K':
+            self.flight_info.k_sections.append(record.value)
+        elif record.record_type == 'L':
+            self.flight_info.comments.add(record.value)
+
+    def _parse_mapped_igc_file(self):
+        with open(self.igc_file_path, 'rb') as igc_file:
+            if os.fstat(igc_file.fileno()).st_size == 0:
+                return  # empty files cannot be mapped
+            mapped_file = mmap.mmap(igc_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._parse_igc_buffer(mapped_file)
+        finally:
+            try:
+                mapped_file.close()
+            except BufferError:
+                pass  # still viewed from the traceback of a parse error, unmapped once collected
+
+    def _parse_igc_buffer(self, data):
+        # data is bytes or any buffer such as a memory map
+        # numpy engine: line boundaries, B records and comments are located with array operations, only the
+        # remaining records go through the line parser
+        lines = numpydecoder.BufferLines(data)
+        record_types = ''.join(self.record_types).encode('ascii')
+        fix_line_indices = lines.find_records(b'B' if 'B' in self.record_types else b'')
+        if 'L' in self.record_types:
+            self.flight_info.comments.lines.extend(lines.texts(lines.find_records(b'L'), offset=1))
+        num_decoded_fixes = 0
+        for index in lines.find_records(record_types.replace(b'B', b'').replace(b'L', b'')):
+            line = lines[index]
+            if line.startswith('I'):
+                # fixes before this line were recorded with the previous declaration
+                num_decoded_fixes = self._decode_fix_lines(lines, fix_line_indices, num_decoded_fixes, index)
+            self.current_line_number = index + 1
+            self._store_record(self._parse_record(line, self._record_parsers))
+        self._decode_fix_lines(lines, fix_line_indices, num_decoded_fixes, len(lines))
+
+    def _decode_fix_lines(self, lines, fix_line_indices, first_fix: int, end_line_index: int) -> int:
+        # decodes the not yet decoded fixes preceding end_line_index, returns the number of decoded fixes
+        end_fix = int(fix_line_indices.searchsorted(end_line_index))
+        line_indices = fix_line_indices[first_fix:end_fix]
+        fix_lines = lines.take(line_indices)
+
+        def decode_line(i: int) -> tuple:
+            # per line fallback of the bulk decoder
+            self.current_line_number = int(line_indices[i]) + 1
+            return self._parse_b_record_fields(fix_lines[i])
+
+        numpydecoder.decode_into(self.flight_info.fixes, fix_lines, self._extension_slices(), decode_line)
+        return end_fix
+
+    def _parse_b_record_fields(self, line: str) -> Optional[tuple]:
+        # None for a malformed record, it is skipped
+        try:
+            return parse_b_record_fields(line[1:7], line[7:15], line[15:24], line[24:25], line[25:30], line[30:35])
+        except ValueError:
+            self.skipped_fix_lines.append(self.current_line_number)
+            return None
+
+    def iter_records(self, igc_source) -> Iterator[IGCRecord]:
+        # Streaming parse: B, K and L records are yielded instead of being stored on flight_info,
+        # so memory use does not depend on the length of the file.
+        if isinstance(igc_source, (str, os.PathLike)):
+            self.igc_file_path = igc_source
+        elif self.igc_file_path is None:
+            self.igc_file_path = getattr(igc_source, 'name', '<stream>')
+
+        record_parsers = self._make_record_parsers(decode_fixes=True)
+        self.current_line_number = 0
+        for line in iter_igc_lines(igc_source):
             self.current_line_number += 1
+            line = line.rstrip('\r\n')
+            if line[:1] in record_parsers:
+                yield self._parse_record(line, record_parsers)
+
+    def _make_record_parsers(self, decode_fixes: bool) -> Dict[str, Callable[[str], object]]:
+        # record type to a function parsing the line and returning the value of its IGCRecord,
+        # without decode_fixes B records are returned as raw lines
+        record_parsers = {
+            'H': self._parse_header,
+            'A': self._parse_flight_recorder_info,
+            'I': self._parse_extension_header,
+            'B': self._decode_timed_flight_data if decode_fixes else str,
+            'L': lambda line: line.removeprefix('L'),
+            'D': self._parse_differential_gps,
+            'J': self._parse_j_section,
+            'K': self._decode_k_section,
+            'G': self._parse_security,
+            'C': self._parse_preflight_declaration,
+            'E': self._parse_events_section,
+        }
+        return {record_type: record_parsers[record_type] for record_type in self.record_types}
+
+    def _parse_record(self, line: str, record_parsers: Dict[str, Callable[[str], object]]) -> IGCRecord:
+        record_type = line[0]
+        value = record_parsers[record_type](line)
+        if record_type in _RECORD_SECTIONS:
+            value = getattr(self.flight_info, _RECORD_SECTIONS[record_type])
+        return IGCRecord(record_type, self.current_line_number, value)
 
     def _parse_events_section(self, line):
         # self.flight_info.events...
@@ -72,30 +451,27 @@ class IGCParser:
         self.found_j_section = True
         self.flight_info.j_section = JSection()
 
-        line = line.removeprefix('J')
-        num_extensions = -1
+        declaration = self._compile_extension_declaration(line)
+        assert declaration.num_extensions >= 0
+        self.flight_info.j_section.num_extensions = declaration.num_extensions
+
+        for (name, start_index, end_index) in declaration.entries:
+            # compensate for offset in IGC standard relative to python
+            self.flight_info.j_section.flight_data_indices[name] = (start_index, end_index + 1)
+        flight_data_indices = self.flight_info.j_section.flight_data_indices.values()
+        self._k_section_decoder = compile_record_decoder(
+            tuple((indices[0] - 1, indices[1] - 1) for indices in flight_data_indices))
+
+    def _compile_extension_declaration(self, line) -> ExtensionDeclaration:
         try:
-            num_extensions = int(line[0:2])
-        except ValueError:
-            self._raise_parse_error("unable to get extension parts from '{}'".format(line))
-
-        assert num_extensions >= 0
-        self.flight_info.j_section.num_extensions = num_extensions
-
-        line = line[2:]  # remove num extensions
-        extensions = re.findall(r'(\d{4}[A-Z]{3})', line)
-        for extension in extensions:
-            extension_parts = re.search(r'(\d{2})(\d{2})([A-Z]{3})', extension)
-            if extension_parts:
-                start_index = int(
-                    extension_parts.group(1))  # compensate for offset in IGC standard relative to python
-                end_index = int(extension_parts.group(2)) + 1
-                name = extension_parts.group(3)
-                self.flight_info.j_section.flight_data_indices[name] = (start_index, end_index)
-            else:
-                self._raise_parse_error("unable to get extension parts from '{}'".format(line))
+            return compile_extension_declaration(line)
+        except ValueError as e:
+            self._raise_parse_error(str(e))
 
     def _parse_k_section(self, line):
+        self.flight_info.k_sections.append(self._decode_k_section(line))
+
+    def _decode_k_section(self, line) -> KSection:
         if not self.found_j_section:
             self._raise_parse_error("invalid IGC file: J and K sections mismatch")
 
@@ -105,10 +481,10 @@ class IGCParser:
         except IndexError:
             self._raise_parse_error("invalid UTC timestamp in '{}'".format(line))
 
-        for (title, indices) in self.flight_info.j_section.flight_data_indices.items():
-            k_section.flight_data_values[title] = line[indices[0] - 1:indices[1] - 1]
+        k_section.flight_data_values = dict(zip(self.flight_info.j_section.flight_data_indices,
+                                                self._k_section_decoder(line)))
 
-        self.flight_info.k_sections.append(k_section)
+        return k_section
 
     def _parse_differential_gps(self, line):
         self.flight_info.differential_gps = DifferentialGPS()
@@ -116,11 +492,32 @@ class IGCParser:
         if line[1] == '2':
             self.flight_info.differential_gps.dgps_station_id = line[1:]
 
-    def _parse_comment_section(self, line):
-        line = line.removeprefix('L')
-        self.flight_info.comments.add(line)
+    def _decode_fix_batch(self):
+        # decodes the B records collected by _parse_lines column by column
+        (lines, line_numbers) = (self._fix_lines, self._fix_line_numbers)
+        if not lines:
+            return
+        try:
+            self.flight_info.fixes.extend_records(lines, self._extension_slices())
+        except ValueError:
+            # decoded again one record at a time to skip the malformed ones
+            current_line_number = self.current_line_number
+            for (line, line_number) in zip(lines, line_numbers):
+                self.current_line_number = line_number
+                self._parse_timed_flight_data(line)
+            self.current_line_number = current_line_number
+        finally:
+            del lines[:]
+            del line_numbers[:]
 
     def _parse_timed_flight_data(self, line):
+        try:
+            self.flight_info.fixes.append_record(line[1:7], line[7:15], line[15:24], line[24:25], line[25:30],
+                                                 line[30:35], self._extension_decoder(line))
+        except ValueError:
+            self.skipped_fix_lines.append(self.current_line_number)  # malformed records are skipped
+
+    def _decode_timed_flight_data(self, line) -> TimedFlightData:
         data = TimedFlightData()
         try:
             data.utc_time = line[1:7]
@@ -133,67 +530,32 @@ class IGCParser:
             self._raise_parse_error("invalid to parse timed flight data in '{}'".format(line))
 
         if self.found_extension_header:
-            data.extension_values = {}
-            for (title, indices) in self.flight_info.extension_header.extended_data_indices.items():
-                try:
-                    data.extension_values[title] = line[indices[0] - 1:indices[1]]
-                except IndexError:
-                    self._raise_parse_error("invalid to parse timed flight data in '{}'".format(line))
+            data.extension_columns = self.flight_info.extension_header.columns
+            data.extension_data = self._extension_decoder(line)
 
-        self.flight_info.timed_flight_data.append(data)
+        return data
 
     def _parse_extension_header(self, line):
+        # the fixes before this line were recorded with the previous declaration
+        self._decode_fix_batch()
         self.found_extension_header = True
-        line = line.removeprefix('I')
-
-        if not re.fullmatch(r"\d{2}\w+", line):
-            self._raise_parse_error("Extension Header parse error: '{}'".format(line))
-
-        num_extensions = int(line[0:2])
-        self.flight_info.extension_header.num_extensions = num_extensions
+        declaration = self._compile_extension_declaration(line)
+        self.flight_info.extension_header.num_extensions = declaration.num_extensions
+        self.flight_info.fixes.has_extensions = True
 
-        line = line[2:]  # remove num extensions
-        extensions = re.findall(r'(\d{4}[A-Z]{3})', line)
-        for extension in extensions:
-            extension_parts = re.search(r'(\d{2})(\d{2})([A-Z]{3})', extension)
-            if extension_parts:
-                start_index = int(extension_parts.group(1))
-                end_index = int(extension_parts.group(2))
-                name = extension_parts.group(3)
-                self.flight_info.extension_header.extended_data_indices[name] = (start_index, end_index)
+        for (name, start_index, end_index) in declaration.entries:
+            self.flight_info.extension_header.set_extension(name, start_index, end_index)
+            self.flight_info.fixes.set_extension_column(name, end_index - start_index + 1)
+        self._extension_decoder = compile_record_decoder(self._extension_slices())
 
-            else:
-                self._raise_parse_error("Extension Header parse error: '{}'".format(line))
+    def _extension_slices(self) -> Tuple[Tuple[int, int], ...]:
+        return tuple((indices[0] - 1, indices[1]) for indices in
+                     self.flight_info.extension_header.extended_data_indices.values())
 
     def _parse_header(self, line):
-        if line.startswith('HFPLT'):
-            self._parse_pilot_info(line)
-        elif line.startswith('HFDTE'):
-            self._parse_flight_date(line)
-        elif line.startswith('HFCM2CREW2'):
-            self._parse_second_pilot_name(line)
-        elif line.startswith('HFGTY'):
-            self._parse_glider_type(line)
-        elif line.startswith('HFGID'):
-            self._parse_glider_id(line)
-        elif line.startswith('HFDTM'):
-            self._parse_gps_datum(line)
-        elif line.startswith('HFRFW'):
-            self._parse_firmware_version(line)
-        elif line.startswith('HFRHW'):
-            self._parse_hardware_version(line)
-        elif line.startswith('HFFTY'):
-            self._parse_flight_recorder_type(line)
-        elif line.startswith('HFGPS'):
-            self._parse_gps_info(line)
-        elif line.startswith('HFPRS'):
-            self._parse_pressure_sensor_info(line)
-        elif line.startswith('HFCID'):
-            self._parse_tail_fin_number(line)
-        elif line.startswith('HFCCL'):
-            self._parse_glider_class(line)
-        elif line.startswith('HFTZN'):
-            self._parse_timezone(line)
+        prefix_and_parser = self._header_parsers.get(line[:5])
+        if prefix_and_parser is not None and line.startswith(prefix_and_parser[0]):
+            prefix_and_parser[1](line)
 
     def _parse_timezone(self, line):
         try:
@@ -303,3 +665,128 @@ class IGCParser:
             self.flight_info.header.pilot_name = line.split(':')[1]
         except IndexError:
             self.flight_info.header.pilot_name = ''
+
+
+def _make_fix_chunk_parser(igc_file_path, declarations: List[bytes], engine: str, day_offset: int = 0) -> IGCParser:
+    parser = IGCParser(engine=engine, include=('B',))
+    parser.igc_file_path = igc_file_path
+    parser.flight_info.fixes = FixTable(day_offset)
+    for declaration in declarations:
+        parser._parse_extension_header(declaration.decode('utf-8', 'replace'))
+    return parser
+
+
+def _parse_fix_chunk(igc_file_path, start: int, end: int, declarations: List[bytes],
+                     engine: str) -> Tuple[FixTable, List[int]]:
+    # worker process side of IGCParser._parse_igc_file_in_parallel, returns the fixes and the line numbers of the
+    # skipped B records relative to the chunk
+    parser = _make_fix_chunk_parser(igc_file_path, declarations, engine)
+    with open(igc_file_path, 'rb') as igc_file:
+        igc_file.seek(start)
+        parser._parse_fix_chunk(igc_file.read(end - start))
+    return parser.flight_info.fixes, parser.skipped_fix_lines
+
+
+def _find_record_starts(data: bytes, record_type: bytes) -> array:
+    # offsets of the lines starting with record_type
+    starts = array('q', [0] if data[:1] == record_type else [])
+    starts.extend(match.start() + 1 for match in re.finditer(b'\n' + record_type, data))
+    return starts
+
+
+# Read-only stand-in for a FixTable holding the raw file and the offsets of its B records. Fixes are decoded
+# in blocks of block_size when accessed through get() (and so through the TimedFlightDataView), the most recently
+# used blocks are cached. Any other attribute, e.g. a column, decodes and keeps the whole table. Malformed
+# B records raise a ParseError on access, they cannot be skipped as the record offsets fix the length of the table.
+class LazyFixTable:
+    __slots__ = ('block_size', 'max_cached_blocks', '_data', '_fix_starts', '_declarations', '_template', '_engine',
+                 '_igc_file_path', '_day_offsets', '_blocks', '_fixes')
+
+    def __init__(self, data: bytes, fix_starts: array, declarations: List[bytes], template: FixTable,
+                 engine: str = 'python', igc_file_path=None, block_size: int = 256, max_cached_blocks: int = 16):
+        self.block_size = block_size
+        self.max_cached_blocks = max_cached_blocks
+        self._data = data
+        self._fix_starts = fix_starts
+        self._declarations = declarations
+        self._template = template  # empty table with the extension columns
+        self._engine = engine
+        self._igc_file_path = igc_file_path
+        self._day_offsets = self._find_day_offsets()
+        self._blocks: collections.OrderedDict = collections.OrderedDict()  # block index to FixTable, LRU order
+        self._fixes: Optional[FixTable] = None
+
+    def _find_day_offsets(self) -> array:
+        # midnight rollovers between the first fixes of consecutive blocks, a block is assumed to span < 12 hours
+        day_offsets = array('q')
+        (day_offset, previous_time) = (0, None)
+        for start in self._fix_starts[::self.block_size]:
+            try:
+                time = parse_igc_time(self._data[start + 1:start + 7])
+            except ValueError:
+                time = previous_time
+            if previous_time is not None and time < previous_time - ROLLOVER_THRESHOLD:
+                day_offset += SECONDS_PER_DAY
+            day_offsets.append(day_offset)
+            previous_time = time
+        return day_offsets
+
+    def __len__(self):
+        return len(self._fix_starts)
+
+    @property
+    def has_extensions(self) -> bool:
+        return self._template.has_extensions
+
+    @property
+    def extension_titles(self) -> Tuple[str, ...]:
+        return self._template.extension_titles
+
+    @property
+    def extension_widths(self) -> List[int]:
+        return self._template.extension_widths
+
+    def get(self, index: int) -> TimedFlightData:
+        if self._fixes is not None:
+            return self._fixes.get(index)
+        (block_index, block_position) = divmod(index, self.block_size)
+        return self._get_block(block_index).get(block_position)
+
+    def _get_block(self, block_index: int) -> FixTable:
+        block = self._blocks.get(block_index)
+        if block is not None:
+            self._blocks.move_to_end(block_index)
+            return block
+        first = block_index * self.block_size
+        block = self._decode(first, min(first + self.block_size, len(self)), self._day_offsets[block_index])
+        self._blocks[block_index] = block
+        if len(self._blocks) > self.max_cached_blocks:
+            self._blocks.popitem(last=False)
+        return block
+
+    def _decode(self, first: int, end: int, day_offset: int) -> FixTable:
+        start = self._fix_starts[first]
+        stop = self._data.find(b'\n', self._fix_starts[end - 1]) + 1 or len(self._data)
+        parser = _make_fix_chunk_parser(self._igc_file_path, self._declarations, self._engine, day_offset)
+        parser._parse_fix_chunk(self._data[start:stop])
+        if parser.skipped_fix_lines:
+            line_number = parser.skipped_fix_lines[0] + self._data.count(b'\n', 0, start)  # relative to the chunk
+            raise ParseError('invalid to parse timed flight data', line_number, self._igc_file_path)
+        return parser.flight_info.fixes
+
+    def materialize(self) -> FixTable:
+        # the fully decoded table, kept from now on in place of the block cache
+        if self._fixes is None:
+            self._fixes = self._decode(0, len(self), 0)
+            self._blocks.clear()
+        return self._fixes
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.materialize(), name)
+
+
+# FlightInfo returned by IGCParser(..., lazy=True), its fixes are a LazyFixTable
+class LazyFlightInfo(FlightInfo):
+    __slots__ = ()
@@ -1,17 +1,76 @@
 from tkgui import IGCTKConverterGUI
 from cli import IGCConverterCLI
+from catalog import CatalogQuery
 import argparse
+import datetime
+import multiprocessing
 
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--format", default='csv', type=str, help='output format')
+    parser.add_argument("--format", default='csv', type=lambda formats: formats.split(','),
+                        help='output format or comma separated output formats')
     parser.add_argument("--input", type=str, help='IGC source', default='igc')
     parser.add_argument('--cli', action='store_true', help='start in CLI mode')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='always parse the IGC files instead of loading previously parsed flights from the cache')
+    parser.add_argument('--tolerance', type=float, help='simplify the exported tracks to within this many metres')
+    parser.add_argument('--interval', type=int, help='export at most one fix per this many seconds')
+    parser.add_argument('--concurrent-exports', action='store_true',
+                        help='write the output formats of a file at the same time')
+    parser.add_argument('--acmi-delta', action='store_true',
+                        help='only write the changed positions and properties to ACMI files (smaller files)')
+    parser.add_argument('--compression-level', type=int, choices=range(10), metavar='0-9',
+                        help='deflate level of zip.acmi files, 9 for the smallest files')
+    parser.add_argument('--metrics', type=int, nargs='?', const=1, metavar='WINDOW',
+                        help='export speed, climb rate and heading, smoothed over WINDOW fixes')
+    parser.add_argument('--merge', metavar='DESTINATION',
+                        help='write the flights of --input (or of the --catalog query) as the aircraft of one '
+                             'ACMI or zip.acmi file and exit')
+    parser.add_argument('--update-catalog', metavar='DATABASE',
+                        help='add the flights of the --input directory tree to a catalog and exit')
+    parser.add_argument('--workers', type=int,
+                        help='number of processes converting files or summarizing the flights of a catalog '
+                             '(default 1)')
+    parser.add_argument('--unordered', action='store_true',
+                        help='report the files converted by several workers as they complete')
+    parser.add_argument('--catalog', metavar='DATABASE',
+                        help='convert the flights of a catalog matching the query options to --format and exit')
+    query = parser.add_argument_group('catalog query options')
+    query.add_argument('--pilot', dest='pilot_name', metavar='PILOT', help='pilot or second pilot name contains PILOT')
+    query.add_argument('--glider-id', help='glider registration')
+    query.add_argument('--recorder', dest='flight_recorder_type', metavar='RECORDER',
+                       help='flight recorder type contains RECORDER')
+    query.add_argument('--date-from', type=datetime.date.fromisoformat, metavar='DATE',
+                       help='first flight date, YYYY-MM-DD')
+    query.add_argument('--date-to', type=datetime.date.fromisoformat, metavar='DATE',
+                       help='last flight date, YYYY-MM-DD')
+    query.add_argument('--bbox', dest='bounding_box', type=float, nargs=4, metavar=('SOUTH', 'WEST', 'NORTH', 'EAST'),
+                       help='flights crossing this bounding box in degrees')
     args = parser.parse_args()
+    converter_options = {'use_cache': not args.no_cache, 'simplify_tolerance': args.tolerance,
+                         'decimation_interval': args.interval, 'metrics_window': args.metrics,
+                         'concurrent_exports': args.concurrent_exports, 'acmi_delta_encoding': args.acmi_delta,
+                         'compression_level': args.compression_level,
+                         'workers': args.workers if args.workers is not None else 1,
+                         'ordered_completion': not args.unordered}
 
-    if args.cli:
-        converter = IGCConverterCLI()
+    source = args.input
+    if args.catalog is not None:
+        criteria = {name: getattr(args, name) for name in ('pilot_name', 'glider_id', 'flight_recorder_type',
+                                                           'date_from', 'date_to', 'bounding_box')
+                    if getattr(args, name) is not None}
+        source = CatalogQuery(args.catalog, **criteria)
+
+    if args.update_catalog is not None:
+        IGCConverterCLI(**converter_options).update_catalog(args.update_catalog, args.input,
+                                                            converter_options['workers'])
+    elif args.merge is not None:
+        IGCConverterCLI(**converter_options).merge(source, args.merge)
+    elif args.catalog is not None:
+        IGCConverterCLI(**converter_options).convert(source, args.format)
+    elif args.cli:
+        converter = IGCConverterCLI(**converter_options)
         converter.mainloop()
     else:
         # if platform == "darwin":
@@ -19,9 +78,10 @@ def main():
         # else:
         #     gui = IGCQtConverterGUI()
 
-        gui = IGCTKConverterGUI()
+        gui = IGCTKConverterGUI(**converter_options)
         gui.mainloop()
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # worker processes of a frozen (pyinstaller) bundle
     main()
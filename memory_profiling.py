@@ -0,0 +1,80 @@
+from flight import FixTable
+from igcparser import IGCParser
+from igcconverter import get_igc_files
+from typing import Callable
+import gc
+import os
+import sys
+import tracemalloc
+
+
+# The per-fix object model as it was before the slotted classes and the columnar FixTable
+class _LegacyTimedFlightData:
+    def __init__(self):
+        self.extension_values = None
+        self.utc_time = ''
+        self.latitude = ''
+        self.longitude = ''
+        self.fix_validity = ''
+        self.pressure_altitude = ''
+        self.gps_altitude = ''
+
+
+def measure_retained_bytes(build: Callable[[], object]) -> int:
+    # bytes still allocated by build() while its result is alive
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        gc.collect()
+        (retained, _) = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+    return retained
+
+
+def fixes_view(fixes: FixTable):
+    return (fixes.get(i) for i in range(len(fixes)))
+
+
+def build_legacy_objects(fixes: FixTable) -> list:
+    legacy_fixes = []
+    for data in fixes_view(fixes):
+        legacy_data = _LegacyTimedFlightData()
+        legacy_data.extension_values = data.extension_values
+        legacy_data.utc_time = data.utc_time
+        legacy_data.latitude = data.latitude
+        legacy_data.longitude = data.longitude
+        legacy_data.fix_validity = data.fix_validity
+        legacy_data.pressure_altitude = data.pressure_altitude
+        legacy_data.gps_altitude = data.gps_altitude
+        legacy_fixes.append(legacy_data)
+    return legacy_fixes
+
+
+def build_slotted_objects(fixes: FixTable) -> list:
+    return list(fixes_view(fixes))
+
+
+def profile_file(igc_file_path: str):
+    fixes = IGCParser(igc_file_path).flight_info.fixes
+    if len(fixes) == 0:
+        return
+
+    models = (('dict objects', lambda: build_legacy_objects(fixes)),
+              ('slotted objects', lambda: build_slotted_objects(fixes)),
+              ('fix table', lambda: IGCParser(igc_file_path).flight_info.fixes))
+    print('{} ({} fixes)'.format(os.path.basename(igc_file_path), len(fixes)))
+    for (name, build) in models:
+        print('    {:<16} {:>8.1f} bytes per fix'.format(name, measure_retained_bytes(build) / len(fixes)))
+
+
+def main():
+    igc_directory = sys.argv[1] if len(sys.argv) > 1 else os.getcwd() + os.sep + 'igc'
+    for igc_file_path in sorted(get_igc_files(igc_directory)):
+        profile_file(igc_file_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+from flight import FixTable, EARTH_RADIUS
+import collections
+import numpy as np
+
+# Metrics derived from consecutive fixes, one value per fix computed over the whole FixTable at once. The values
+# of a fix describe the leg from the previous fix, the first fix repeats those of the second.
+FlightMetrics = collections.namedtuple('FlightMetrics', [
+    'distance',  # metres from the previous fix
+    'total_distance',  # metres flown since the first fix
+    'ground_speed',  # metres per second
+    'vertical_speed',  # metres per second, positive when climbing
+    'heading',  # track over ground in degrees clockwise from north
+])
+
+
+def _column(column) -> np.ndarray:
+    dtype = np.float64 if column.typecode == 'd' else 'i{}'.format(column.itemsize)
+    return np.frombuffer(column, dtype=dtype).astype(np.float64)
+
+
+def _moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    # centred, the window shrinks at both ends of the track
+    if window <= 1 or len(values) == 0:
+        return values
+    kernel = np.ones(window)
+    return np.convolve(values, kernel, mode='same') / np.convolve(np.ones(len(values)), kernel, mode='same')
+
+
+def _per_leg(values: np.ndarray) -> np.ndarray:
+    # values of the n - 1 legs to one value per fix
+    return np.concatenate((values[:1], values))
+
+
+def compute_metrics(fixes: FixTable, window: int = 1) -> FlightMetrics:
+    # window is the number of fixes of the moving average smoothing speeds and heading, 1 disables smoothing
+    if len(fixes) < 2:
+        zeros = np.zeros(len(fixes))
+        return FlightMetrics(zeros, zeros, zeros, zeros, zeros)
+
+    latitude = np.radians(_column(fixes.latitude))
+    longitude = np.radians(_column(fixes.longitude))
+    time = _column(fixes.time)
+    # the variometer altitude is the pressure altitude unless the recorder has no pressure sensor
+    altitude = _column(fixes.pressure_altitude)
+    if not altitude.any():
+        altitude = _column(fixes.gps_altitude)
+
+    (latitude_from, latitude_to) = (latitude[:-1], latitude[1:])
+    longitude_difference = np.diff(longitude)
+    a = np.sin(np.diff(latitude) / 2) ** 2 + \
+        np.cos(latitude_from) * np.cos(latitude_to) * np.sin(longitude_difference / 2) ** 2
+    leg_distance = 2 * EARTH_RADIUS * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+    leg_duration = np.diff(time)
+    moving = leg_duration > 0
+    leg_ground_speed = np.divide(leg_distance, leg_duration, out=np.zeros_like(leg_distance), where=moving)
+    leg_vertical_speed = np.divide(np.diff(altitude), leg_duration, out=np.zeros_like(leg_distance), where=moving)
+
+    leg_heading = np.arctan2(np.sin(longitude_difference) * np.cos(latitude_to),
+                             np.cos(latitude_from) * np.sin(latitude_to) -
+                             np.sin(latitude_from) * np.cos(latitude_to) * np.cos(longitude_difference))
+    # a stationary leg keeps the heading of the last leg that moved
+    last_moved = np.maximum.accumulate(np.where(leg_distance > 0, np.arange(len(leg_distance)), 0))
+    leg_heading = leg_heading[last_moved]
+
+    distance = np.concatenate(([0.0], leg_distance))
+    heading = _per_leg(leg_heading)
+    heading = np.arctan2(_moving_average(np.sin(heading), window), _moving_average(np.cos(heading), window))
+    return FlightMetrics(distance=distance,
+                         total_distance=np.cumsum(distance),
+                         ground_speed=_moving_average(_per_leg(leg_ground_speed), window),
+                         vertical_speed=_moving_average(_per_leg(leg_vertical_speed), window),
+                         heading=np.degrees(heading) % 360.0)
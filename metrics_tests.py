@@ -0,0 +1,79 @@
+import csv
+import os
+import tempfile
+import unittest
+from acmitacviewflightinfoexporter import AcmiTacViewFlightInfoExporter
+from csvexporter import CSVFlightInfoExporter
+from flight import FixTable
+from igcparser import IGCParser
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+else:
+    from metrics import compute_metrics
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class MetricsTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        # due north at 0.001 degree (111.2 m) and 10 m of climb per 10 s, then due east, then stationary
+        self.fixes = FixTable()
+        for i in range(5):
+            self.fixes.append(i * 10, 45.0 + i * 0.001, 7.0, 'A', 1000 + i * 10, 0)
+        for i in range(1, 4):
+            self.fixes.append(40 + i * 10, 45.004, 7.0 + i * 0.001, 'A', 1040, 0)
+        self.fixes.append(80, 45.004, 7.003, 'A', 1040, 0)
+
+    def test_metrics(self):
+        m = compute_metrics(self.fixes)
+        self.assertEqual(m.distance[0], 0.0)
+        self.assertAlmostEqual(m.distance[1], 111.195, places=2)
+        self.assertAlmostEqual(m.total_distance[4], 4 * m.distance[1], places=6)
+        self.assertAlmostEqual(m.ground_speed[0], m.ground_speed[1])
+        self.assertAlmostEqual(m.ground_speed[2], 11.1195, places=3)
+        self.assertAlmostEqual(m.vertical_speed[3], 1.0)
+        self.assertAlmostEqual(m.vertical_speed[6], 0.0)
+        self.assertAlmostEqual(m.heading[2] % 360.0, 0.0, places=6)
+        self.assertAlmostEqual(m.heading[6], 90.0, places=1)
+        # the stationary last fix keeps the heading of the previous leg
+        self.assertEqual(m.ground_speed[8], 0.0)
+        self.assertAlmostEqual(m.heading[8], m.heading[7])
+
+    def test_smoothing(self):
+        m = compute_metrics(self.fixes, window=3)
+        raw = compute_metrics(self.fixes)
+        self.assertAlmostEqual(m.vertical_speed[4], sum(raw.vertical_speed[3:6]) / 3)
+        self.assertAlmostEqual(m.vertical_speed[0], sum(raw.vertical_speed[0:2]) / 2)
+        self.assertAlmostEqual(m.heading[1] % 360.0, 0.0, places=6)
+        self.assertTrue((m.distance == raw.distance).all())
+
+    def test_short_tracks(self):
+        self.assertEqual(len(compute_metrics(FixTable()).heading), 0)
+        self.assertEqual(list(compute_metrics(self.fixes.take([0])).ground_speed), [0.0])
+
+    def test_exported_columns(self):
+        flight_info = IGCParser('igc/test.igc').flight_info
+        directory = tempfile.mkdtemp()
+        (csv_path, acmi_path) = (os.path.join(directory, 'test.csv'), os.path.join(directory, 'test.acmi'))
+        self.addCleanup(os.rmdir, directory)
+        self.addCleanup(os.remove, csv_path)
+        self.addCleanup(os.remove, acmi_path)
+        CSVFlightInfoExporter(metrics_window=3).export(flight_info, csv_path)
+        AcmiTacViewFlightInfoExporter(metrics_window=3).export(flight_info, acmi_path)
+
+        with open(csv_path, newline='') as csv_file:
+            rows = list(csv.reader(csv_file))
+        titles = rows[9]
+        self.assertEqual(titles[14:18], list(CSVFlightInfoExporter.MetricTitles))
+        self.assertEqual(len(rows) - 10, len(flight_info.fixes))
+        with open(acmi_path) as acmi_file:
+            fix_lines = [line for line in acmi_file if line.startswith('3000102,T=')]
+        self.assertEqual(len(fix_lines), len(flight_info.fixes))
+        self.assertTrue(all(',VerticalSpeed=' in line and ',HDG=' in line for line in fix_lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+from flight import FixTable, extension_value_as_int, MAX_INT_EXTENSION_WIDTH, ROLLOVER_THRESHOLD, SECONDS_PER_DAY
+from collections.abc import Sequence
+from typing import Callable, List, Tuple
+import numpy as np
+
+# Bulk decoding of B records: all lines are gathered into one fixed-width (width, n) byte matrix and every
+# field is decoded for all fixes at once. Rows that do not match the strict fixed-width layout are handed to
+# a per-line fallback so that the result is identical to FixTable.append_record.
+
+_B_RECORD_WIDTH = 35  # B, time (6), latitude (8), longitude (9), validity (1), 2 altitudes (5 each)
+_ZERO = ord('0')
+_MINUS = ord('-')
+_SPACE = ord(' ')
+_NEW_LINE = ord('\n')
+_CARRIAGE_RETURN = ord('\r')
+
+
+# Lines of an IGC file held as one byte buffer, line boundaries are located with array operations
+class BufferLines(Sequence):
+    # data may be bytes or any other buffer (e.g. a mmap.mmap), it is viewed rather than copied
+    def __init__(self, data, starts: np.ndarray = None, lengths: np.ndarray = None):
+        self.data = data
+        self.buffer = np.frombuffer(data, dtype=np.uint8)
+        if starts is None:
+            ends = np.flatnonzero(self.buffer == _NEW_LINE)
+            starts = np.concatenate(([0], ends + 1))
+            ends = np.concatenate((ends, [len(self.buffer)]))
+            if starts[-1] == len(self.buffer):  # no line after the final new line
+                starts, ends = starts[:-1], ends[:-1]
+            lengths = ends - starts
+            # strip the carriage return of CRLF line endings
+            lengths -= (lengths > 0) & (self.buffer[np.maximum(ends - 1, 0)] == _CARRIAGE_RETURN)
+        self.starts = starts
+        self.lengths = lengths
+        self._line_record_types = None
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index) -> str:
+        start = int(self.starts[index])
+        return self.data[start:start + int(self.lengths[index])].decode('utf-8', 'replace')
+
+    def _record_types(self) -> np.ndarray:
+        # first byte of every line, 0 for empty lines
+        if self._line_record_types is None:
+            self._line_record_types = np.where(
+                self.lengths > 0, self.buffer[np.minimum(self.starts, max(len(self.buffer) - 1, 0))], 0)
+        return self._line_record_types
+
+    def find_records(self, record_types: bytes) -> np.ndarray:
+        # indices of the lines starting with one of the record type letters
+        return np.flatnonzero(np.isin(self._record_types(), np.frombuffer(record_types, dtype=np.uint8)))
+
+    def take(self, indices: np.ndarray) -> 'BufferLines':
+        return BufferLines(self.data, self.starts[indices], self.lengths[indices])
+
+    def columns(self, width: int) -> np.ndarray:
+        # gathers the lines into a (width, n) matrix holding one row per character column, short lines are padded
+        # with spaces
+        offsets = np.arange(width)[:, None]
+        columns = self.buffer.take(self.starts + offsets, mode='clip')
+        if (self.lengths < width).any():
+            columns[offsets >= self.lengths] = _SPACE
+        return columns
+
+    def texts(self, indices: np.ndarray, offset: int = 0) -> List[str]:
+        # the decoded text of the lines at indices, without their first offset characters
+        starts = self.starts[indices]
+        return [self.data[start:end].decode('utf-8', 'replace')
+                for (start, end) in zip((starts + offset).tolist(), (starts + self.lengths[indices]).tolist())]
+
+
+# Every numeric field of the B records is decoded with int64 arithmetic on the digit matrix, one row of digits per
+# character column: value = value * 10 + digit over the columns of the field. Fields that may start with '-' (the
+# altitudes and the extensions) skip the '-' and are negated afterwards.
+# (start, end) columns of time, latitude degrees and minutes, longitude degrees and minutes and the altitudes
+_FIXED_FIELDS = ((1, 7), (7, 9), (9, 14), (15, 18), (18, 23), (25, 30), (30, 35))
+_NUM_UNSIGNED_FIXED_FIELDS = 5
+_MINUS_DIGIT = (_MINUS - _ZERO) % 256  # '-' in the uint8 digit matrix
+
+
+def _decode_field(digits: np.ndarray, start: int, end: int, signed: bool) -> Tuple[np.ndarray, np.ndarray]:
+    # the values of the field at the character columns start:end and whether they are plain digits
+    negative = digits[start] == _MINUS_DIGIT if signed else None
+    values = digits[start].astype(np.int64)
+    if signed:
+        values[negative] = 0
+    for column in range(start + 1, end):
+        values *= 10
+        values += digits[column]
+    valid = (digits[start + 1:end] <= 9).all(axis=0)
+    if signed:
+        valid &= (digits[start] <= 9) | negative
+        np.negative(values, out=values, where=negative)
+    else:
+        valid &= digits[start] <= 9
+    return values, valid
+
+
+def decode_b_records(lines: BufferLines, extension_slices: Sequence[Tuple[int, int]],
+                     extension_widths: Sequence[int], decode_line: Callable[[int], tuple]) -> dict:
+    # Decodes B record lines to FixTable columns (numpy arrays, or lists of str for text extension columns).
+    # extension_slices holds the python (start, end) slice of every I record column. decode_line(i) must return
+    # the parse_b_record_fields tuple of lines[i], or None to drop the line, it is only called for rows the
+    # vectorized decoder cannot handle.
+    width = max([_B_RECORD_WIDTH] + [end for (_, end) in extension_slices])
+    columns = lines.columns(width)
+    # multi-byte characters shift the column offsets of the decoded line, such rows take the slow path
+    ascii_rows = (columns < 128).all(axis=0) if columns.max(initial=0) >= 128 else np.ones(len(lines), dtype=bool)
+
+    # non-digits wrap to values > 9
+    digits = columns - np.uint8(_ZERO)
+    values = []
+    valid = ascii_rows.copy()
+    for (i, (start, end)) in enumerate(_FIXED_FIELDS):
+        (field_values, field_valid) = _decode_field(digits, start, end, i >= _NUM_UNSIGNED_FIXED_FIELDS)
+        values.append(field_values)
+        valid &= field_valid
+    latitude_hemisphere = columns[14]
+    longitude_hemisphere = columns[23]
+    valid &= ((latitude_hemisphere == ord('N')) | (latitude_hemisphere == ord('S'))) & \
+        ((longitude_hemisphere == ord('E')) | (longitude_hemisphere == ord('W')))
+    (seconds, latitude_degrees, latitude_minutes, longitude_degrees, longitude_minutes, pressure_altitude,
+     gps_altitude) = values
+    time = seconds // 10000 * 3600 + seconds // 100 % 100 * 60 + seconds % 100
+    latitude = latitude_degrees + latitude_minutes / 60000
+    latitude = np.where(latitude_hemisphere == ord('S'), -latitude, latitude)
+    longitude = longitude_degrees + longitude_minutes / 60000
+    longitude = np.where(longitude_hemisphere == ord('W'), -longitude, longitude)
+    fix_validity = columns[24].copy()
+
+    # the fallback decodes the remaining rows one by one, its results are scattered back column by column
+    fallback = np.flatnonzero(~valid).tolist()
+    decoded = [decode_line(i) for i in fallback]
+    dropped = [i for (i, fields) in zip(fallback, decoded) if fields is None]
+    repaired = [i for (i, fields) in zip(fallback, decoded) if fields is not None]
+    if repaired:
+        for (column, column_values) in zip((time, latitude, longitude, fix_validity, pressure_altitude, gps_altitude),
+                                           zip(*(fields for fields in decoded if fields is not None))):
+            column[repaired] = column_values
+    kept = np.delete(np.arange(len(lines)), dropped) if dropped else slice(None)
+    # the extension values of dropped rows do not decide the type of their column
+    dropped_rows = np.zeros(len(lines), dtype=bool)
+    dropped_rows[dropped] = True
+    time = time[kept]
+    # seconds of day to monotonic seconds, every large backwards jump is a pass through midnight
+    time += np.cumsum(np.diff(time, prepend=time[:1]) < -ROLLOVER_THRESHOLD) * SECONDS_PER_DAY
+
+    extension_columns = [_decode_extension_column(lines, digits, ascii_rows, dropped_rows, start, end,
+                                                  extension_widths[i])
+                         for (i, (start, end)) in enumerate(extension_slices)]
+    return {'time': time, 'latitude': latitude[kept], 'longitude': longitude[kept], 'fix_validity': fix_validity[kept],
+            'pressure_altitude': pressure_altitude[kept], 'gps_altitude': gps_altitude[kept],
+            'extension_columns': [_take(column, kept) for column in extension_columns]}
+
+
+def _take(column, kept):
+    # kept is a slice or an index array, text extension columns are lists
+    if type(column) is list and not isinstance(kept, slice):
+        return [column[i] for i in kept]
+    return column[kept]
+
+
+def _decode_extension_column(lines: BufferLines, digits: np.ndarray, ascii_rows: np.ndarray,
+                             dropped_rows: np.ndarray, start: int, end: int, width: int):
+    if width <= MAX_INT_EXTENSION_WIDTH:
+        (values, valid) = _decode_field(digits, start, end, signed=True)
+        # '-0..0' is no integer text round trip, the fallback decides
+        valid = (valid & ascii_rows & ((values != 0) | (digits[start] != _MINUS_DIGIT))) | dropped_rows
+        for i in np.flatnonzero(~valid):
+            number = extension_value_as_int(lines[i][start:end], width)
+            if number is None:
+                break
+            values[i] = number
+        else:
+            return values
+    return [line[start:end] for line in lines]
+
+
+def fill_fix_table(fixes: FixTable, columns: dict):
+    # converts the decoded columns to the item types of the FixTable arrays and appends them
+    extension_columns = [c if type(c) is list else c.astype('q') for c in columns['extension_columns']]
+    fixes.extend_columns(columns['time'].astype(fixes.time.typecode),
+                         columns['latitude'].astype(fixes.latitude.typecode),
+                         columns['longitude'].astype(fixes.longitude.typecode),
+                         columns['fix_validity'].astype(np.uint8).tobytes(),
+                         columns['pressure_altitude'].astype(fixes.pressure_altitude.typecode),
+                         columns['gps_altitude'].astype(fixes.gps_altitude.typecode), extension_columns)
+
+
+def decode_into(fixes: FixTable, lines: BufferLines, extension_slices: Sequence[Tuple[int, int]],
+                decode_line: Callable[[int], tuple]):
+    if len(lines) == 0:
+        return
+    fill_fix_table(fixes, decode_b_records(lines, extension_slices, fixes.extension_widths, decode_line))
@@ -1,6 +1,21 @@
+import glob
+import io
+import os
+import tempfile
 import unittest
-from flight import FlightInfo
-from igcparser import IGCParser, ParseError
+from flight import FlightInfo, TimedFlightData, KSection
+from igcparser import IGCParser, ParseError, ParseWarning, numpydecoder, compile_extension_declaration, \
+    compile_record_decoder, scan_header, CompressionOpeners, LazyFlightInfo
+from igcconverter import make_export_path
+
+
+def _write_igc_file(test_case: unittest.TestCase, content) -> str:
+    # a temporary IGC file holding content (str or bytes), removed after the test
+    handle, path = tempfile.mkstemp(suffix='.igc')
+    with os.fdopen(handle, 'wb' if isinstance(content, bytes) else 'w') as igc_file:
+        igc_file.write(content)
+    test_case.addCleanup(os.remove, path)
+    return path
 
 
 class ParserTests(unittest.TestCase):
@@ -84,6 +99,282 @@ class ParserTests(unittest.TestCase):
     def test_parse_k_section_without_j_section(self):
         self.assertRaises(ParseError, self.parser._parse_k_section, 'KTHISISATESTKSECTION')
 
+    def test_invalid_extension_header(self):
+        self.assertRaises(ParseError, self.parser._parse_extension_header, 'I02 3638FXA')
+
+    def test_malformed_fixes_are_skipped(self):
+        path = _write_igc_file(self, 'HFDTE250519\nI023638FXA3940SIU\n'
+                                     'B1511094538002N07249279WA-00940004000109\n'
+                                     'B1511104538002N07249279WA-0094\n'
+                                     'B1511114538002N07249279WA-0094     001x9\n'
+                                     'B1511124538002N07249279WA-00940004000209\n')
+        for engine in ('python',) + (('numpy', 'mmap') if numpydecoder is not None else ()):
+            with self.assertWarnsRegex(ParseWarning, 'skipped 2 malformed B record'):
+                parser = IGCParser(path, engine=engine)
+            self.assertEqual(parser.skipped_fix_lines, [4, 5])
+            self.assertEqual([(d.utc_time, d.extension_values['FXA']) for d in parser.flight_info.timed_flight_data],
+                             [('151109', '001'), ('151112', '002')])
+            # the extension values of the skipped records do not turn the columns into text
+            self.assertEqual([list(column) for column in parser.flight_info.fixes.extension_columns], [[1, 2], [9, 9]])
+
+    def test_compiled_decoders_are_shared_between_parsers(self):
+        line = 'I023638FXA3940SIU'
+        self.parser._parse_extension_header(line)
+        other_parser = IGCParser()
+        hits = compile_extension_declaration.cache_info().hits
+        other_parser._parse_extension_header(line)
+
+        self.assertEqual(compile_extension_declaration.cache_info().hits, hits + 1)
+        self.assertIs(self.parser._extension_decoder, other_parser._extension_decoder)
+        self.assertEqual(other_parser._extension_decoder('B1511094538002N07249279WA-00940004000109'), ('001', '09'))
+
+    def test_single_column_record_decoder(self):
+        self.assertEqual(compile_record_decoder(((7, 10),))('K160310090'), ('090',))
+
+
+class StreamingParserTests(unittest.TestCase):
+    igc_file_path = 'igc/test.igc'
+
+    def test_iter_records_yields_decoded_records(self):
+        records = list(IGCParser().iter_records(self.igc_file_path))
+        fixes = [r.value for r in records if r.record_type == 'B']
+        k_sections = [r.value for r in records if r.record_type == 'K']
+
+        self.assertIsInstance(fixes[0], TimedFlightData)
+        self.assertEqual(fixes[0].utc_time, '152229')
+        self.assertIsInstance(k_sections[0], KSection)
+        self.assertEqual(k_sections[0].flight_data_values['WVE'], '00137')
+        self.assertEqual(records[0].line_number, 1)
+
+    def test_iter_records_does_not_store_fixes(self):
+        parser = IGCParser()
+        for _ in parser.iter_records(self.igc_file_path):
+            pass
+        self.assertEqual(len(parser.flight_info.timed_flight_data), 0)
+        self.assertEqual(len(parser.flight_info.k_sections), 0)
+        self.assertEqual(parser.flight_info.header.flight_date, ('19', '05', '25'))
+
+    def test_iter_records_from_file_objects(self):
+        with open(self.igc_file_path, 'rb') as f:
+            binary_records = list(IGCParser().iter_records(f))
+        with open(self.igc_file_path, 'r') as f:
+            text_records = list(IGCParser().iter_records(io.StringIO(f.read())))
+
+        self.assertEqual(len(binary_records), len(text_records))
+        self.assertEqual([r.record_type for r in binary_records], [r.record_type for r in text_records])
+
+    def test_parser_is_a_consumer_of_the_stream(self):
+        flight_info = IGCParser(self.igc_file_path).flight_info
+        num_fixes = sum(1 for r in IGCParser().iter_records(self.igc_file_path) if r.record_type == 'B')
+        self.assertEqual(len(flight_info.timed_flight_data), num_fixes)
+        self.assertEqual(len(flight_info.k_sections), 7)
+
+
+class RecordSelectionTests(unittest.TestCase):
+    igc_file_path = 'igc/test.igc'
+
+    def test_excluded_records_are_not_parsed(self):
+        flight_info = IGCParser(self.igc_file_path, exclude=('K', 'L')).flight_info
+        self.assertEqual(len(flight_info.k_sections), 0)
+        self.assertEqual(len(flight_info.comments.lines), 0)
+        self.assertIsNotNone(flight_info.j_section)
+        self.assertEqual(len(flight_info.timed_flight_data), 159)
+
+    def test_excluding_i_records_skips_b_extensions(self):
+        flight_info = IGCParser(self.igc_file_path, exclude=('I',)).flight_info
+        self.assertIsNone(flight_info.timed_flight_data[0].extension_values)
+        self.assertEqual(flight_info.timed_flight_data[0].utc_time, '152229')
+
+    def test_excluding_j_records_excludes_k_records(self):
+        flight_info = IGCParser(self.igc_file_path, exclude=('J',)).flight_info
+        self.assertEqual(len(flight_info.k_sections), 0)
+
+    def test_include(self):
+        records = list(IGCParser(include=('A', 'H')).iter_records(self.igc_file_path))
+        self.assertEqual({r.record_type for r in records}, {'A', 'H'})
+
+    def test_unknown_record_type(self):
+        self.assertRaises(ValueError, IGCParser, self.igc_file_path, exclude=('X',))
+
+
+class ScanHeaderTests(unittest.TestCase):
+
+    def test_scan_header(self):
+        for path in glob.glob('igc/*.igc'):
+            flight_info = scan_header(path)
+            parsed_flight_info = IGCParser(path).flight_info
+            self.assertEqual(str(flight_info.header), str(parsed_flight_info.header))
+            self.assertEqual(str(flight_info.flight_recorder_info), str(parsed_flight_info.flight_recorder_info))
+            self.assertEqual(len(flight_info.fixes), 0)
+
+    def test_scan_stops_at_first_b_record(self):
+        path = _write_igc_file(self, 'AFLA9WL\nHFPLTPILOTINCHARGE:Jane Doe\nB1511094538002N07249279WA-00940004000109\n'
+                                     'HFGIDGLIDERID:NOT-READ\nBnot a valid fix\n')
+        flight_info = scan_header(path)
+        self.assertEqual(flight_info.header.pilot_name, 'Jane Doe')
+        self.assertEqual(flight_info.header.glider_id, '')
+
+
+class MidnightRolloverTests(unittest.TestCase):
+
+    def test_times_are_monotonic_for_all_engines(self):
+        path = _write_igc_file(self, 'AFLA9WL\nHFDTE250519\nI013638FXA\n' + ''.join(
+            'B{}4538002N07249279WA-0094000400001\n'.format(utc_time)
+            for utc_time in ('235958', '235959', '000000', '000001')))
+        engines = IGCParser.Engines if numpydecoder is not None else ('python',)
+        for engine in engines:
+            for workers in (None, 2):
+                fixes = IGCParser(path, engine=engine, workers=workers, parallel_threshold=0).flight_info.fixes
+                self.assertEqual(list(fixes.time), [86398, 86399, 86400, 86401])
+
+
+class CompressedInputTests(unittest.TestCase):
+
+    def _compressed_copy(self, extension: str, opener) -> str:
+        handle, path = tempfile.mkstemp(suffix='.igc' + extension)
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        with open('igc/test.igc', 'rb') as igc_file, opener(path, 'wb') as compressed_file:
+            compressed_file.write(igc_file.read())
+        return path
+
+    def test_same_flight_info_as_plain_file(self):
+        engines = IGCParser.Engines if numpydecoder is not None else ('python',)
+        flight_info = IGCParser('igc/test.igc').flight_info
+        for (extension, opener) in CompressionOpeners.items():
+            path = self._compressed_copy(extension, opener)
+            for engine in engines:
+                compressed_flight_info = IGCParser(path, engine=engine, parallel_threshold=0).flight_info
+                self.assertEqual(str(compressed_flight_info.header), str(flight_info.header))
+                self.assertEqual(compressed_flight_info.fixes.time, flight_info.fixes.time)
+                self.assertEqual(compressed_flight_info.fixes.latitude, flight_info.fixes.latitude)
+            self.assertEqual(scan_header(path).header.pilot_name, flight_info.header.pilot_name)
+
+    def test_export_path_drops_compression_extension(self):
+        self.assertEqual(make_export_path('flights/a.igc.gz', 'csv'), 'flights/a.csv')
+        self.assertEqual(make_export_path('flights/a.igc', '.acmi'), 'flights/a.acmi')
+        self.assertEqual(make_export_path('flights/a.igc.xz', 'zip.acmi'), 'flights/a.zip.acmi')
+
+
+class LazyFlightInfoTests(unittest.TestCase):
+
+    header = 'AFLA9WL\nHFDTE250519\nI013638FXA\n'
+
+    def test_same_fixes_as_eager_parse(self):
+        for path in glob.glob('igc/*.igc'):
+            flight_info = IGCParser(path).flight_info
+            lazy_flight_info = IGCParser(path, lazy=True).flight_info
+            self.assertIsInstance(lazy_flight_info, LazyFlightInfo)
+            self.assertEqual(str(lazy_flight_info.header), str(flight_info.header))
+            self.assertEqual(len(lazy_flight_info.k_sections), len(flight_info.k_sections))
+            self.assertEqual(len(lazy_flight_info.timed_flight_data), len(flight_info.timed_flight_data))
+            for index in (0, -1, len(flight_info.fixes) // 2):
+                self.assertEqual(lazy_flight_info.timed_flight_data[index].utc_time,
+                                 flight_info.timed_flight_data[index].utc_time)
+            self.assertEqual([d.latitude for d in lazy_flight_info.timed_flight_data[10:20]],
+                             [d.latitude for d in flight_info.timed_flight_data[10:20]])
+            self.assertEqual(lazy_flight_info.fixes.time, flight_info.fixes.time)
+
+    def test_cached_blocks_are_bounded(self):
+        fixes = IGCParser('igc/06ed9wl1.igc', lazy=True).flight_info.fixes
+        self.assertEqual(sum(1 for _ in IGCParser('igc/06ed9wl1.igc', lazy=True).flight_info.timed_flight_data),
+                         len(fixes))
+        for index in range(0, len(fixes), fixes.block_size):
+            fixes.get(index)
+        self.assertEqual(len(fixes._blocks), fixes.max_cached_blocks)
+
+    def test_midnight_rollover_between_blocks(self):
+        times = [(23 * 3600 + 55 * 60 + i) % 86400 for i in range(600)]
+        lines = ''.join('B{:02d}{:02d}{:02d}4538002N07249279WA-0094000400001\n'.format(t // 3600, t // 60 % 60, t % 60)
+                        for t in times)
+        path = _write_igc_file(self, self.header + lines)
+        fixes = IGCParser(path, lazy=True).flight_info.fixes
+        self.assertEqual(list(fixes._get_block(1).time) + list(fixes._get_block(2).time),
+                         [23 * 3600 + 55 * 60 + i for i in range(fixes.block_size, 600)])
+
+    def test_parse_error_on_access(self):
+        lines = 'B1511094538002N07249279WA-0094000400001\nB15111X4538002N07249279WA-0094000400001\n'
+        path = _write_igc_file(self, self.header + lines)
+        flight_info = IGCParser(path, lazy=True).flight_info
+        self.assertEqual(len(flight_info.timed_flight_data), 2)
+        with self.assertRaises(ParseError) as context:
+            flight_info.timed_flight_data[0]
+        self.assertEqual(context.exception.line_number, 5)
+
+
+class ParallelParserTests(unittest.TestCase):
+
+    def test_same_fixes_as_serial_parse(self):
+        serial_flight_info = IGCParser('igc/test.igc').flight_info
+        parallel_flight_info = IGCParser('igc/test.igc', workers=3, parallel_threshold=0).flight_info
+
+        self.assertEqual(len(serial_flight_info.fixes), len(parallel_flight_info.fixes))
+        self.assertEqual(serial_flight_info.fixes.time, parallel_flight_info.fixes.time)
+        self.assertEqual(serial_flight_info.fixes.extension_columns, parallel_flight_info.fixes.extension_columns)
+        self.assertEqual(len(parallel_flight_info.k_sections), 7)
+
+    def test_skipped_line_numbers_from_worker(self):
+        path = _write_igc_file(self, 'HFDTE250519\n' + 'B1511094538002N07249279WA-00940004000109\n' * 50 +
+                               'B1511094538002X07249279WA-00940004000109\n')
+        with self.assertWarns(ParseWarning):
+            parser = IGCParser(path, workers=2, parallel_threshold=0)
+        self.assertEqual(parser.skipped_fix_lines, [52])
+        self.assertEqual(len(parser.flight_info.fixes), 50)
+
+
+@unittest.skipIf(numpydecoder is None, 'numpy is not installed')
+class NumpyEngineTests(unittest.TestCase):
+
+    def assertSameFixes(self, expected: FlightInfo, actual: FlightInfo):
+        self.assertEqual(len(expected.timed_flight_data), len(actual.timed_flight_data))
+        for (e, a) in zip(expected.timed_flight_data, actual.timed_flight_data):
+            self.assertEqual([getattr(e, name) for name in TimedFlightData.__slots__],
+                             [getattr(a, name) for name in TimedFlightData.__slots__])
+
+    def test_same_flight_info_as_python_engine(self):
+        for path in glob.glob('igc/*.igc'):
+            python_flight_info = IGCParser(path).flight_info
+            for engine in ('numpy', 'mmap'):
+                flight_info = IGCParser(path, engine=engine).flight_info
+                self.assertSameFixes(python_flight_info, flight_info)
+                self.assertEqual(python_flight_info.fixes.extension_columns, flight_info.fixes.extension_columns)
+                self.assertEqual(str(python_flight_info.header), str(flight_info.header))
+                self.assertEqual(python_flight_info.comments.lines, flight_info.comments.lines)
+                self.assertEqual([str(k) for k in python_flight_info.k_sections],
+                                 [str(k) for k in flight_info.k_sections])
+
+    def test_mmap_engine_empty_file(self):
+        self.assertEqual(len(IGCParser(_write_igc_file(self, b''), engine='mmap').flight_info.fixes), 0)
+
+    def test_mmap_engine_skips_malformed_fixes(self):
+        path = _write_igc_file(self, b'B1511094538002X07249279WA-00940004000109\n')
+        with self.assertWarns(ParseWarning):
+            self.assertEqual(len(IGCParser(path, engine='mmap').flight_info.fixes), 0)
+
+    def test_record_selection(self):
+        flight_info = IGCParser('igc/test.igc', engine='numpy', exclude=('I', 'K', 'L')).flight_info
+        self.assertEqual(len(flight_info.k_sections), 0)
+        self.assertEqual(len(flight_info.comments.lines), 0)
+        self.assertIsNone(flight_info.timed_flight_data[0].extension_values)
+        self.assertEqual(len(IGCParser('igc/test.igc', engine='numpy', include=('H',)).flight_info.fixes), 0)
+
+    def test_irregular_lines_take_the_fallback(self):
+        path = _write_igc_file(self, b'I023638FXA3940SIU\r\n'
+                                     b'B1511094538002N07249279WA-00940004000109\r\n'
+                                     b'B151110 538002N07249279WA 00940004000-09\r\n'
+                                     b'B1511114538002S07249279EV00094-0040-0009')
+        self.assertSameFixes(IGCParser(path).flight_info, IGCParser(path, engine='numpy').flight_info)
+        self.assertEqual(IGCParser(path, engine='numpy').flight_info.timed_flight_data[2].latitude, '4538002S')
+
+    def test_skipped_line_number(self):
+        path = _write_igc_file(self, b'HFDTE250519\nB1511094538002N07249279WA-00940004000109\n'
+                                     b'B1511094538002X07249279WA-00940004000109\n')
+        with self.assertWarns(ParseWarning):
+            self.assertEqual(IGCParser(path, engine='numpy').skipped_fix_lines, [3])
+
+    def test_unknown_engine(self):
+        self.assertRaises(ValueError, IGCParser, 'igc/test.igc', engine='fortran')
+
 
 if __name__ == '__main__':
     unittest.main()
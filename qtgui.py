@@ -6,7 +6,8 @@ from typing import Optional
 
 
 class IGCQtConverterGUI(ConversionProgressObserver, IGCConverterExceptionObserver):
-    def __init__(self):
+    def __init__(self, **converter_options):
+        self.converter_options = converter_options  # keyword arguments of IGCConverter
         self._num_converted_files = 0
         self.selected_igc_path: Optional[str] = None
         self.app = QApplication([])
@@ -40,7 +41,7 @@ class IGCQtConverterGUI(ConversionProgressObserver, IGCConverterExceptionObserve
             self._do_conversion()
 
     def _do_conversion(self):
-        converter = IGCConverter(self.selected_igc_path, self.selected_output_format)
+        converter = IGCConverter(self.selected_igc_path, self.selected_output_format, **self.converter_options)
         converter.add_exception_observer(self)
         converter.add_progress_observer(self)
         converter.convert_igc()
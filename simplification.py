@@ -0,0 +1,85 @@
+from flight import FlightInfo, FixTable, EARTH_RADIUS
+from typing import Optional
+import numpy as np
+
+# Track simplification ahead of the exporters. The functions return the sorted indices of the fixes to keep,
+# the first and the last fix are always kept.
+
+
+def _int_column(column) -> np.ndarray:
+    return np.frombuffer(column, dtype='i{}'.format(column.itemsize)).astype(np.float64)
+
+
+def project_fixes(fixes: FixTable) -> np.ndarray:
+    # (n, 3) positions in metres: an equirectangular projection around the mean latitude and the GPS altitude
+    latitude = np.radians(np.frombuffer(fixes.latitude, dtype=np.float64))
+    longitude = np.radians(np.frombuffer(fixes.longitude, dtype=np.float64))
+    x = EARTH_RADIUS * np.cos(latitude.mean() if len(latitude) else 0.0) * longitude
+    return np.column_stack((x, EARTH_RADIUS * latitude, _int_column(fixes.gps_altitude)))
+
+
+def _segment_distances(points: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    # distance of every point to the segment from the start to the end point of the same row
+    directions = ends - starts
+    offsets = points - starts
+    length_squared = np.einsum('ij,ij->i', directions, directions)
+    projections = np.einsum('ij,ij->i', offsets, directions)
+    position = np.clip(np.divide(projections, length_squared, out=np.zeros_like(projections),
+                                 where=length_squared > 0), 0.0, 1.0)
+    offsets -= position[:, None] * directions
+    return np.sqrt(np.einsum('ij,ij->i', offsets, offsets))
+
+
+def douglas_peucker(points: np.ndarray, tolerance: float) -> np.ndarray:
+    # Douglas-Peucker on (n, dimensions) points, every dropped point is within tolerance of the simplified line.
+    # All segments of a recursion level are split at once, so the cost is one pass over the points per level.
+    if len(points) < 3:
+        return np.arange(len(points))
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    while True:
+        kept = np.flatnonzero(keep)
+        # every point belongs to the segment starting at the last kept point before it
+        segments = np.minimum(np.cumsum(keep) - 1, len(kept) - 2)
+        distances = _segment_distances(points, points[kept[segments]], points[kept[segments + 1]])
+        distances[keep] = 0.0
+        maxima = np.maximum.reduceat(distances, kept[:-1])
+        candidates = np.flatnonzero((distances > tolerance) & (distances == maxima[segments]))
+        if len(candidates) == 0:
+            return kept
+        # the first farthest point of each segment
+        (_, first_candidates) = np.unique(segments[candidates], return_index=True)
+        keep[candidates[first_candidates]] = True
+
+
+def decimate(fixes: FixTable, interval: int) -> np.ndarray:
+    # the first fix of every interval seconds
+    if interval <= 0:
+        raise ValueError('invalid decimation interval {}, use a positive number of seconds'.format(interval))
+    if len(fixes) == 0:
+        return np.arange(0)
+    buckets = np.frombuffer(fixes.time, dtype='i{}'.format(fixes.time.itemsize)) // interval
+    keep = np.diff(buckets, prepend=buckets[0] - 1) != 0
+    keep[-1] = True
+    return np.flatnonzero(keep)
+
+
+def simplify_fixes(fixes: FixTable, tolerance: Optional[float] = None, interval: Optional[int] = None) -> np.ndarray:
+    # indices of the fixes kept by time decimation to one fix per interval seconds followed by Douglas-Peucker
+    # with a tolerance in metres, either step is skipped when None
+    indices = np.arange(len(fixes)) if interval is None else decimate(fixes, interval)
+    if tolerance is not None:
+        points = project_fixes(fixes)[indices]
+        indices = indices[douglas_peucker(points, tolerance)]
+    return indices
+
+
+def simplify_flight_info(flight_info: FlightInfo, tolerance: Optional[float] = None,
+                         interval: Optional[int] = None) -> FlightInfo:
+    # a FlightInfo sharing all sections of flight_info but the simplified fixes
+    simplified = FlightInfo()
+    for name in FlightInfo.__slots__:
+        if not name.startswith('_'):
+            setattr(simplified, name, getattr(flight_info, name))
+    simplified.fixes = flight_info.fixes.take(simplify_fixes(flight_info.fixes, tolerance, interval))
+    return simplified
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+from flight import FixTable
+from igcconverter import IGCConverter
+from igcparser import IGCParser
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+else:
+    from simplification import douglas_peucker, decimate, project_fixes, simplify_fixes, simplify_flight_info
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class SimplificationTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.flight_info = IGCParser('igc/06ed9wl1.igc').flight_info
+
+    def test_straight_line_collapses_to_its_end_points(self):
+        points = np.column_stack((np.arange(10.0), 2 * np.arange(10.0), np.zeros(10)))
+        self.assertEqual(list(douglas_peucker(points, 0.01)), [0, 9])
+        self.assertEqual(list(douglas_peucker(points[:2], 0.01)), [0, 1])
+
+    def test_dropped_fixes_are_within_tolerance(self):
+        tolerance = 10.0
+        points = project_fixes(self.flight_info.fixes)
+        kept = douglas_peucker(points, tolerance)
+        self.assertEqual((kept[0], kept[-1]), (0, len(points) - 1))
+        self.assertLess(len(kept), len(points) // 2)
+        for (start, end) in zip(kept[:-1], kept[1:]):
+            (a, b) = (points[start], points[end])
+            for p in points[start + 1:end]:
+                position = np.clip((p - a) @ (b - a) / max((b - a) @ (b - a), 1e-12), 0.0, 1.0)
+                self.assertLessEqual(np.linalg.norm(p - a - position * (b - a)), tolerance)
+
+    def test_decimation(self):
+        fixes = FixTable()
+        for second in (0, 1, 2, 5, 9, 10, 11, 25):
+            fixes.append(second, 45.0, 7.0, 'A', 0, 0)
+        self.assertEqual(list(decimate(fixes, 10)), [0, 5, 7])
+        self.assertEqual(list(simplify_fixes(fixes)), list(range(8)))
+        for interval in (0, -10):
+            self.assertRaises(ValueError, decimate, fixes, interval)
+
+    def test_simplified_flight_info(self):
+        simplified = simplify_flight_info(self.flight_info, tolerance=20.0, interval=5)
+        self.assertIs(simplified.header, self.flight_info.header)
+        self.assertEqual(len(simplified.fixes), len(simplify_fixes(self.flight_info.fixes, 20.0, 5)))
+        self.assertEqual(simplified.timed_flight_data[-1].utc_time, self.flight_info.timed_flight_data[-1].utc_time)
+
+    def test_converter_exports_the_simplified_track(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        shutil.copy('igc/06ed9wl1.igc', directory)
+        IGCConverter(directory, 'acmi', use_cache=False, simplify_tolerance=20.0).convert_igc()
+        with open(os.path.join(directory, '06ed9wl1.acmi')) as acmi_file:
+            num_fix_lines = sum(1 for line in acmi_file if line.startswith('#'))
+        self.assertEqual(num_fix_lines, len(simplify_fixes(self.flight_info.fixes, 20.0)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,7 +10,8 @@ from threading import Thread
 
 class IGCTKConverterGUI(ConversionProgressObserver, IGCConverterExceptionObserver):
 
-    def __init__(self):
+    def __init__(self, **converter_options):
+        self.converter_options = converter_options  # keyword arguments of IGCConverter
         self.app = tk.Tk()
         self.app.geometry('350x90')
         self.app.winfo_toplevel().title("IGC Converter")
@@ -55,7 +56,7 @@ class IGCTKConverterGUI(ConversionProgressObserver, IGCConverterExceptionObserve
         if self.selected_igc_path is None:
             messagebox.showerror('Error', 'No input was selected!')
             return
-        converter = IGCConverter(self.selected_igc_path, self.selected_output_format)
+        converter = IGCConverter(self.selected_igc_path, self.selected_output_format, **self.converter_options)
         converter.add_exception_observer(self)
         converter.add_progress_observer(self)
         t = Thread(target=converter.convert_igc)
@@ -4,6 +4,8 @@ from typing import Optional
 def get_selected_export_format(title: str) -> Optional[str]:
     if title == 'acmi-TacView':
         return 'acmi'
+    elif title == 'zip.acmi-TacView':
+        return 'zip.acmi'
     elif title == 'csv':
         return 'csv'
     else: